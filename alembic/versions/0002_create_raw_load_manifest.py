@@ -0,0 +1,29 @@
+"""create raw_load_manifest table
+
+Revision ID: 0002_create_raw_load_manifest
+Revises: 0001_create_raw_messages
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+import os
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0002_create_raw_load_manifest'
+down_revision = '0001_create_raw_messages'
+branch_labels = None
+depends_on = None
+
+# the same file scripts/db_setup.py and scripts/load_manifest.py run
+MIGRATION_SQL = os.path.join(os.path.dirname(__file__), '..', '..', 'scripts', 'migrations',
+                             '0002_create_raw_load_manifest.sql')
+
+
+def upgrade():
+    with open(MIGRATION_SQL, encoding='utf-8') as f:
+        op.execute(f.read())
+
+
+def downgrade():
+    op.drop_table('raw_load_manifest')
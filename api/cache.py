@@ -0,0 +1,111 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+
+# In-process result cache for the analytical endpoints. Entries are keyed by
+# endpoint and parameters, evicted least-recently-used once MAX_ENTRIES is
+# reached and expired after TTL seconds. The marts only change when dbt
+# rebuilds them, and every completed `dbt run` stamps marts.warehouse_version
+# (medical_warehouse/macros/warehouse_version.sql); the cache polls that stamp
+# at most every VERSION_CHECK_INTERVAL seconds and drops everything when it moves.
+
+MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "512"))
+TTL = float(os.getenv("API_CACHE_TTL", "3600"))
+VERSION_CHECK_INTERVAL = float(os.getenv("API_CACHE_VERSION_CHECK", "5"))
+
+
+def make_key(endpoint, **params):
+    return (endpoint,) + tuple(sorted(params.items()))
+
+
+class QueryCache:
+    def __init__(self, version_loader=None, max_entries=MAX_ENTRIES, ttl=TTL,
+                 version_check_interval=VERSION_CHECK_INTERVAL, clock=time.monotonic):
+        self.version_loader = version_loader
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self.clock = clock
+        self.version = None
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._checked_at = None
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+
+    def clear(self):
+        self._entries.clear()
+
+    async def _check_version(self):
+        if self.version_loader is None:
+            return
+        now = self.clock()
+        if self._checked_at is not None and now - self._checked_at < self.version_check_interval:
+            return
+        self._checked_at = now
+        try:
+            version = await self.version_loader()
+        except Exception:
+            # no stamp table yet (dbt never ran) or the DB is down: rely on the TTL
+            return
+        if version != self.version:
+            if self._entries:
+                self.stats["invalidations"] += 1
+            self.clear()
+            self.version = version
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if self.clock() >= expires:
+            del self._entries[key]
+            self.stats["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key, value):
+        self._entries[key] = (self.clock() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def get_or_fetch(self, key, fetch):
+        """Return the cached value for ``key``, or await ``fetch()`` and cache it."""
+        if self.max_entries <= 0:
+            return await fetch()
+        await self._check_version()
+        entry = self._get(key)
+        if entry is not None:
+            self.stats["hits"] += 1
+            return entry[1]
+        self.stats["misses"] += 1
+        # concurrent misses on the same key share one query
+        pending = self._inflight.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        version = self.version
+        pending = asyncio.ensure_future(fetch())
+        self._inflight[key] = pending
+        try:
+            value = await pending
+        finally:
+            self._inflight.pop(key, None)
+        # don't cache a result computed against marts that have since been rebuilt
+        if self.version == version:
+            self._put(key, value)
+        return value
+
+    def summary(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            "warehouse_version": self.version,
+        }
@@ -0,0 +1,135 @@
+import io
+import os
+import csv
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from . import database
+
+# Streaming bulk exports of the marts. Rows come off a server-side cursor
+# EXPORT_BATCH_ROWS at a time and each batch is encoded and sent before the
+# next is fetched; the ASGI server only asks for the next chunk once the
+# client has taken the previous one, so a slow reader holds the cursor back
+# instead of growing a buffer. API memory stays at one batch per export.
+
+EXPORT_BATCH_ROWS = int(os.getenv("API_EXPORT_BATCH_ROWS", "5000"))
+# Exports run for as long as the client keeps reading; this replaces the API's
+# per-query statement timeout for them (0 disables)
+EXPORT_STATEMENT_TIMEOUT_MS = int(os.getenv("API_EXPORT_STATEMENT_TIMEOUT_MS", "0"))
+
+FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# (column, arrow type name) per dataset; the export queries select these in order
+MESSAGE_COLUMNS = [
+    ("message_id", "int64"), ("channel_id", "int64"), ("date_key", "date32"), ("message_text", "string"),
+    ("views", "int64"), ("forwards", "int64"), ("has_media", "bool_"),
+]
+DETECTION_COLUMNS = [
+    ("detection_id", "int64"), ("channel_id", "int64"), ("message_id", "int64"), ("image_path", "string"),
+    ("product_label", "string"), ("score", "float64"), ("detection_timestamp", "timestamp"),
+]
+
+MESSAGES_EXPORT_SQL = text(
+    "SELECT message_id, channel_id, date_key, message_text, views, forwards, has_media FROM marts.fct_messages "
+    "WHERE (CAST(:cid AS bigint) IS NULL OR channel_id = :cid)"
+    " AND (CAST(:date_from AS date) IS NULL OR date_key >= :date_from)"
+    " AND (CAST(:date_to AS date) IS NULL OR date_key <= :date_to)"
+)
+DETECTIONS_EXPORT_SQL = text(
+    "SELECT detection_id, channel_id, message_id, image_path, product_label, score, detection_timestamp "
+    "FROM marts.fct_image_detections "
+    "WHERE (CAST(:cid AS bigint) IS NULL OR channel_id = :cid)"
+    " AND (CAST(:lbl AS text) IS NULL OR product_label = :lbl)"
+    " AND (CAST(:date_from AS date) IS NULL OR detection_timestamp >= :date_from)"
+    " AND (CAST(:date_to AS date) IS NULL OR detection_timestamp < CAST(:date_to AS date) + 1)"
+)
+SET_TIMEOUT_SQL = text("SELECT set_config('statement_timeout', :ms, true)")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise HTTPException(status_code=400, detail="arrow export requires the 'pyarrow' package")
+    return pyarrow
+
+
+async def _ndjson(columns, batches):
+    names = [c for c, _ in columns]
+    async for rows in batches:
+        yield "".join(json.dumps(dict(zip(names, row)), default=str, ensure_ascii=False) + "\n"
+                      for row in rows).encode()
+
+
+async def _csv(columns, batches):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([c for c, _ in columns])
+    async for rows in batches:
+        writer.writerows(rows)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        # header only: no rows matched
+        yield buf.getvalue().encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file the Arrow stream writer fills and the exporter drains after each batch."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, b):
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def _arrow(columns, batches):
+    pa = _require_pyarrow()
+    types = {"timestamp": pa.timestamp("us")}
+    schema = pa.schema([(c, types.get(t) or getattr(pa, t)()) for c, t in columns])
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    async for rows in batches:
+        arrays = [pa.array([row[i] for row in rows], type=field.type) for i, field in enumerate(schema)]
+        writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {"ndjson": _ndjson, "csv": _csv, "arrow": _arrow}
+
+
+async def _batches(engine, query, params):
+    async with database.checkout(engine) as conn:
+        await conn.execute(SET_TIMEOUT_SQL, {"ms": str(EXPORT_STATEMENT_TIMEOUT_MS)})
+        result = await conn.stream(query.execution_options(yield_per=EXPORT_BATCH_ROWS), params)
+        async for rows in result.partitions(EXPORT_BATCH_ROWS):
+            yield rows
+
+
+def export_stream(engine, fmt, columns, query, params):
+    """Async iterator of encoded ``fmt`` chunks for ``query``, read through a server-side cursor."""
+    if fmt not in ENCODERS:
+        raise HTTPException(status_code=400, detail=f"Unknown export format '{fmt}'")
+    if fmt == "arrow":
+        # fail before the response starts rather than mid-stream
+        _require_pyarrow()
+    return ENCODERS[fmt](columns, _batches(engine, query, params))
@@ -1,62 +1,283 @@
-from fastapi import FastAPI, Depends, HTTPException, Query
+import os
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, datetime
+from fastapi import FastAPI, Depends, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
 from typing import List, Optional
-from .database import engine, get_db
+from . import database
+from .database import engine
 from . import schemas
+from . import export
+from . import metrics
+from .cache import QueryCache, make_key
+from .pagination import decode_cursor, set_next_cursor
 from sqlalchemy import text
 
-app = FastAPI(title="Telegram Corpus API")
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    # close pooled connections on shutdown
+    await database.engine.dispose()
+
+
+app = FastAPI(title="Telegram Corpus API", lifespan=lifespan)
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Fixed query strings: each is prepared once per pooled connection and reused
+# Aggregates read the incremental roll-ups in marts (agg_*), whose size
+# depends on channels x time buckets, not on the number of messages/detections
+TOP_PRODUCTS_SQL = text(
+    "SELECT product_label, sum(detections) AS cnt FROM marts.agg_label_counts_daily "
+    "WHERE (CAST(:cid AS bigint) IS NULL OR channel_id = :cid)"
+    " AND (CAST(:days AS integer) IS NULL OR date_key > current_date - CAST(:days AS integer)) "
+    "GROUP BY product_label ORDER BY cnt DESC LIMIT :limit"
+)
+# granularity -> (bucket expression, roll-up table, time window)
+ACTIVITY_ROLLUPS = {
+    "hour": ("hour_ts", "marts.agg_channel_activity_hourly",
+             "hour_ts > localtimestamp - make_interval(days => CAST(:days AS integer))"),
+    "day": ("date_key", "marts.agg_channel_activity_daily", "date_key > current_date - CAST(:days AS integer)"),
+    "week": ("CAST(date_trunc('week', date_key) AS date)", "marts.agg_channel_activity_daily",
+             "date_key > current_date - CAST(:days AS integer)"),
+}
+ACTIVITY_SQL = {
+    granularity: text(
+        f"SELECT {bucket} AS bucket, sum(messages), sum(views), sum(forwards) FROM {table} "
+        f"WHERE {window} AND (CAST(:cid AS bigint) IS NULL OR channel_id = :cid) "
+        "GROUP BY bucket ORDER BY bucket"
+    )
+    for granularity, (bucket, table, window) in ACTIVITY_ROLLUPS.items()
+}
+WAREHOUSE_VERSION_SQL = text("SELECT max(version) FROM marts.warehouse_version")
+# Ranked search over the GIN indexes built with marts.fct_messages: whole-word
+# matches on search_vector (same 'english' config as the model) or substring
+# matches via the trigram index, which catches affixed Amharic words. Matches
+# are first ordered by ts_rank_cd (cheap: it reads only search_vector) and the
+# best SEARCH_MAX_CANDIDATES, ties broken by (channel_id, message_id), are
+# ranked with word_similarity too, so a term found in a large share of the
+# corpus costs about the same as a rare one and every page sees the same
+# candidates. When more messages match, X-Search-Truncated is set; narrow
+# those with channel/date filters. Pages are keyset-paginated on
+# (rank, channel_id, message_id).
+MESSAGE_SEARCH_SQL = text(
+    "SELECT message_id, channel_id, date_key, message_text, rank, truncated FROM ("
+    " SELECT message_id, channel_id, date_key, message_text,"
+    "  text_rank + word_similarity(:q, message_text) AS rank,"
+    "  row_number() OVER (ORDER BY text_rank DESC, channel_id DESC, message_id DESC) AS position,"
+    "  count(*) OVER () > :max_candidates AS truncated"
+    " FROM ("
+    "  SELECT message_id, channel_id, date_key, message_text, ts_rank_cd(search_vector, query) AS text_rank"
+    "  FROM marts.fct_messages, websearch_to_tsquery('english', :q) AS query"
+    "  WHERE (search_vector @@ query OR message_text ILIKE :pat)"
+    "   AND (CAST(:cid AS bigint) IS NULL OR channel_id = :cid)"
+    "   AND (CAST(:date_from AS date) IS NULL OR date_key >= :date_from)"
+    "   AND (CAST(:date_to AS date) IS NULL OR date_key <= :date_to)"
+    "  ORDER BY text_rank DESC, channel_id DESC, message_id DESC"
+    "  LIMIT CAST(:max_candidates AS integer) + 1"
+    " ) candidates"
+    ") m "
+    "WHERE position <= :max_candidates AND (CAST(:after_rank AS real) IS NULL"
+    " OR (rank, channel_id, message_id) < (CAST(:after_rank AS real), :after_cid, :after_mid)) "
+    "ORDER BY rank DESC, channel_id DESC, message_id DESC LIMIT :limit"
+)
+SEARCH_MAX_CANDIDATES = int(os.getenv("API_SEARCH_MAX_CANDIDATES", "2000"))
+# Set on search responses when more messages matched than were ranked
+TRUNCATED_HEADER = "X-Search-Truncated"
+# Substrings shorter than a trigram can't use the trigram index
+MIN_SUBSTRING_LENGTH = 3
+# Keyset pages, newest first: each page starts strictly after the
+# (detection_timestamp, detection_id) of the previous page's last row, so every
+# page is one range scan on the recency/label indexes of fct_image_detections.
+VISUAL_CONTENT_BY_LABEL_SQL = text(
+    "SELECT detection_id, image_path, product_label, score, detection_timestamp FROM marts.fct_image_detections "
+    "WHERE product_label = :lbl AND (detection_timestamp, detection_id) < (:after_ts, :after_id) "
+    "ORDER BY detection_timestamp DESC, detection_id DESC LIMIT :limit"
+)
+VISUAL_CONTENT_SQL = text(
+    "SELECT detection_id, image_path, product_label, score, detection_timestamp FROM marts.fct_image_detections "
+    "WHERE (detection_timestamp, detection_id) < (:after_ts, :after_id) "
+    "ORDER BY detection_timestamp DESC, detection_id DESC LIMIT :limit"
+)
+# Bound for the first page, so first and later pages share one plan
+FIRST_PAGE = (datetime.max, 2 ** 63 - 1)
+READY_SQL = text("SELECT 1")
+READY_TIMEOUT = float(os.getenv("API_READY_TIMEOUT", "2"))
+
+# names used as the "query" label of the SQL metrics on /metrics
+database.register_queries({
+    "top_products": TOP_PRODUCTS_SQL,
+    "channel_activity": ACTIVITY_SQL,
+    "warehouse_version": WAREHOUSE_VERSION_SQL,
+    "message_search": MESSAGE_SEARCH_SQL,
+    "visual_content_by_label": VISUAL_CONTENT_BY_LABEL_SQL,
+    "visual_content": VISUAL_CONTENT_SQL,
+    "export_messages": export.MESSAGES_EXPORT_SQL,
+    "export_detections": export.DETECTIONS_EXPORT_SQL,
+    "export_timeout": export.SET_TIMEOUT_SQL,
+    "ready": READY_SQL,
+})
+
+
+async def fetch_all(query, params):
+    async with database.checkout(engine) as conn:
+        result = await conn.execute(query, params)
+        return result.fetchall()
+
+
+async def warehouse_version():
+    rows = await fetch_all(WAREHOUSE_VERSION_SQL, {})
+    return rows[0][0] if rows else None
+
+
+# aggregates over the marts, reused until the next dbt run (see api/cache.py)
+result_cache = QueryCache(warehouse_version)
 
 
 @app.get("/")
-def read_root():
+async def read_root():
     return {"message": "Welcome to the Telegram Corpus API"}
 
 
 @app.get("/health")
-def health_check():
+async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """503 until a pooled connection can be checked out and run a query within API_READY_TIMEOUT."""
+    try:
+        await asyncio.wait_for(fetch_all(READY_SQL, {}), READY_TIMEOUT)
+    except Exception as exc:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "reason": type(exc).__name__})
+    return {"status": "ready"}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Request, SQL and pool metrics of this worker in the Prometheus text format."""
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Hit/miss counters of the analytical result cache."""
+    return result_cache.summary()
+
+
 @app.get("/top-products", response_model=List[schemas.TopProduct])
-def top_products(limit: int = Query(10, ge=1, le=100)):
-    """Return top product image references by detection count."""
-    with engine.connect() as conn:
-        q = text("SELECT product_label, count(*) as cnt FROM marts.fct_image_detections GROUP BY product_label ORDER BY cnt DESC LIMIT :limit")
-        res = conn.execute(q, {"limit": limit}).fetchall()
-    return [{"label": r[0], "count": int(r[1])} for r in res]
+async def top_products(
+    limit: int = Query(10, ge=1, le=100),
+    channel_id: Optional[int] = None,
+    days: Optional[int] = Query(None, ge=1),
+):
+    """Return top product image references by detection count, optionally for one channel or the last ``days``."""
+    async def fetch():
+        res = await fetch_all(TOP_PRODUCTS_SQL, {"limit": limit, "cid": channel_id, "days": days})
+        return [{"label": r[0], "count": int(r[1])} for r in res]
+
+    key = make_key("top-products", limit=limit, channel_id=channel_id, days=days)
+    return await result_cache.get_or_fetch(key, fetch)
 
 
 @app.get("/channel-activity", response_model=List[schemas.ChannelActivityPoint])
-def channel_activity(channel_id: Optional[int] = None, days: int = 30):
-    """Return message counts per day for a channel (or overall if channel_id omitted)."""
-    with engine.connect() as conn:
-        if channel_id:
-            q = text("SELECT date_key, count(*) FROM marts.fct_messages WHERE channel_id = :cid AND date_key > (current_date - :days)::date GROUP BY date_key ORDER BY date_key")
-            res = conn.execute(q, {"cid": channel_id, "days": days}).fetchall()
-        else:
-            q = text("SELECT date_key, count(*) FROM marts.fct_messages WHERE date_key > (current_date - :days)::date GROUP BY date_key ORDER BY date_key")
-            res = conn.execute(q, {"days": days}).fetchall()
-    return [{"date": str(r[0]), "count": int(r[1])} for r in res]
+async def channel_activity(
+    channel_id: Optional[int] = None,
+    days: int = Query(30, ge=1),
+    granularity: str = Query("day", pattern="^(hour|day|week)$"),
+):
+    """Return message counts, views and forwards per hour, day or week for a channel (or overall if channel_id omitted)."""
+    async def fetch():
+        res = await fetch_all(ACTIVITY_SQL[granularity], {"cid": channel_id, "days": days})
+        return [{"date": str(r[0]), "count": int(r[1]), "views": int(r[2]), "forwards": int(r[3])} for r in res]
+
+    key = make_key("channel-activity", channel_id=channel_id, days=days, granularity=granularity)
+    return await result_cache.get_or_fetch(key, fetch)
 
 
 @app.get("/message-search", response_model=List[schemas.MessageSearchResult])
-def message_search(q: str = Query(..., min_length=1), limit: int = Query(50, le=100)):
-    """Simple full-text search over message text."""
-    with engine.connect() as conn:
-        qtext = text("SELECT message_id, channel_id, date_key, text FROM marts.fct_messages WHERE text ILIKE :pat LIMIT :limit")
-        likepat = f"%{q}%"
-        res = conn.execute(qtext, {"pat": likepat, "limit": limit}).fetchall()
-    return [{"message_id": r[0], "channel_id": r[1], "date": str(r[2]), "text": r[3]} for r in res]
+async def message_search(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    channel_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = None,
+):
+    """Ranked full-text search over message text; the next page's cursor is in X-Next-Cursor.
+
+    Only the best API_SEARCH_MAX_CANDIDATES matches are ranked; X-Search-Truncated marks a query that had more.
+    """
+    after = decode_cursor(cursor, (float, int, int)) if cursor else [None, None, None]
+    pat = None
+    if len(q) >= MIN_SUBSTRING_LENGTH:
+        pat = "%" + q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+    res = await fetch_all(MESSAGE_SEARCH_SQL, {
+        "q": q, "pat": pat, "cid": channel_id, "date_from": date_from, "date_to": date_to,
+        "after_rank": after[0], "after_cid": after[1], "after_mid": after[2],
+        "max_candidates": SEARCH_MAX_CANDIDATES, "limit": limit,
+    })
+    set_next_cursor(response, res, limit, lambda r: (float(r[4]), r[1], r[0]))
+    if res and res[0][5]:
+        response.headers[TRUNCATED_HEADER] = "true"
+    return [{"message_id": r[0], "channel_id": r[1], "date": str(r[2]), "text": r[3], "rank": float(r[4])}
+            for r in res]
 
 
 @app.get("/visual-content", response_model=List[schemas.Detection])
-def visual_content(label: Optional[str] = None, limit: int = 50):
-    """Returns recent images and detection metadata. Filter by label if provided."""
-    with engine.connect() as conn:
-        if label:
-            q = text("SELECT detection_id, image_path, product_label, score FROM marts.fct_image_detections WHERE product_label = :lbl ORDER BY detection_id DESC LIMIT :limit")
-            res = conn.execute(q, {"lbl": label, "limit": limit}).fetchall()
-        else:
-            q = text("SELECT detection_id, image_path, product_label, score FROM marts.fct_image_detections ORDER BY detection_id DESC LIMIT :limit")
-            res = conn.execute(q, {"limit": limit}).fetchall()
-    return [{"detection_id": int(r[0]), "image_path": r[1], "label": r[2], "score": float(r[3])} for r in res]
+async def visual_content(
+    response: Response,
+    label: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = None,
+):
+    """Returns recent images and detection metadata, newest first. Filter by label if provided.
+
+    Pass a page's X-Next-Cursor header back as ``cursor`` to get the next page.
+    """
+    after_ts, after_id = decode_cursor(cursor, (datetime.fromisoformat, int)) if cursor else FIRST_PAGE
+    params = {"after_ts": after_ts, "after_id": after_id, "limit": limit}
+    if label:
+        res = await fetch_all(VISUAL_CONTENT_BY_LABEL_SQL, {"lbl": label, **params})
+    else:
+        res = await fetch_all(VISUAL_CONTENT_SQL, params)
+    set_next_cursor(response, res, limit, lambda r: (r[4].isoformat(), r[0]))
+    return [{"detection_id": int(r[0]), "image_path": r[1], "label": r[2], "score": float(r[3]),
+             "detected_at": r[4]} for r in res]
+
+
+def export_response(fmt, name, columns, query, params):
+    media_type, suffix = export.FORMATS[fmt]
+    return StreamingResponse(
+        export.export_stream(engine, fmt, columns, query, params),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{name}.{suffix}"'},
+    )
+
+
+@app.get("/export/messages")
+async def export_messages(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow)$"),
+    channel_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """Stream marts.fct_messages as NDJSON, CSV or an Arrow IPC stream."""
+    params = {"cid": channel_id, "date_from": date_from, "date_to": date_to}
+    return export_response(format, "messages", export.MESSAGE_COLUMNS, export.MESSAGES_EXPORT_SQL, params)
+
+
+@app.get("/export/detections")
+async def export_detections(
+    format: str = Query("ndjson", pattern="^(ndjson|csv|arrow)$"),
+    channel_id: Optional[int] = None,
+    label: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+):
+    """Stream marts.fct_image_detections as NDJSON, CSV or an Arrow IPC stream."""
+    params = {"cid": channel_id, "lbl": label, "date_from": date_from, "date_to": date_to}
+    return export_response(format, "detections", export.DETECTION_COLUMNS, export.DETECTIONS_EXPORT_SQL, params)
@@ -0,0 +1,65 @@
+import time
+
+from src.metrics import CONTENT_TYPE, Counter, Gauge, Histogram, render as render_metrics
+
+# In-process metrics in the Prometheus text format, served by /metrics, built on
+# the primitives in src/metrics.py. Values are per worker process (scrape each
+# uvicorn worker, or run one). Request metrics come from MetricsMiddleware; SQL
+# and pool metrics from the engine hooks in api/database.py.
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Everything rendered by /metrics
+REGISTRY = []
+
+
+def render():
+    return render_metrics(REGISTRY)
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"),
+                   registry=REGISTRY)
+REQUEST_LATENCY = Histogram("http_request_duration_seconds",
+                            "Time from request start to the last body byte sent.", ("method", "route"),
+                            buckets=LATENCY_BUCKETS, registry=REGISTRY)
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served.", registry=REGISTRY)
+QUERY_LATENCY = Histogram("db_query_duration_seconds",
+                          "SQL execution time until the first row is available.", ("query",),
+                          buckets=LATENCY_BUCKETS, registry=REGISTRY)
+QUERY_ERRORS = Counter("db_query_errors_total", "SQL statements that raised.", ("query",), registry=REGISTRY)
+POOL_WAIT = Histogram("db_pool_checkout_wait_seconds", "Time spent waiting for a pooled connection.",
+                      buckets=LATENCY_BUCKETS, registry=REGISTRY)
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and in-flight count per route.
+
+    Requests are labelled with the matched route's path template, so label
+    cardinality stays bounded; requests that match no route share one label.
+    Latency runs until the last body chunk is sent, which for streamed exports
+    is the whole transfer.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            route = getattr(scope.get("route"), "path", "<unmatched>")
+            REQUESTS.inc(method=scope["method"], route=route, status=status)
+            REQUEST_LATENCY.observe(time.perf_counter() - started, method=scope["method"], route=route)
@@ -0,0 +1,32 @@
+import json
+import base64
+import binascii
+
+from fastapi import HTTPException
+
+# Opaque keyset cursors: the sort key of the last row of a page, returned in
+# the X-Next-Cursor header and passed back as ?cursor= to fetch the next page.
+
+CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(*values):
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, types):
+    """Decode a cursor into key values converted by ``types``; a malformed cursor is a 400."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(types):
+            raise ValueError(cursor)
+        return [convert(value) for convert, value in zip(types, values)]
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def set_next_cursor(response, rows, limit, key):
+    """Set the next-page header when the page is full; ``key(row)`` gives the row's sort key."""
+    if len(rows) == limit and rows:
+        response.headers[CURSOR_HEADER] = encode_cursor(*key(rows[-1]))
@@ -22,8 +22,9 @@ class Message(MessageBase):
 class Detection(BaseModel):
     detection_id: int
     image_path: str
-    product_label: str
+    label: str
     score: float
+    detected_at: Optional[datetime] = None
 
 
 class TopProduct(BaseModel):
@@ -34,6 +35,8 @@ class TopProduct(BaseModel):
 class ChannelActivityPoint(BaseModel):
     date: datetime
     count: int
+    views: Optional[int] = None
+    forwards: Optional[int] = None
 
 
 class MessageSearchResult(BaseModel):
@@ -41,3 +44,4 @@ class MessageSearchResult(BaseModel):
     channel_id: int
     date: datetime
     text: Optional[str]
+    rank: Optional[float] = None
@@ -0,0 +1,10 @@
+-- Use a model's +schema as-is (staging, marts) instead of dbt's default
+-- "<target schema>_<custom schema>", so the API can query marts.* directly
+-- and staging views never share a name with the raw tables in public.
+{% macro generate_schema_name(custom_schema_name, node) -%}
+    {%- if custom_schema_name is none -%}
+        {{ target.schema }}
+    {%- else -%}
+        {{ custom_schema_name | trim }}
+    {%- endif -%}
+{%- endmacro %}
@@ -0,0 +1,17 @@
+-- Records one row per completed `dbt run` / `dbt build` in marts.warehouse_version.
+-- The API compares the latest version against the one its result cache was
+-- filled under and drops cached aggregates when the marts have been rebuilt.
+{% macro stamp_warehouse_version(results) %}
+    {%- if execute and flags.WHICH in ('run', 'build') -%}
+        {%- set failed = results | selectattr('status', 'in', ['error', 'fail']) | list -%}
+        {%- if failed | length == 0 -%}
+            create schema if not exists marts;
+            create table if not exists marts.warehouse_version (
+                version bigserial primary key,
+                invocation_id text not null,
+                refreshed_at timestamptz not null default now()
+            );
+            insert into marts.warehouse_version (invocation_id) values ('{{ invocation_id }}');
+        {%- endif -%}
+    {%- endif -%}
+{% endmacro %}
@@ -0,0 +1,36 @@
+-- Daily roll-up of agg_channel_activity_hourly; re-aggregates only the days
+-- whose hours changed in this run.
+{{ config(
+    materialized='incremental',
+    unique_key=['channel_id', 'date_key'],
+    incremental_strategy='delete+insert',
+    indexes=[
+      {'columns': ['channel_id', 'date_key'], 'unique': True},
+      {'columns': ['date_key']},
+    ]
+) }}
+
+with hourly as (
+    select * from {{ ref('agg_channel_activity_hourly') }}
+)
+
+{% if is_incremental() %}
+, touched as (
+    select distinct channel_id, date_key
+    from hourly
+    where last_scraped_at > (select coalesce(max(last_scraped_at), '-infinity') from {{ this }})
+)
+{% endif %}
+
+select
+    h.channel_id,
+    h.date_key,
+    sum(h.messages) as messages,
+    sum(h.views) as views,
+    sum(h.forwards) as forwards,
+    max(h.last_scraped_at) as last_scraped_at
+from hourly h
+{% if is_incremental() %}
+join touched t on t.channel_id = h.channel_id and t.date_key = h.date_key
+{% endif %}
+group by h.channel_id, h.date_key
@@ -0,0 +1,45 @@
+-- Messages, views and forwards per channel and hour. Incremental: each run
+-- re-aggregates only the (channel, hour) groups that received rows since the
+-- last run, found through raw_messages.scraped_at (refreshed on every upsert).
+{{ config(
+    materialized='incremental',
+    unique_key=['channel_id', 'hour_ts'],
+    incremental_strategy='delete+insert',
+    indexes=[
+      {'columns': ['channel_id', 'hour_ts'], 'unique': True},
+      {'columns': ['hour_ts']},
+    ]
+) }}
+
+with messages as (
+    select
+        channel_id,
+        date_trunc('hour', message_date) as hour_ts,
+        views,
+        forwards,
+        scraped_at
+    from {{ ref('stg_messages') }}
+    where message_date is not null
+)
+
+{% if is_incremental() %}
+, touched as (
+    select distinct channel_id, hour_ts
+    from messages
+    where scraped_at > (select coalesce(max(last_scraped_at), '-infinity') from {{ this }})
+)
+{% endif %}
+
+select
+    m.channel_id,
+    m.hour_ts,
+    cast(m.hour_ts as date) as date_key,
+    count(*) as messages,
+    coalesce(sum(m.views), 0) as views,
+    coalesce(sum(m.forwards), 0) as forwards,
+    max(m.scraped_at) as last_scraped_at
+from messages m
+{% if is_incremental() %}
+join touched t on t.channel_id = m.channel_id and t.hour_ts = m.hour_ts
+{% endif %}
+group by m.channel_id, m.hour_ts
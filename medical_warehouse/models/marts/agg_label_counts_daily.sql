@@ -0,0 +1,54 @@
+-- Detections per channel, message day and label. fct_image_detections is
+-- rebuilt on every run, so a detection can move to another day (its message
+-- arrived late) or disappear (re-inference found fewer boxes) without a
+-- timestamp to show for it. Incremental runs therefore recount the fact and
+-- rewrite only the (channel, day) keys whose label counts differ from the
+-- stored ones, old and new day alike; delete+insert on (channel_id, date_key)
+-- drops labels that no longer occur there, and the post-hook drops days left
+-- without any detection.
+{{ config(
+    materialized='incremental',
+    unique_key=['channel_id', 'date_key'],
+    incremental_strategy='delete+insert',
+    indexes=[
+      {'columns': ['channel_id', 'date_key', 'product_label'], 'unique': True},
+      {'columns': ['date_key', 'product_label']},
+    ],
+    post_hook="""
+      delete from {{ this }} a
+      where not exists (
+          select 1 from {{ ref('fct_image_detections') }} d
+          where d.channel_id is not distinct from a.channel_id and d.date_key = a.date_key
+      )
+    """
+) }}
+
+with counts as (
+    select
+        channel_id,
+        date_key,
+        product_label,
+        count(*) as detections,
+        max(detection_timestamp) as last_detection_at
+    from {{ ref('fct_image_detections') }}
+    group by channel_id, date_key, product_label
+)
+
+{% if is_incremental() %}
+, stored as (
+    select channel_id, date_key, product_label, detections, last_detection_at
+    from {{ this }}
+)
+
+, touched as (
+    select channel_id, date_key from (select * from counts except select * from stored) added
+    union
+    select channel_id, date_key from (select * from stored except select * from counts) removed
+)
+{% endif %}
+
+select c.*
+from counts c
+{% if is_incremental() %}
+join touched t on t.channel_id is not distinct from c.channel_id and t.date_key = c.date_key
+{% endif %}
@@ -1,13 +1,34 @@
+-- detection_id is a hash of the detection's identity (image, model, box), the
+-- same key scripts/load_detections.py upserts on, so it survives rebuilds and
+-- re-runs of inference. The indexes serve /visual-content's keyset pages,
+-- newest first, overall and per label. date_key is the day the image was
+-- posted (its message's date), or the detection day for images whose message
+-- isn't in fct_messages.
+{{ config(
+    indexes=[
+      {'columns': ['detection_id'], 'unique': True},
+      {'columns': ['detection_timestamp', 'detection_id']},
+      {'columns': ['product_label', 'detection_timestamp', 'detection_id']},
+    ]
+) }}
+
 with detections as (
     select * from {{ ref('stg_image_detections') }}
+),
+
+messages as (
+    select channel_id, message_id, date_key from {{ ref('fct_messages') }}
 )
 
 select
-    row_number() over (order by detection_timestamp desc) as detection_id,
-    channel_id,
-    message_id,
-    image_path,
-    product_label,
-    score,
-    detection_timestamp
-from detections
+    ('x' || left(md5(concat_ws('|', d.image_path, coalesce(d.model_weights, ''), coalesce(d.box_index, 0))), 16))::bit(64)::bigint
+        as detection_id,
+    d.channel_id,
+    d.message_id,
+    coalesce(m.date_key, cast(d.detection_timestamp as date)) as date_key,
+    d.image_path,
+    d.product_label,
+    d.score,
+    d.detection_timestamp
+from detections d
+left join messages m on m.channel_id = d.channel_id and m.message_id = d.message_id
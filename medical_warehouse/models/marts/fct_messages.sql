@@ -1,3 +1,16 @@
+-- search_vector uses the 'english' config: English words are stemmed and
+-- Amharic (Ge'ez) words are kept whole; the trigram index on message_text
+-- covers substring and affixed-word matches that whole-word lexemes miss.
+-- api/main.py (MESSAGE_SEARCH_SQL) must use the same config.
+{{ config(
+    indexes=[
+      {'columns': ['search_vector'], 'type': 'gin'},
+      {'columns': ['message_text gin_trgm_ops'], 'type': 'gin'},
+      {'columns': ['channel_id', 'date_key']},
+      {'columns': ['date_key']},
+    ]
+) }}
+
 with messages as (
     select * from {{ ref('stg_messages') }}
 )
@@ -7,6 +20,7 @@ select
     channel_id,
     cast(message_date as date) as date_key,
     message_text,
+    to_tsvector('english', coalesce(message_text, '')) as search_vector,
     views,
     forwards,
     has_media,
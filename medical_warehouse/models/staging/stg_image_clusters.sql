@@ -0,0 +1,15 @@
+-- staging model for near-duplicate image clusters loaded by scripts/load_detections.py --clusters-csv
+with raw as (
+    select * from {{ source('raw', 'stg_image_clusters') }}
+)
+
+select
+    cluster_id,
+    cast(cluster_size as integer) as cluster_size,
+    image_path,
+    cast(channel_id as bigint) as channel_id,
+    cast(message_id as bigint) as message_id,
+    dhash,
+    cast(distance as integer) as distance,
+    cast(is_representative as boolean) as is_representative
+from raw
@@ -7,6 +7,8 @@ select
     cast(channel_id as bigint) as channel_id,
     cast(message_id as bigint) as message_id,
     image_path,
+    model_weights,
+    cast(box_index as integer) as box_index,
     product_label,
     original_label,
     cast(score as double precision) as score,
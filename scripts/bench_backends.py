@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Compare inference backends (torch, onnx, onnx-int8) on a fixed image set.
+
+The same images are decoded once and fed to every backend in the same
+batches. Reported per backend: per-batch latency (p50/p95), images/s and
+label agreement with the first backend listed (torch by default) - the
+share of images whose CLASS_MAP category multiset matches exactly, and the
+mean per-image overlap of original labels.
+
+Usage:
+  python scripts/bench_backends.py --weights yolov8n.pt [--images data/raw/images] \
+      [--limit 256] [--batch-size 16] [--backends torch onnx onnx-int8] [--json results.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from collections import Counter
+from itertools import islice
+
+# Add root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.yolo_detect import CLASS_MAP, IMG_SIZE, iter_images, iter_decoded_batches
+from src.inference_backends import BACKENDS, load_backend
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--weights", required=True)
+    p.add_argument("--images", default="data/raw/images", help="Image directory (<channel_id>/<file>)")
+    p.add_argument("--limit", type=int, default=256, help="Number of images (first N in sorted order)")
+    p.add_argument("--device", default="cpu")
+    p.add_argument("--conf", type=float, default=0.25)
+    p.add_argument("--batch-size", type=int, default=16)
+    p.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    p.add_argument("--warmup", type=int, default=1, help="Untimed batches per backend")
+    p.add_argument("--json", help="Write results to this JSON file")
+    return p.parse_args()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def label_overlap(a, b):
+    """Multiset overlap of two label lists in [0, 1] (1 when both are empty)."""
+    ca, cb = Counter(a), Counter(b)
+    total = max(sum(ca.values()), sum(cb.values()))
+    return sum((ca & cb).values()) / total if total else 1.0
+
+
+def run_backend(kind, batches, args):
+    backend = load_backend(kind, args.weights, args.device, args.conf, IMG_SIZE)
+    for _, arrays in batches[:args.warmup]:
+        backend.predict(arrays)
+    latencies, outputs = [], []
+    started = time.perf_counter()
+    for _, arrays in batches:
+        t0 = time.perf_counter()
+        outputs.extend(backend.predict(arrays))
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+    return outputs, latencies, elapsed
+
+
+def main():
+    args = parse_args()
+    paths = list(islice(iter_images(args.images), args.limit))
+    batches = list(iter_decoded_batches(paths, args.batch_size, size=IMG_SIZE))
+    images = sum(len(arrays) for _, arrays in batches)
+    if not images:
+        print(f"No decodable images under {args.images}")
+        return
+    print(f"Benchmarking {images} images in batches of {args.batch_size}")
+
+    reference = None
+    results = []
+    for kind in args.backends:
+        outputs, latencies, elapsed = run_backend(kind, batches, args)
+        labels = [[label for label, _ in dets] for dets in outputs]
+        if reference is None:
+            reference = labels
+        categories = [sorted(CLASS_MAP.get(l, "other") for l in ls) for ls in labels]
+        reference_categories = [sorted(CLASS_MAP.get(l, "other") for l in ls) for ls in reference]
+        results.append({
+            "backend": kind,
+            "images": images,
+            "seconds": round(elapsed, 3),
+            "images_per_s": round(images / elapsed, 2) if elapsed else 0.0,
+            "batch_p50_ms": round(statistics.median(latencies) * 1000, 1),
+            "batch_p95_ms": round(percentile(latencies, 0.95) * 1000, 1),
+            "detections": sum(len(ls) for ls in labels),
+            "category_match": round(sum(a == b for a, b in zip(categories, reference_categories)) / images, 3),
+            "label_overlap": round(statistics.mean(label_overlap(a, b) for a, b in zip(labels, reference)), 3),
+        })
+
+    print(f"Agreement is measured against '{args.backends[0]}'")
+    print(f"{'backend':<12}{'imgs/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'boxes':>8}{'cat match':>11}{'overlap':>9}")
+    for r in results:
+        print(f"{r['backend']:<12}{r['images_per_s']:>9.2f}{r['batch_p50_ms']:>9.1f}{r['batch_p95_ms']:>9.1f}"
+              f"{r['detections']:>8}{r['category_match']:>11.3f}{r['label_overlap']:>9.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Wrote results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
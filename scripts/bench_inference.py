@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Sweep processes x threads layouts for sharded YOLO inference.
+
+Runs ``run_inference`` over the same image set once per layout (cache and
+near-duplicate clustering disabled, output to a temp dir) and reports
+images/s, so the fastest split of cores for a machine can be picked for
+``--processes`` / ``--threads``.
+
+Usage:
+  python scripts/bench_inference.py --weights yolov8n.pt [--images data/raw/images] \
+      [--layouts 1x8 2x4 4x2 8x1] [--batch-size 16] [--json results.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# Add root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def default_layouts(cores):
+    """Every processes x threads split that uses all ``cores`` (powers of two plus the ends)."""
+    layouts, p = [], 1
+    while p <= cores:
+        layouts.append((p, max(1, cores // p)))
+        p *= 2
+    if layouts[-1][0] != cores:
+        layouts.append((cores, 1))
+    return layouts
+
+
+def parse_layout(value):
+    processes, threads = value.lower().split("x")
+    return int(processes), int(threads)
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--weights", required=True)
+    p.add_argument("--images", default="data/raw/images", help="Image directory (<channel_id>/<file>)")
+    p.add_argument("--device", default="cpu")
+    p.add_argument("--conf", type=float, default=0.25)
+    p.add_argument("--batch-size", type=int, default=16)
+    p.add_argument("--workers", type=int, default=2, help="Decoding threads per process")
+    p.add_argument("--layouts", type=parse_layout, nargs="+",
+                   help="PROCESSESxTHREADS, e.g. 1x8 2x4 (default: all splits of the CPU count)")
+    p.add_argument("--json", help="Write results to this JSON file")
+    return p.parse_args()
+
+
+def run_case(processes, threads, args):
+    """Run one layout in the current (fresh) process."""
+    from src.yolo_detect import run_inference, iter_images
+
+    images = sum(1 for _ in iter_images(args.images))
+    out_dir = tempfile.mkdtemp(prefix="bench_inference_")
+    started = time.perf_counter()
+    run_inference(args.weights, args.device, args.conf, args.batch_size, args.workers,
+                  cache_path=None, processes=processes, threads=threads,
+                  image_dir=args.images, output_dir=out_dir, dedup_distance=None)
+    elapsed = time.perf_counter() - started
+    return {
+        "processes": processes,
+        "threads": threads,
+        "images": images,
+        "seconds": round(elapsed, 3),
+        "images_per_s": round(images / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def main():
+    args = parse_args()
+    layouts = args.layouts or default_layouts(os.cpu_count() or 1)
+
+    results = []
+    for processes, threads in layouts:
+        # fresh process per layout so thread settings and loaded models do not leak
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results.append(pool.submit(run_case, processes, threads, args).result())
+
+    print(f"{'layout':<12}{'images':>8}{'seconds':>10}{'imgs/s':>10}")
+    for r in results:
+        layout = f"{r['processes']}x{r['threads']}"
+        print(f"{layout:<12}{r['images']:>8}{r['seconds']:>10.2f}{r['images_per_s']:>10.2f}")
+    best = max(results, key=lambda r: r["images_per_s"])
+    print(f"Fastest: --processes {best['processes']} --threads {best['threads']}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items() if k != "layouts"},
+                       "results": results}, f, indent=2)
+        print(f"Wrote results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
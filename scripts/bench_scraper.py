@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Offline throughput benchmark for src/scraper.py.
+
+Runs ``scrape_channel`` and ``main`` against the ReplayClient (no network) and
+reports messages/s, images/s and peak RSS per case. Each case runs in a fresh
+process so peak RSS is not inherited from earlier cases.
+
+Usage:
+  python scripts/bench_scraper.py [--messages 5000] [--channels 3] [--latency 0.05] \
+      [--concurrency 1 3] [--json results.json]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import logging
+import argparse
+import resource
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+# Add root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--messages", type=int, default=5000, help="Messages per synthetic channel")
+    p.add_argument("--channels", type=int, default=3, help="Channels scraped by the main() cases")
+    p.add_argument("--photo-ratio", type=float, default=0.3)
+    p.add_argument("--latency", type=float, default=0.02, help="Seconds per page of 100 messages")
+    p.add_argument("--download-latency", type=float, default=0.01, help="Seconds per photo download")
+    p.add_argument("--flood-rate", type=float, default=0.0, help="Probability of a FloodWait per page")
+    p.add_argument("--concurrency", type=int, nargs="+", default=[1, 3], help="main() concurrency levels")
+    p.add_argument("--download-workers", type=int, default=8)
+    p.add_argument("--compression", default="gzip", choices=["none", "gzip", "zstd"])
+    p.add_argument("--json", help="Write results to this JSON file")
+    return p.parse_args()
+
+
+def run_case(case, args):
+    """Run one benchmark case in the current (fresh) process."""
+    from src import scraper
+    from src.replay_client import ReplayClient
+
+    logging.getLogger("scraper").setLevel(logging.WARNING)
+    workdir = tempfile.mkdtemp(prefix="bench_scraper_")
+    scraper.DATA_DIR = os.path.join(workdir, "telegram_messages")
+    scraper.IMAGE_DIR = os.path.join(workdir, "images")
+
+    client = ReplayClient(
+        messages_per_channel=args.messages,
+        photo_ratio=args.photo_ratio,
+        latency=args.latency,
+        download_latency=args.download_latency,
+        flood_wait_rate=args.flood_rate,
+        photo_bytes=20_000,
+    )
+    channels = [f"bench_channel_{i}" for i in range(args.channels)]
+
+    started = time.perf_counter()
+    if case["target"] == "scrape_channel":
+        results = [asyncio.run(scraper.scrape_channel(client, channels[0], message_limit=None,
+                                                      compression=args.compression))]
+    else:
+        results = asyncio.run(scraper.main(
+            concurrency=case["concurrency"],
+            checkpoint_path=os.path.join(workdir, "checkpoints.json"),
+            download_workers=args.download_workers,
+            client=client,
+            channels=channels,
+            metrics_prom_path=os.path.join(workdir, "scraper_metrics.prom"),
+            run_report_path=os.path.join(workdir, "scraper_run.json"),
+            message_limit=None,
+            compression=args.compression,
+        ))
+    elapsed = time.perf_counter() - started
+
+    messages = sum(r["messages"] for r in results)
+    images = sum(len(files) for _, _, files in os.walk(scraper.IMAGE_DIR))
+    return dict(
+        case,
+        seconds=round(elapsed, 3),
+        messages=messages,
+        images=images,
+        messages_per_s=round(messages / elapsed, 1),
+        images_per_s=round(images / elapsed, 1),
+        # ru_maxrss is reported in KiB on Linux
+        peak_rss_mb=round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        slowest_channel_s=max(r["wall_s"] for r in results),
+    )
+
+
+def main():
+    args = parse_args()
+    cases = [{"target": "scrape_channel", "concurrency": 1}]
+    cases += [{"target": "main", "concurrency": c} for c in args.concurrency]
+
+    results = []
+    for case in cases:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results.append(pool.submit(run_case, case, args).result())
+
+    print(f"{'case':<24}{'seconds':>9}{'msgs/s':>10}{'imgs/s':>9}{'peak RSS MB':>13}")
+    for r in results:
+        name = f"{r['target']} (c={r['concurrency']})"
+        print(f"{name:<24}{r['seconds']:>9.2f}{r['messages_per_s']:>10.1f}{r['images_per_s']:>9.1f}{r['peak_rss_mb']:>13.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Wrote results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""Search latency vs corpus size for the /message-search query.
+
+For each corpus size a synthetic copy of marts.fct_messages (mixed English
+and Amharic pharmacy posts, with the same search_vector column and indexes
+as the dbt model) is built in the ``bench_search`` schema, and the API's
+MESSAGE_SEARCH_SQL is timed against it. Needle terms appear in a fixed
+number of messages at every size, so a flat p50 across sizes means the cost
+follows the matches, not the corpus. The "common" case matches a fixed share
+of the corpus; it grows only with the cheap ts_rank_cd ordering of its
+matches, since only the best API_SEARCH_MAX_CANDIDATES of them are fully
+ranked. "ilike-seqscan" is the previous implementation (ILIKE with no
+usable index) for reference.
+
+Requires pg_trgm. The bench_search schema is dropped afterwards unless --keep.
+
+Usage:
+  python scripts/bench_search.py --db-url <DATABASE_URL> [--sizes 100000 1000000 3000000] \
+      [--needle-rows 200] [--repeat 30] [--json results.json]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+
+import psycopg2
+from sqlalchemy.dialects import postgresql
+
+# Add root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from api.main import MESSAGE_SEARCH_SQL, SEARCH_MAX_CANDIDATES
+
+SCHEMA = "bench_search"
+
+ENGLISH = ["paracetamol", "amoxicillin", "tablets", "syrup", "capsules", "cream", "vitamin", "supplement",
+           "available", "now", "price", "birr", "delivery", "pharmacy", "stock", "original", "imported",
+           "discount", "contact", "call", "order", "new", "box", "strips", "dose", "mg", "ml", "baby",
+           "lotion", "serum", "sunscreen", "gloves", "mask", "sanitizer", "thermometer", "bandage"]
+AMHARIC = ["መድሃኒት", "ታብሌት", "ሽሮፕ", "ዋጋ", "ብር", "አዲስ", "ይደውሉ", "አለን", "ቫይታሚን", "ክሬም",
+           "ፋርማሲ", "ማዘዝ", "ቅናሽ", "ለህፃናት", "በጥራት", "ኦሪጅናል", "አዲስ አበባ", "ቦሌ"]
+# Appended to needle rows only; the Amharic needle also appears with a prefix
+# (በ-, "with") that only the trigram index can match
+NEEDLES = ["ibuprofen", "ኢቡፕሮፌን", "በኢቡፕሮፌን"]
+CHANNELS = 50
+
+TABLE_DDL = f"""
+CREATE TABLE {SCHEMA}.fct_messages (
+    message_id BIGINT,
+    channel_id BIGINT,
+    date_key DATE,
+    message_text TEXT,
+    search_vector TSVECTOR
+)
+"""
+
+# Mirrors the config() indexes of medical_warehouse/models/marts/fct_messages.sql
+INDEX_DDL = (
+    f"CREATE INDEX ON {SCHEMA}.fct_messages USING gin (search_vector)",
+    f"CREATE INDEX ON {SCHEMA}.fct_messages USING gin (message_text gin_trgm_ops)",
+    f"CREATE INDEX ON {SCHEMA}.fct_messages (channel_id, date_key)",
+    f"CREATE INDEX ON {SCHEMA}.fct_messages (date_key)",
+)
+
+# Six to ten pseudo-random vocabulary words per message, plus a needle on
+# every (size / needle_rows)-th message
+FILL_SQL = f"""
+INSERT INTO {SCHEMA}.fct_messages
+SELECT g, 1000 + abs(hashint8(g)) %% {CHANNELS}, DATE '2024-01-01' + (g %% 730), t, to_tsvector('english', t)
+FROM (
+    SELECT g, concat_ws(' ',
+        (SELECT string_agg(w[1 + abs(hashint8(g * 16 + k)) %% array_length(w, 1)], ' ')
+         FROM generate_series(1, 6 + g %% 5) k),
+        CASE WHEN g %% %(every)s = 0 THEN n[1 + (g / %(every)s) %% array_length(n, 1)] END,
+        'call', g %% 10000) AS t
+    FROM generate_series(1, %(size)s) g, (SELECT %(vocab)s::text[] AS w, %(needles)s::text[] AS n) v
+) s
+"""
+
+# The query before it was backed by the search indexes
+ILIKE_SQL = (f"SELECT message_id, channel_id, date_key, message_text FROM {SCHEMA}.fct_messages "
+             "WHERE message_text ILIKE %(pat)s LIMIT %(limit)s")
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--db-url", default=os.environ.get("DATABASE_URL"), help="Postgres connection string")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 3_000_000])
+    p.add_argument("--needle-rows", type=int, default=200, help="Messages containing a needle, at every size")
+    p.add_argument("--repeat", type=int, default=30)
+    p.add_argument("--limit", type=int, default=50, help="Page size")
+    p.add_argument("--keep", action="store_true", help="Keep the bench_search schema")
+    p.add_argument("--json", help="Write results to this JSON file")
+    return p.parse_args()
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def search_sql():
+    """The API's search query, against the benchmark table, in psycopg2 paramstyle."""
+    sql = str(MESSAGE_SEARCH_SQL.compile(dialect=postgresql.psycopg2.dialect()))
+    return sql.replace("marts.fct_messages", f"{SCHEMA}.fct_messages")
+
+
+def search_params(q, limit, **overrides):
+    params = {"q": q, "pat": f"%{q}%" if len(q) >= 3 else None, "cid": None, "date_from": None,
+              "date_to": None, "after_rank": None, "after_cid": None, "after_mid": None,
+              "max_candidates": SEARCH_MAX_CANDIDATES, "limit": limit}
+    params.update(overrides)
+    return params
+
+
+def build(conn, size, needle_rows):
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    cur.execute(TABLE_DDL)
+    started = time.perf_counter()
+    cur.execute(FILL_SQL, {"size": size, "every": max(1, size // needle_rows),
+                           "vocab": ENGLISH + AMHARIC, "needles": NEEDLES})
+    for ddl in INDEX_DDL:
+        cur.execute(ddl)
+    cur.execute(f"ANALYZE {SCHEMA}.fct_messages")
+    conn.commit()
+    return time.perf_counter() - started
+
+
+def timed(conn, sql, params, repeat, setup=()):
+    cur = conn.cursor()
+    for stmt in setup:
+        cur.execute(stmt)
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+    latencies = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        latencies.append(time.perf_counter() - t0)
+    conn.rollback()
+    return rows, latencies
+
+
+def cases(conn, sql, limit):
+    """(name, sql, params, setup) for each timed query; page-2 needs page 1's last row."""
+    first = search_params("ibuprofen", limit)
+    cur = conn.cursor()
+    cur.execute(sql, first)
+    page = cur.fetchall()
+    conn.rollback()
+    after = {}
+    if page:
+        last = page[-1]
+        after = {"after_rank": float(last[4]), "after_cid": last[1], "after_mid": last[0]}
+    no_index = ("SET LOCAL enable_bitmapscan = off", "SET LOCAL enable_indexscan = off")
+    return [
+        ("needle-en", sql, first, ()),
+        ("needle-am", sql, search_params("ኢቡፕሮፌን", limit), ()),
+        ("needle+channel", sql, search_params("ibuprofen", limit, cid=1000 + CHANNELS // 2), ()),
+        ("needle-page-2", sql, search_params("ibuprofen", limit, **after), ()),
+        ("common", sql, search_params("sunscreen", limit), ()),
+        ("ilike-seqscan", ILIKE_SQL, {"pat": "%ibuprofen%", "limit": limit}, no_index),
+    ]
+
+
+def main():
+    args = parse_args()
+    if not args.db_url:
+        sys.exit("No database URL provided. Use --db-url or set DATABASE_URL environment variable.")
+    conn = psycopg2.connect(args.db_url)
+    sql = search_sql()
+    results = []
+    try:
+        for size in args.sizes:
+            build_s = build(conn, size, args.needle_rows)
+            print(f"Built {size} messages in {build_s:.1f}s")
+            for name, case_sql, params, setup in cases(conn, sql, args.limit):
+                rows, latencies = timed(conn, case_sql, params, args.repeat, setup)
+                results.append({
+                    "size": size,
+                    "case": name,
+                    "rows": len(rows),
+                    "p50_ms": round(statistics.median(latencies) * 1000, 2),
+                    "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+                })
+    finally:
+        if not args.keep:
+            conn.rollback()
+            conn.cursor().execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+            conn.commit()
+        conn.close()
+
+    print(f"{'messages':>10}  {'case':<16}{'rows':>6}{'p50 ms':>10}{'p95 ms':>10}")
+    for r in results:
+        print(f"{r['size']:>10}  {r['case']:<16}{r['rows']:>6}{r['p50_ms']:>10.2f}{r['p95_ms']:>10.2f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"Wrote results to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Helpers for streaming rows into Postgres with ``COPY ... FROM STDIN``.
+
+Rows are encoded to COPY text format lazily, so a generator of tuples can be
+fed to ``cursor.copy_expert`` without building the whole payload in memory.
+``bytes`` values are taken as already UTF-8 encoded text (e.g. raw JSONL
+lines) and only escaped, never decoded.
+"""
+
+# Bytes requested from the stream per read by copy_expert
+COPY_READ_SIZE = 1 << 20
+
+_COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\n": "\\n", "\r": "\\r", "\t": "\\t"})
+
+
+def copy_text_field(value):
+    """Encode one value for COPY text format (NULL is ``\\N``)."""
+    if value is None:
+        return "\\N"
+    return str(value).translate(_COPY_ESCAPES)
+
+
+def copy_bytes_field(value):
+    """Encode one value as COPY text-format bytes."""
+    if isinstance(value, bytes):
+        value = value.replace(b"\\", b"\\\\")
+        if b"\n" in value or b"\r" in value or b"\t" in value:
+            value = value.replace(b"\n", b"\\n").replace(b"\r", b"\\r").replace(b"\t", b"\\t")
+        return value
+    return copy_text_field(value).encode("utf-8")
+
+
+def copy_text_line(row):
+    return "\t".join(copy_text_field(v) for v in row) + "\n"
+
+
+def copy_line(row):
+    return b"\t".join(copy_bytes_field(v) for v in row) + b"\n"
+
+
+class CopyStream:
+    """File-like wrapper over an iterator of row tuples, read by ``copy_expert``."""
+
+    def __init__(self, rows):
+        self._rows = iter(rows)
+        self._buffer = b""
+        self.rows = 0
+
+    def read(self, size=-1):
+        parts = [self._buffer]
+        length = len(self._buffer)
+        while size < 0 or length < size:
+            try:
+                row = next(self._rows)
+            except StopIteration:
+                break
+            line = copy_line(row)
+            parts.append(line)
+            length += len(line)
+            self.rows += 1
+        data = b"".join(parts)
+        if size < 0:
+            size = len(data)
+        chunk, self._buffer = data[:size], data[size:]
+        return chunk
+
+
+def copy_rows(cur, table, columns, rows):
+    """COPY an iterable of tuples into ``table``; returns the number of rows sent."""
+    stream = CopyStream(rows)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", stream, size=COPY_READ_SIZE)
+    return stream.rows
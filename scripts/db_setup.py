@@ -4,6 +4,13 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Schema changes live as SQL files here (see CONTRIBUTING.md)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations")
+
+def read_migration(name):
+    with open(os.path.join(MIGRATIONS_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
 def get_connection():
     return psycopg2.connect(
         host=os.getenv("DB_HOST", "localhost"),
@@ -26,6 +33,7 @@ def setup_database():
             UNIQUE(channel_name, message_id)
         )
         """,
+        read_migration("0002_create_raw_load_manifest.sql"),
     )
     conn = None
     try:
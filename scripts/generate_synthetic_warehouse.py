@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""Fill a local Postgres with a synthetic corpus and build the dbt marts on it.
+
+Writes --messages pharmacy-style posts (mixed English and Amharic, same
+vocabulary as scripts/bench_search.py) into raw_messages and YOLO-style
+detections for the posts with media into stg_image_detections, then runs
+``dbt run --full-refresh`` so staging and marts (fct_*, dim_*, agg_*) match.
+Channel sizes are skewed (a few large channels, a long tail of small ones)
+and dates spread over the --days before --end-date.
+
+Synthetic rows live beside real ones: channels are named ``synthetic-NNN``
+with channel ids from SYNTHETIC_CHANNEL_BASE, detections carry
+model_weights 'synthetic', and both are replaced on every run. The same
+--seed, --messages, --channels and --end-date give the same warehouse, so
+load tests (scripts/loadtest_api.py) on different commits see the same data.
+
+raw_messages must exist (scripts/db_setup.py or ``alembic upgrade head``).
+
+Usage:
+  python scripts/generate_synthetic_warehouse.py --db-url <DATABASE_URL> [--messages 1000000] \
+      [--channels 50] [--days 365] [--media-ratio 0.35] [--seed 42] [--skip-dbt]
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import subprocess
+from datetime import date, datetime, timedelta
+
+import psycopg2
+from psycopg2.extensions import parse_dsn
+
+# Add root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scripts.copy_loader import copy_rows
+from scripts.bench_search import ENGLISH, AMHARIC, NEEDLES
+from scripts.load_detections import TABLE_DDL as DETECTIONS_DDL
+from src.yolo_detect import CLASS_MAP
+
+SYNTHETIC_CHANNEL_BASE = 9_100_000_000
+CHANNEL_PREFIX = "synthetic-"
+SYNTHETIC_WEIGHTS = "synthetic"
+# Messages generated and copied per round (messages and their detections)
+CHUNK_SIZE = 50000
+DBT_DIR = os.path.join(os.path.dirname(__file__), "..", "medical_warehouse")
+
+MESSAGE_COLUMNS = ("channel_id", "channel_name", "message_id", "message_data", "scraped_at")
+DETECTION_COLUMNS = ("channel_id", "message_id", "image_path", "model_weights", "box_index",
+                     "product_label", "original_label", "score", "detection_timestamp")
+
+DELETE_SQL = (
+    "DELETE FROM public.stg_image_detections WHERE model_weights = %(weights)s",
+    "DELETE FROM public.raw_messages WHERE channel_name LIKE %(prefix)s",
+)
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--db-url", default=os.environ.get("DATABASE_URL"), help="Postgres connection string")
+    p.add_argument("--messages", type=int, default=1_000_000, help="Messages in total (10k to 10M)")
+    p.add_argument("--channels", type=int, default=50)
+    p.add_argument("--days", type=int, default=365, help="Days of history before --end-date")
+    p.add_argument("--end-date", type=date.fromisoformat, default=date.today(),
+                   help="Last message day (default today, so the API's day windows stay populated)")
+    p.add_argument("--media-ratio", type=float, default=0.35, help="Share of messages with an image")
+    p.add_argument("--needle-every", type=int, default=5000, help="Every Nth message mentions a needle term")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    p.add_argument("--skip-dbt", action="store_true", help="Only write the raw tables")
+    return p.parse_args()
+
+
+def channel_id(index):
+    return SYNTHETIC_CHANNEL_BASE + index
+
+
+def channel_name(index):
+    # no underscore: image file names are <channel>_<message_id>.jpg
+    return f"{CHANNEL_PREFIX}{index:03d}"
+
+
+def channel_sizes(messages, channels):
+    """Messages per channel, roughly 1/rank so a few channels hold most of the corpus."""
+    weights = [1 / (i + 1) for i in range(channels)]
+    total = sum(weights)
+    sizes = [max(1, int(messages * w / total)) for w in weights]
+    sizes[0] += messages - sum(sizes)
+    return sizes
+
+
+def message_text(rng, serial, needle_every):
+    words = rng.choices(ENGLISH + AMHARIC, k=rng.randint(6, 14))
+    if serial % needle_every == 0:
+        words.append(NEEDLES[(serial // needle_every) % len(NEEDLES)])
+    words.append(f"{rng.randint(50, 5000)} birr")
+    return " ".join(words)
+
+
+def generate(args):
+    """Yield (message rows, detection rows) per chunk of at most --chunk-size messages."""
+    rng = random.Random(args.seed)
+    labels = sorted(CLASS_MAP)
+    end = datetime.combine(args.end_date, datetime.max.time()).replace(microsecond=0)
+    span = args.days * 86400
+    # one backfill at load time; a scraped_at in the future would make the roll-ups skip later real loads
+    scraped_at = datetime.now().replace(microsecond=0)
+    messages, detections, serial = [], [], 0
+    for index, size in enumerate(channel_sizes(args.messages, args.channels)):
+        cid, name = channel_id(index), channel_name(index)
+        for message_id in range(1, size + 1):
+            serial += 1
+            posted = end - timedelta(seconds=rng.randrange(span))
+            has_media = rng.random() < args.media_ratio
+            views = int(rng.lognormvariate(6, 1.2))
+            data = {
+                "id": message_id,
+                "channel_id": cid,
+                "date": posted.isoformat(),
+                "text": message_text(rng, serial, args.needle_every),
+                "views": views,
+                "forwards": int(views * rng.random() * 0.05),
+                "media": has_media,
+                "sender_id": None,
+                "reply_to": None,
+            }
+            messages.append((cid, name, message_id, json.dumps(data, ensure_ascii=False), scraped_at))
+            if has_media:
+                image_path = f"data/raw/images/{name}/{name}_{message_id}.jpg"
+                for box_index in range(rng.choice((1, 1, 1, 2, 3))):
+                    label = rng.choice(labels)
+                    detections.append((cid, message_id, image_path, SYNTHETIC_WEIGHTS, box_index, CLASS_MAP[label],
+                                       label, round(rng.uniform(0.25, 0.99), 4),
+                                       posted + timedelta(minutes=rng.randint(5, 120))))
+            if len(messages) >= args.chunk_size:
+                yield messages, detections
+                messages, detections = [], []
+    if messages:
+        yield messages, detections
+
+
+def write_raw(conn, args):
+    cur = conn.cursor()
+    cur.execute("SELECT to_regclass('public.raw_messages')")
+    if cur.fetchone()[0] is None:
+        sys.exit("raw_messages does not exist; run scripts/db_setup.py or 'alembic upgrade head' first.")
+    for ddl in DETECTIONS_DDL:
+        cur.execute(ddl)
+    for sql in DELETE_SQL:
+        cur.execute(sql, {"weights": SYNTHETIC_WEIGHTS, "prefix": CHANNEL_PREFIX + "%"})
+    totals = [0, 0]
+    for messages, detections in generate(args):
+        totals[0] += copy_rows(cur, "public.raw_messages", MESSAGE_COLUMNS, messages)
+        totals[1] += copy_rows(cur, "public.stg_image_detections", DETECTION_COLUMNS, detections)
+        print(f"  {totals[0]} messages, {totals[1]} detections", end="\r", flush=True)
+    print()
+    conn.commit()
+    conn.autocommit = True
+    cur.execute("VACUUM ANALYZE public.raw_messages")
+    cur.execute("VACUUM ANALYZE public.stg_image_detections")
+    conn.autocommit = False
+    return totals
+
+
+def run_dbt(db_url):
+    """``dbt run --full-refresh`` against db_url; synthetic rows were replaced, not appended."""
+    dsn = parse_dsn(db_url)
+    env = dict(os.environ, DB_HOST=dsn.get("host", "localhost"), DB_PORT=dsn.get("port", "5432"),
+               DB_USER=dsn.get("user", "postgres"), DB_PASSWORD=dsn.get("password", ""),
+               DB_NAME=dsn.get("dbname", "telegram_db"))
+    subprocess.run(["dbt", "run", "--full-refresh", "--profiles-dir", "."], cwd=DBT_DIR, env=env, check=True)
+
+
+def main():
+    args = parse_args()
+    if not args.db_url:
+        sys.exit("No database URL provided. Use --db-url or set DATABASE_URL environment variable.")
+    conn = psycopg2.connect(args.db_url)
+    try:
+        started = time.perf_counter()
+        messages, detections = write_raw(conn, args)
+        print(f"Wrote {messages} messages and {detections} detections in {time.perf_counter() - started:.1f}s")
+    finally:
+        conn.close()
+    if not args.skip_dbt:
+        started = time.perf_counter()
+        run_dbt(args.db_url)
+        print(f"Built the dbt models in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Tracks which raw partition files have already been loaded into Postgres.
+
+Each loaded file is recorded in ``raw_load_manifest`` with its size, mtime and
+SHA-256. A file whose size and mtime are unchanged is skipped without being
+read; if only the mtime moved, the hash decides whether the content changed.
+"""
+import os
+import hashlib
+
+from scripts.db_setup import read_migration
+
+MANIFEST_DDL = read_migration("0002_create_raw_load_manifest.sql")
+
+HASH_CHUNK = 1 << 20
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class LoadManifest:
+    def __init__(self, cur):
+        self.cur = cur
+        cur.execute(MANIFEST_DDL)
+        cur.execute("SELECT file_path, file_size, file_mtime, content_hash FROM raw_load_manifest")
+        self.entries = {row[0]: row[1:] for row in cur.fetchall()}
+
+    def check(self, key, path, force=False):
+        """Return (needs_load, state) where state is (size, mtime, digest) to record after loading."""
+        st = os.stat(path)
+        previous = self.entries.get(key)
+        if not force and previous and previous[0] == st.st_size and previous[1] == st.st_mtime:
+            return False, None
+        digest = file_digest(path)
+        if not force and previous and previous[0] == st.st_size and previous[2] == digest:
+            # touched but unchanged: remember the new mtime so the next run skips the hash
+            self.record(key, (st.st_size, st.st_mtime, digest), None)
+            return False, None
+        return True, (st.st_size, st.st_mtime, digest)
+
+    def record(self, key, state, message_count):
+        size, mtime, digest = state
+        self.cur.execute(
+            """
+            INSERT INTO raw_load_manifest (file_path, file_size, file_mtime, content_hash, message_count)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (file_path) DO UPDATE
+            SET file_size = EXCLUDED.file_size,
+                file_mtime = EXCLUDED.file_mtime,
+                content_hash = EXCLUDED.content_hash,
+                message_count = COALESCE(EXCLUDED.message_count, raw_load_manifest.message_count),
+                loaded_at = CASE WHEN EXCLUDED.message_count IS NULL
+                                 THEN raw_load_manifest.loaded_at ELSE CURRENT_TIMESTAMP END
+            """,
+            (key, size, mtime, digest, message_count),
+        )
+        self.entries[key] = state
@@ -1,15 +1,136 @@
 import os
-import json
+import re
+import sys
+import time
 import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dotenv import load_dotenv
 
+# Add root to sys.path so src/ and scripts/ resolve when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.message_store import is_partition_file, partition_base, iter_raw_records
+from scripts.copy_loader import copy_rows
+from scripts.load_manifest import LoadManifest
+
 load_dotenv()
 
 DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data", "raw", "telegram_messages")
+# Messages per INSERT batch; bounds loader memory regardless of file size
+BATCH_SIZE = 1000
+# Messages per COPY + merge round in --bulk mode; bounds memory per worker
+BULK_BATCH_SIZE = 50000
+# Parallel --bulk workers, each parsing and loading whole channels
+LOAD_WORKERS = int(os.getenv("LOAD_WORKERS", "1"))
+
+UPSERT_SQL = """
+INSERT INTO raw_messages (channel_id, channel_name, message_id, message_data)
+VALUES %s
+ON CONFLICT (channel_name, message_id) DO UPDATE 
+SET message_data = EXCLUDED.message_data,
+    scraped_at = CURRENT_TIMESTAMP
+"""
+
+# Session-local staging table for --bulk; temp tables are never WAL-logged
+STAGE_TABLE = "raw_messages_stage"
+STAGE_COLUMNS = ("channel_id", "channel_name", "message_id", "message_data")
+STAGE_DDL = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} (
+    seq BIGSERIAL,
+    channel_id BIGINT,
+    channel_name TEXT NOT NULL,
+    message_id INTEGER NOT NULL,
+    message_data JSONB NOT NULL
+)
+"""
+# One set-based upsert per batch; the latest staged copy of a message wins
+MERGE_SQL = f"""
+INSERT INTO raw_messages (channel_id, channel_name, message_id, message_data)
+SELECT DISTINCT ON (channel_name, message_id) channel_id, channel_name, message_id, message_data
+FROM {STAGE_TABLE}
+ORDER BY channel_name, message_id, seq DESC
+ON CONFLICT (channel_name, message_id) DO UPDATE
+SET message_data = EXCLUDED.message_data,
+    scraped_at = CURRENT_TIMESTAMP
+"""
+
+
+def parse_partition_name(filename):
+    """Return (channel_id, channel_name) from a partition filename.
+
+    Filename pattern: <channel_id>_<channel_name>_<date>[.partNNNN].<ext> OR <channel_name>.json
+    """
+    base = partition_base(filename)
+    parts = base.split('_')
+    if len(parts) >= 3 and parts[0].isdigit():
+        # join remaining parts except date
+        return int(parts[0]), '_'.join(parts[1:-1])
+    return None, base
+
+
+_DATE_DIR_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def iter_partition_files(since=None):
+    """Yield (path, filename) for every raw partition under DATA_DIR.
+
+    With ``since`` (YYYY-MM-DD), date directories older than it are not walked.
+    """
+    for root, dirs, files in os.walk(DATA_DIR):
+        dirs[:] = sorted(d for d in dirs if not (since and _DATE_DIR_RE.match(d) and d < since))
+        for file in sorted(files):
+            if is_partition_file(file):
+                yield os.path.join(root, file), file
+
 
+def plan_files(manifest=None, since=None, force=False):
+    """Return ([(path, filename, manifest_key, state), ...], skipped) for files that need loading.
 
-def load_json_to_db(dry_run: bool = False):
-    """Parse JSON files and either print a dry-run summary or load into Postgres."""
+    Files whose manifest entry still matches are skipped unless ``force``;
+    without a manifest (dry runs) every file is planned.
+    """
+    to_load, skipped = [], 0
+    for path, name in iter_partition_files(since):
+        key = os.path.relpath(path, DATA_DIR).replace(os.sep, "/")
+        if manifest is None:
+            to_load.append((path, name, key, None))
+            continue
+        needs_load, state = manifest.check(key, path, force)
+        if needs_load:
+            to_load.append((path, name, key, state))
+        else:
+            skipped += 1
+    return to_load, skipped
+
+
+def iter_message_rows(file_path, filename):
+    """Yield (channel_id, channel_name, message_id, message_json_bytes) rows for one partition."""
+    channel_id, channel_name = parse_partition_name(filename)
+    for msg, text in iter_raw_records(file_path):
+        cid = channel_id
+        if cid is None:
+            cid = msg.get('channel_id')
+        yield cid, channel_name, msg["id"], text
+
+
+def iter_batches(records, size=BATCH_SIZE):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def load_json_to_db(dry_run: bool = False, since: str = None, force: bool = False):
+    """Stream partition files and either print a dry-run summary or load into Postgres.
+
+    Files already recorded in the load manifest are skipped unless they changed
+    or ``force`` is set; ``since`` limits the walk to newer date partitions.
+    """
     if not os.path.exists(DATA_DIR):
         print(f"Data directory {DATA_DIR} does not exist.")
         return
@@ -20,64 +141,46 @@ def load_json_to_db(dry_run: bool = False):
 
     if not dry_run:
         # Lazy import DB helpers only when performing a real load
-        from .db_setup import get_connection
+        from scripts.db_setup import get_connection
         import psycopg2
         from psycopg2.extras import execute_values
         conn = get_connection()
         cur = conn.cursor()
+        manifest = LoadManifest(cur)
 
-    for root, dirs, files in os.walk(DATA_DIR):
-        for file in files:
-            if file.endswith(".json"):
-                total_files += 1
-                file_path = os.path.join(root, file)
-                # Filename pattern: <channel_id>_<channel_name>_<date>.json OR <channel_name>.json
-                base = file.replace('.json', '')
-                parts = base.split('_')
-                channel_id = None
-                channel_name = base
-                if len(parts) >= 3 and parts[0].isdigit():
-                    channel_id = int(parts[0])
-                    # join remaining parts except date
-                    channel_name = '_'.join(parts[1:-1]) if len(parts) > 2 else parts[1]
-                else:
-                    channel_name = base
-
-                with open(file_path, "r", encoding="utf-8") as f:
-                    messages = json.load(f)
-                    total_messages += len(messages)
-
-                    if dry_run:
-                        # collect small sample for inspection
-                        for m in messages[:3]:
-                            sample.append({"channel": channel_name, "id": m.get('id'), "date": m.get('date')})
-                        print(f"[dry-run] Parsed {len(messages)} messages for {channel_name} from {file_path}")
-                        continue
-
-                    # real load
-                    data_to_insert = []
-                    for msg in messages:
-                        cid = channel_id
-                        if cid is None:
-                            cid = msg.get('channel_id')
-                        data_to_insert.append((cid, channel_name, msg["id"], json.dumps(msg)))
-
-                    insert_query = """
-                    INSERT INTO raw_messages (channel_id, channel_name, message_id, message_data)
-                    VALUES %s
-                    ON CONFLICT (channel_name, message_id) DO UPDATE 
-                    SET message_data = EXCLUDED.message_data,
-                        scraped_at = CURRENT_TIMESTAMP
-                    """
-
-                    execute_values(cur, insert_query, data_to_insert)
-                    print(f"Loaded {len(messages)} messages for {channel_name} from {file_path}")
+    files, skipped = plan_files(None if dry_run else manifest, since, force)
+    for file_path, file, key, state in files:
+        total_files += 1
+        channel_id, channel_name = parse_partition_name(file)
+
+        file_messages = 0
+        for batch in iter_batches(iter_message_rows(file_path, file)):
+            file_messages += len(batch)
+
+            if dry_run:
+                # collect small sample for inspection
+                if file_messages == len(batch):
+                    for row in batch[:3]:
+                        sample.append({"channel": channel_name, "id": row[2]})
+                continue
+
+            # real load; a message appended twice to a partition keeps its latest copy,
+            # since one upsert statement may not touch the same row twice
+            data_to_insert = {row[2]: row[:3] + (row[3].decode("utf-8"),) for row in batch}
+            execute_values(cur, UPSERT_SQL, list(data_to_insert.values()))
+
+        total_messages += file_messages
+        if dry_run:
+            print(f"[dry-run] Parsed {file_messages} messages for {channel_name} from {file_path}")
+        else:
+            manifest.record(key, state, file_messages)
+            print(f"Loaded {file_messages} messages for {channel_name} from {file_path}")
 
     if not dry_run:
         conn.commit()
         cur.close()
         conn.close()
-        print("All data loaded successfully.")
+        print(f"Loaded {total_files} files ({total_messages} messages), skipped {skipped} unchanged files.")
     else:
         print(f"Dry-run complete: parsed {total_files} files, {total_messages} messages")
         if sample:
@@ -86,8 +189,156 @@ def load_json_to_db(dry_run: bool = False):
                 print(s)
 
 
+def copy_merge_batches(cur, rows, batch_size=BULK_BATCH_SIZE, progress=None):
+    """COPY ``rows`` into the staging table and merge every ``batch_size`` of them."""
+    total = 0
+    while True:
+        sent = copy_rows(cur, STAGE_TABLE, STAGE_COLUMNS, itertools.islice(rows, batch_size))
+        if not sent:
+            return total
+        cur.execute(MERGE_SQL)
+        cur.execute(f"TRUNCATE {STAGE_TABLE}")
+        total += sent
+        if progress:
+            progress(total)
+
+
+def plan_channels(files):
+    """Group planned files by channel, keeping each channel's files in load order.
+
+    Messages conflict only within a channel (the key is channel_name, message_id),
+    so channels can load in parallel while a message's copies still merge in file order.
+    """
+    channels = {}
+    for path, name, key, state in files:
+        channels.setdefault(parse_partition_name(name)[1], []).append((path, name, key, state))
+    return list(channels.values())
+
+
+def load_channel(files, batch_size=BULK_BATCH_SIZE):
+    """Process-pool worker: load one channel's partitions, in order, over its own connection.
+
+    Raw JSONL bytes go straight from the files into COPY; the worker commits
+    its own transaction and returns the number of messages loaded per file.
+    """
+    from scripts.db_setup import get_connection
+    counts = []
+
+    def counted_rows(path, name):
+        counts.append(0)
+        for row in iter_message_rows(path, name):
+            counts[-1] += 1
+            yield row
+
+    conn = get_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(STAGE_DDL)
+        rows = itertools.chain.from_iterable(counted_rows(path, name) for path, name in files)
+        copy_merge_batches(cur, rows, batch_size)
+        conn.commit()
+        cur.close()
+        return counts
+    finally:
+        conn.close()
+
+
+def bulk_load(batch_size: int = BULK_BATCH_SIZE, since: str = None, force: bool = False,
+              workers: int = LOAD_WORKERS):
+    """Stream every partition into a temp table with COPY and merge it into raw_messages.
+
+    Each round COPYs up to ``batch_size`` messages and then runs one set-based
+    ``INSERT ... ON CONFLICT`` from the staging table, so the load costs a
+    handful of statements per batch instead of a round trip per page.
+    Unchanged files are skipped via the load manifest, as in load_json_to_db.
+    With ``workers`` > 1 channels are loaded concurrently by a process pool,
+    each worker streaming one channel's partitions in order, at most
+    ``batch_size`` rows at a time, so the latest copy of a message wins as in
+    a serial load.
+    """
+    if not os.path.exists(DATA_DIR):
+        print(f"Data directory {DATA_DIR} does not exist.")
+        return
+
+    from scripts.db_setup import get_connection
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(STAGE_DDL)
+    manifest = LoadManifest(cur)
+
+    started = time.perf_counter()
+    files, skipped = plan_files(manifest, since, force)
+    if workers > 1:
+        # Commit the manifest reads (and touched-file updates) before workers start
+        conn.commit()
+        total = 0
+        pool = ProcessPoolExecutor(max_workers=workers)
+        try:
+            futures = {pool.submit(load_channel, [(path, name) for path, name, _, _ in channel], batch_size): channel
+                       for channel in plan_channels(files)}
+            for future in as_completed(futures):
+                channel = futures[future]
+                counts = future.result()
+                # Each worker committed its own data; record the files once that succeeded
+                for (path, name, key, state), count in zip(channel, counts):
+                    manifest.record(key, state, count)
+                conn.commit()
+                total += sum(counts)
+                elapsed = time.perf_counter() - started
+                print(f"Loaded {sum(counts)} messages from {len(channel)} files of "
+                      f"{parse_partition_name(channel[0][1])[1]} ({total / elapsed:,.0f} rows/s overall)")
+        finally:
+            # on a failed channel, do not wait for the queued ones
+            pool.shutdown(cancel_futures=True)
+            cur.close()
+            conn.close()
+        elapsed = time.perf_counter() - started
+        rate = total / elapsed if elapsed else 0.0
+        print(f"Bulk loaded {total} messages from {len(files)} files with {workers} workers in {elapsed:.1f}s "
+              f"({rate:,.0f} rows/s), skipped {skipped} unchanged files")
+        return
+
+    file_counts = {}
+
+    def counted_rows(path, name, key):
+        n = 0
+        for row in iter_message_rows(path, name):
+            n += 1
+            yield row
+        file_counts[key] = n
+
+    rows = itertools.chain.from_iterable(counted_rows(path, name, key) for path, name, key, _ in files)
+    total = copy_merge_batches(
+        cur, rows, batch_size,
+        progress=lambda n: print(f"Merged {n} messages ({n / (time.perf_counter() - started):,.0f} rows/s)"),
+    )
+
+    # Manifest rows commit together with the data they describe
+    for path, name, key, state in files:
+        manifest.record(key, state, file_counts.get(key, 0))
+    conn.commit()
+    cur.close()
+    conn.close()
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed else 0.0
+    print(f"Bulk loaded {total} messages from {len(files)} files in {elapsed:.1f}s ({rate:,.0f} rows/s), "
+          f"skipped {skipped} unchanged files")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('--dry-run', action='store_true', help='Parse files but do not write to DB')
+    parser.add_argument('--bulk', action='store_true',
+                        help='COPY into a temp staging table and merge with one upsert per batch')
+    parser.add_argument('--batch-size', type=int, default=BULK_BATCH_SIZE,
+                        help='Messages per COPY + merge round in --bulk mode')
+    parser.add_argument('--workers', type=int, default=LOAD_WORKERS,
+                        help='Parallel --bulk worker processes (one channel per task)')
+    parser.add_argument('--since', help='Only walk date partitions on or after YYYY-MM-DD')
+    parser.add_argument('--force', action='store_true',
+                        help='Reload files even if the load manifest says they are unchanged')
     args = parser.parse_args()
-    load_json_to_db(dry_run=args.dry_run)
+    if args.bulk and not args.dry_run:
+        bulk_load(batch_size=args.batch_size, since=args.since, force=args.force, workers=args.workers)
+    else:
+        load_json_to_db(dry_run=args.dry_run, since=args.since, force=args.force)
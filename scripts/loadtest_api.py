@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""Load-test the API at a fixed concurrency and keep the results per commit.
+
+Each endpoint (/top-products, /channel-activity, /message-search,
+/visual-content) is driven in turn by --concurrency workers for --duration
+seconds after --warmup seconds. Every worker loops over randomized requests:
+channel filters use the channels of scripts/generate_synthetic_warehouse.py,
+search terms its vocabulary, and paginated endpoints follow X-Next-Cursor on
+part of the requests. The request mix is fixed by --seed. Reported per
+endpoint: requests, errors (non-2xx or transport), requests/s and
+p50/p95/p99/max latency.
+
+Results go to <results-dir>/<UTC timestamp>_<commit>.json with the commit,
+arguments and the API's /cache/stats. --compare prints the change against an
+earlier results file and exits 1 when a p95 regressed by more than
+--max-regression percent; with two files it only compares them.
+
+Run against a warehouse built by generate_synthetic_warehouse.py with the
+same arguments on every commit, and one uvicorn worker so /metrics and
+/cache/stats describe the whole run. /top-products and /channel-activity are
+served from the result cache after the first request per parameter set;
+start the API with API_CACHE_MAX_ENTRIES=0 to load the database instead. The
+client is one asyncio process: keep it on its own cores, and compare only
+runs made on the same machine.
+
+Usage:
+  python scripts/loadtest_api.py [--base-url http://localhost:8000] [--concurrency 16] [--duration 30] \
+      [--endpoints top-products message-search] [--compare reports/loadtest/<earlier>.json]
+  python scripts/loadtest_api.py --compare <baseline>.json <candidate>.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import subprocess
+from collections import Counter
+from datetime import datetime, timezone
+
+import httpx
+
+# Add root to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scripts.bench_search import ENGLISH, AMHARIC, NEEDLES
+from scripts.generate_synthetic_warehouse import channel_id
+from src.yolo_detect import CLASS_MAP
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "..", "reports", "loadtest")
+CURSOR_HEADER = "X-Next-Cursor"
+# Share of requests that fetch the next page when the previous response had one
+FOLLOW_CURSOR = 0.3
+LABELS = sorted(set(CLASS_MAP.values()))
+SEARCH_TERMS = ENGLISH + AMHARIC + NEEDLES + ["paracetamol syrup", "vitamin -cream", '"original box"']
+
+
+def parse_args():
+    p = argparse.ArgumentParser()
+    p.add_argument("--base-url", default="http://localhost:8000")
+    p.add_argument("--endpoints", nargs="+", choices=list(SCENARIOS), default=list(SCENARIOS))
+    p.add_argument("--concurrency", type=int, default=16, help="Requests in flight per endpoint")
+    p.add_argument("--duration", type=float, default=30, help="Measured seconds per endpoint")
+    p.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds per endpoint")
+    p.add_argument("--channels", type=int, default=50, help="Synthetic channels to filter on (as generated)")
+    p.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds")
+    p.add_argument("--seed", type=int, default=42)
+    p.add_argument("--results-dir", default=RESULTS_DIR)
+    p.add_argument("--compare", nargs="+", metavar="RESULTS_JSON",
+                   help="Baseline results file; with a second file, compare the two without running")
+    p.add_argument("--max-regression", type=float, default=10.0, help="Allowed p95 increase in percent")
+    return p.parse_args()
+
+
+def maybe(rng, value, share=0.5):
+    return value if rng.random() < share else None
+
+
+def top_products(rng, channels):
+    return "/top-products", {"limit": rng.choice((5, 10, 20)),
+                             "channel_id": maybe(rng, channel_id(rng.randrange(channels))),
+                             "days": rng.choice((None, 7, 30, 365))}
+
+
+def channel_activity(rng, channels):
+    granularity = rng.choice(("hour", "day", "day", "week"))
+    days = rng.choice((2, 7)) if granularity == "hour" else rng.choice((30, 90, 365))
+    return "/channel-activity", {"channel_id": maybe(rng, channel_id(rng.randrange(channels)), 0.7),
+                                 "days": days, "granularity": granularity}
+
+
+def message_search(rng, channels):
+    return "/message-search", {"q": rng.choice(SEARCH_TERMS), "limit": rng.choice((20, 50)),
+                               "channel_id": maybe(rng, channel_id(rng.randrange(channels)), 0.3)}
+
+
+def visual_content(rng, channels):
+    return "/visual-content", {"label": maybe(rng, rng.choice(LABELS), 0.7), "limit": rng.choice((50, 100))}
+
+
+# endpoint -> request factory (rng, channels) -> (path, params)
+SCENARIOS = {
+    "top-products": top_products,
+    "channel-activity": channel_activity,
+    "message-search": message_search,
+    "visual-content": visual_content,
+}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(latencies, statuses, elapsed):
+    ok = sum(n for status, n in statuses.items() if isinstance(status, int) and 200 <= status < 300)
+    summary = {
+        "requests": len(latencies),
+        "errors": len(latencies) - ok,
+        "statuses": {str(status): n for status, n in sorted(statuses.items(), key=str)},
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+    }
+    if latencies:
+        for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99), ("max", 1.0)):
+            summary[f"{name}_ms"] = round(percentile(latencies, q) * 1000, 2)
+    return summary
+
+
+async def run_endpoint(client, name, args):
+    factory = SCENARIOS[name]
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    stop_at = measure_from + args.duration
+    latencies, statuses = [], Counter()
+
+    async def worker(index):
+        rng = random.Random(f"{args.seed}:{name}:{index}")
+        follow = None
+        while time.perf_counter() < stop_at:
+            path, params = follow or factory(rng, args.channels)
+            params = {k: v for k, v in params.items() if v is not None}
+            t0 = time.perf_counter()
+            try:
+                response = await client.get(path, params=params)
+                status, cursor = response.status_code, response.headers.get(CURSOR_HEADER)
+            except httpx.HTTPError as exc:
+                status, cursor = type(exc).__name__, None
+            if t0 >= measure_from:
+                latencies.append(time.perf_counter() - t0)
+                statuses[status] += 1
+            follow = (path, dict(params, cursor=cursor)) if cursor and rng.random() < FOLLOW_CURSOR else None
+
+    await asyncio.gather(*(worker(i) for i in range(args.concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - measure_from)
+
+
+async def run(args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        ready = await client.get("/ready")
+        if ready.status_code != 200:
+            sys.exit(f"API not ready: {ready.status_code} {ready.text}")
+        results = {}
+        for name in args.endpoints:
+            results[name] = await run_endpoint(client, name, args)
+            print_summary(name, results[name])
+        try:
+            cache = (await client.get("/cache/stats")).json()
+        except (httpx.HTTPError, ValueError):
+            cache = None
+    return results, cache
+
+
+def git_revision():
+    root = os.path.join(os.path.dirname(__file__), "..")
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=root,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, dirty
+
+
+def print_summary(name, r):
+    latency = "".join(f"{r.get(f'{q}_ms', 0):>10.1f}" for q in ("p50", "p95", "p99", "max"))
+    print(f"{name:<18}{r['requests']:>9}{r['errors']:>8}{r['rps']:>10.1f}{latency}")
+
+
+def compare(baseline, candidate, max_regression):
+    """Print the change per endpoint; returns the endpoints whose p95 rose by more than max_regression %."""
+    print(f"{baseline['commit']} -> {candidate['commit']}")
+    print(f"{'endpoint':<18}{'metric':<8}{'before':>10}{'after':>10}{'change':>9}")
+    regressed = []
+    for name, after in candidate["results"].items():
+        before = baseline["results"].get(name)
+        if not before:
+            continue
+        for metric in ("rps", "p50_ms", "p95_ms", "p99_ms"):
+            old, new = before.get(metric), after.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            print(f"{name:<18}{metric:<8}{old:>10.1f}{new:>10.1f}{change:>+8.1f}%")
+            if metric == "p95_ms" and change > max_regression:
+                regressed.append(name)
+    return regressed
+
+
+def load_results(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    args = parse_args()
+    if args.compare and len(args.compare) == 2:
+        regressed = compare(load_results(args.compare[0]), load_results(args.compare[1]), args.max_regression)
+        sys.exit(1 if regressed else 0)
+
+    commit, dirty = git_revision()
+    print(f"{'endpoint':<18}{'requests':>9}{'errors':>8}{'req/s':>10}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    results, cache = asyncio.run(run(args))
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    report = {
+        "commit": commit + ("-dirty" if dirty else ""),
+        "timestamp": stamp,
+        "args": {k: v for k, v in vars(args).items() if k not in ("compare", "results_dir")},
+        "cache": cache,
+        "results": results,
+    }
+    os.makedirs(args.results_dir, exist_ok=True)
+    path = os.path.join(args.results_dir, f"{stamp}_{report['commit']}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote results to {path}")
+
+    if args.compare:
+        regressed = compare(load_results(args.compare[0]), report, args.max_regression)
+        if regressed:
+            sys.exit(f"p95 regressed by more than {args.max_regression}% on: {', '.join(regressed)}")
+
+
+if __name__ == "__main__":
+    main()
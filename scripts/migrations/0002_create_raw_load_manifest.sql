@@ -0,0 +1,9 @@
+-- Raw partition files already loaded by scripts/load_raw.py (see scripts/load_manifest.py)
+CREATE TABLE IF NOT EXISTS raw_load_manifest (
+  file_path TEXT PRIMARY KEY,
+  file_size BIGINT NOT NULL,
+  file_mtime DOUBLE PRECISION NOT NULL,
+  content_hash TEXT NOT NULL,
+  message_count INTEGER,
+  loaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
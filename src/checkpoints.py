@@ -0,0 +1,74 @@
+import os
+import json
+from datetime import datetime
+
+# Per-channel high-water marks for incremental scraping. Stored as a small
+# JSON file next to the raw message partitions so it travels with the data.
+# Photos queued for download are kept as pending message ids until the image
+# is on disk, so a failed or interrupted download is re-fetched on a later run
+# even though the high-water mark has moved past its message.
+CHECKPOINT_PATH = "data/raw/scrape_checkpoints.json"
+# How many run records are kept per channel
+RUN_HISTORY = 30
+
+
+class CheckpointStore:
+    """Records the last message id seen per channel and a short run history."""
+
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = path
+        self.channels = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.channels = json.load(f).get("channels", {})
+
+    def last_message_id(self, channel_id):
+        entry = self.channels.get(str(channel_id))
+        return entry["last_message_id"] if entry else None
+
+    def pending_media(self, channel_id):
+        """Message ids whose photo was queued but is not known to be downloaded."""
+        entry = self.channels.get(str(channel_id))
+        return list(entry.get("pending_media", [])) if entry else []
+
+    def record_run(self, channel_id, channel_name, last_message_id, fetched, full_refresh=False, media_ids=()):
+        """Advance the high-water mark for a channel and log how much was fetched.
+
+        ``media_ids`` are the messages whose photo was queued in this run; they
+        stay pending until ``resolve_media`` is called for them.
+        """
+        entry = self.channels.setdefault(str(channel_id), {"last_message_id": None, "runs": []})
+        previous = entry["last_message_id"]
+        if last_message_id is not None and (full_refresh or previous is None or last_message_id > previous):
+            entry["last_message_id"] = last_message_id
+        if media_ids:
+            entry["pending_media"] = sorted(set(entry.get("pending_media", [])) | set(media_ids))
+        entry["channel_name"] = channel_name
+        entry["updated_at"] = datetime.utcnow().isoformat()
+        entry["runs"].append({
+            "finished_at": entry["updated_at"],
+            "min_id": None if full_refresh else previous,
+            "fetched": fetched,
+            "full_refresh": full_refresh,
+        })
+        del entry["runs"][:-RUN_HISTORY]
+        self.save()
+
+    def resolve_media(self, channel_id, message_ids):
+        """Forget pending photos that were downloaded or can no longer be fetched."""
+        entry = self.channels.get(str(channel_id))
+        if not entry or not message_ids:
+            return
+        done = set(message_ids)
+        pending = [m for m in entry.get("pending_media", []) if m not in done]
+        if len(pending) != len(entry.get("pending_media", [])):
+            entry["pending_media"] = pending
+            self.save()
+
+    def save(self):
+        # Write to a temp file and rename so a crash never leaves a truncated store
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"channels": self.channels}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
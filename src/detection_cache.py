@@ -0,0 +1,144 @@
+import os
+import json
+import sqlite3
+import hashlib
+
+# Persistent cache of per-image detections so nightly inference only pays for
+# new images (or a new model). Entries are keyed by the image content hash,
+# the weights file hash and the confidence threshold.
+CACHE_PATH = "data/derived/detection_cache.sqlite"
+HASH_CHUNK = 1 << 20
+# Seconds a writer waits for another process (e.g. a second detection service worker) to commit
+BUSY_TIMEOUT = 30
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS detections (
+        image_sha256 TEXT NOT NULL,
+        weights_sha256 TEXT NOT NULL,
+        conf REAL NOT NULL,
+        detections TEXT NOT NULL,
+        created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (image_sha256, weights_sha256, conf)
+    )
+    """,
+    # remembers the digest of a path at a given size/mtime so unchanged files are not re-read
+    """
+    CREATE TABLE IF NOT EXISTS file_hashes (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        sha256 TEXT NOT NULL
+    )
+    """,
+    # perceptual hashes for near-duplicate clustering (src/image_dedup.py), by content digest
+    """
+    CREATE TABLE IF NOT EXISTS perceptual_hashes (
+        image_sha256 TEXT PRIMARY KEY,
+        dhash TEXT NOT NULL
+    )
+    """,
+)
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class DetectionCache:
+    """SQLite-backed detections cache for one (weights, conf) pair.
+
+    ``get`` returns the cached list of ``(original_label, score)`` for an
+    image, or None on a miss; ``put`` stores the model's output. Hits and
+    misses are counted for the run summary. ``weights=None`` opens the cache
+    for file and perceptual hashes only.
+    """
+
+    def __init__(self, weights, conf, path=CACHE_PATH, backend='torch'):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT)
+        # readers do not block the writer, so several workers can share one cache file
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        for ddl in SCHEMA:
+            self.conn.execute(ddl)
+        # weights that ultralytics downloads on first use may not exist yet; key on the name then
+        if weights is None:
+            self.weights_sha256 = None
+        elif os.path.exists(weights):
+            self.weights_sha256 = self.digest(weights)
+        else:
+            self.weights_sha256 = hashlib.sha256(os.path.basename(weights).encode("utf-8")).hexdigest()
+        if weights is not None and backend != "torch":
+            # an ONNX / quantized run of the same weights can detect differently
+            self.weights_sha256 = hashlib.sha256(f"{self.weights_sha256}:{backend}".encode("utf-8")).hexdigest()
+        self.conf = float(conf)
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def digest(self, path):
+        """Content hash of ``path``, reusing the stored one while size and mtime are unchanged."""
+        path = str(path)
+        st = os.stat(path)
+        row = self.conn.execute("SELECT size, mtime, sha256 FROM file_hashes WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == st.st_size and row[1] == st.st_mtime:
+            return row[2]
+        digest = file_digest(path)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO file_hashes (path, size, mtime, sha256) VALUES (?, ?, ?, ?)",
+            (path, st.st_size, st.st_mtime, digest),
+        )
+        return digest
+
+    def get(self, image_sha256):
+        row = self.conn.execute(
+            "SELECT detections FROM detections WHERE image_sha256 = ? AND weights_sha256 = ? AND conf = ?",
+            (image_sha256, self.weights_sha256, self.conf),
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [tuple(d) for d in json.loads(row[0])]
+
+    def put(self, image_sha256, detections):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO detections (image_sha256, weights_sha256, conf, detections) VALUES (?, ?, ?, ?)",
+            (image_sha256, self.weights_sha256, self.conf, json.dumps([list(d) for d in detections])),
+        )
+
+    def get_dhash(self, image_sha256):
+        row = self.conn.execute("SELECT dhash FROM perceptual_hashes WHERE image_sha256 = ?",
+                                (image_sha256,)).fetchone()
+        # stored as hex text: a 64-bit hash does not fit SQLite's signed INTEGER
+        return int(row[0], 16) if row else None
+
+    def put_dhash(self, image_sha256, value):
+        self.conn.execute("INSERT OR REPLACE INTO perceptual_hashes (image_sha256, dhash) VALUES (?, ?)",
+                          (image_sha256, f"{value:016x}"))
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def summary(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
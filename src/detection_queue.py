@@ -0,0 +1,90 @@
+import os
+import time
+
+# File-based job queue between the scraper and the resident detection worker
+# (src/detection_service.py). A job is a small file holding one image path:
+#   <queue_dir>/incoming/<enqueued_ns>-<pid>-<image name>.job   waiting
+#   <queue_dir>/processing/...                                   claimed by a worker
+#   <queue_dir>/failed/...                                       gave up on it
+# Every transition is an os.rename within the queue directory, so a job is
+# claimed by exactly one worker and a crash never leaves a half-written job.
+
+QUEUE_DIR = "data/queue/detect"
+JOB_SUFFIX = ".job"
+
+
+def _dir(queue_dir, state):
+    path = os.path.join(queue_dir, state)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def enqueue(image_path, queue_dir=QUEUE_DIR):
+    """Add a detection job for ``image_path``; returns the job file path."""
+    name = f"{time.time_ns()}-{os.getpid()}-{os.path.basename(image_path)}{JOB_SUFFIX}"
+    tmp_path = os.path.join(_dir(queue_dir, "tmp"), name)
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(str(image_path))
+    job = os.path.join(_dir(queue_dir, "incoming"), name)
+    os.replace(tmp_path, job)
+    return job
+
+
+def enqueued_at(job):
+    """Enqueue time (epoch seconds) encoded in the job's file name."""
+    try:
+        return int(os.path.basename(job).split("-", 1)[0]) / 1e9
+    except ValueError:
+        return os.path.getmtime(job)
+
+
+def read_job(job):
+    with open(job, encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def pending(queue_dir=QUEUE_DIR):
+    incoming = _dir(queue_dir, "incoming")
+    return len([n for n in os.listdir(incoming) if n.endswith(JOB_SUFFIX)])
+
+
+def claim(queue_dir=QUEUE_DIR, limit=16):
+    """Move up to ``limit`` of the oldest incoming jobs to processing/ and return their paths."""
+    incoming = _dir(queue_dir, "incoming")
+    processing = _dir(queue_dir, "processing")
+    claimed = []
+    for name in sorted(n for n in os.listdir(incoming) if n.endswith(JOB_SUFFIX)):
+        if len(claimed) >= limit:
+            break
+        target = os.path.join(processing, name)
+        try:
+            os.rename(os.path.join(incoming, name), target)
+        except FileNotFoundError:
+            # another worker claimed it first
+            continue
+        # claim time, which requeue_stale measures from
+        os.utime(target)
+        claimed.append(target)
+    return claimed
+
+
+def complete(job):
+    os.remove(job)
+
+
+def fail(job, queue_dir=QUEUE_DIR):
+    os.replace(job, os.path.join(_dir(queue_dir, "failed"), os.path.basename(job)))
+
+
+def requeue_stale(queue_dir=QUEUE_DIR, older_than=300):
+    """Return jobs stuck in processing/ (their worker died) to incoming/."""
+    processing = _dir(queue_dir, "processing")
+    incoming = _dir(queue_dir, "incoming")
+    cutoff = time.time() - older_than
+    moved = 0
+    for name in os.listdir(processing):
+        path = os.path.join(processing, name)
+        if os.path.getmtime(path) < cutoff:
+            os.replace(path, os.path.join(incoming, name))
+            moved += 1
+    return moved
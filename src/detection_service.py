@@ -0,0 +1,215 @@
+import os
+import re
+import sys
+import time
+import signal
+import socket
+import logging
+import argparse
+from datetime import datetime
+
+# Add root to sys.path so sibling modules resolve when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import detection_queue
+from src.detection_cache import DetectionCache, CACHE_PATH
+from src.detection_writer import DetectionWriter, default_format
+from src.inference_backends import BACKENDS, load_backend, model_weights_name
+from src.yolo_detect import (OUTPUT_DIR, IMG_SIZE, BATCH_SIZE, DECODE_WORKERS,
+                             detection_rows, infer_images, pin_threads)
+
+# Resident detection worker: loads the model once, then drains the file queue
+# in src/detection_queue.py (fed by the scraper's downloader) in micro-batches.
+# A batch is processed as soon as it is full or MAX_WAIT seconds after its
+# first job arrived, and its rows are flushed to disk before the jobs are
+# acknowledged, so new images are detected within seconds of download.
+# Output goes to OUTPUT_DIR/service_<YYYYMMDD>/ in the same part-file layout
+# as batch runs, which scripts/load_detections.py reads directly. Several
+# workers can share one queue and output directory: each writes its own
+# part-<worker_id>-NNNNN files and _manifest-<worker_id>.txt, with the
+# worker id defaulting to <hostname>-<pid>.
+
+MAX_WAIT = 2.0
+POLL_INTERVAL = 0.5
+# A claimed job older than this is assumed orphaned by a dead worker
+STALE_AFTER = 300
+
+logger = logging.getLogger("detection_service")
+
+
+def default_worker_id():
+    # part file names are split on '.', so keep the id to letters, digits and dashes
+    return re.sub(r"[^A-Za-z0-9]+", "-", f"{socket.gethostname()}-{os.getpid()}")
+
+
+class DetectionService:
+    def __init__(self, weights, device='cpu', conf_thresh=0.25, backend='torch',
+                 queue_dir=detection_queue.QUEUE_DIR, output_dir=OUTPUT_DIR, batch_size=BATCH_SIZE,
+                 max_wait=MAX_WAIT, poll_interval=POLL_INTERVAL, fmt=None, cache_path=CACHE_PATH,
+                 workers=DECODE_WORKERS, threads=None, worker_id=None):
+        self.weights = weights
+        self.device = device
+        self.conf_thresh = conf_thresh
+        self.backend_kind = backend
+        self.queue_dir = queue_dir
+        self.output_dir = output_dir
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.poll_interval = poll_interval
+        self.fmt = fmt or default_format()
+        self.cache_path = cache_path
+        self.workers = workers
+        self.threads = threads
+        self.worker_id = worker_id or default_worker_id()
+        self.model_weights = model_weights_name(backend, weights)
+        self.backend = None
+        self.cache = None
+        self.writer = None
+        self._writer_day = None
+        self._stop = False
+        self.stats = {"batches": 0, "images": 0, "cache_hits": 0, "failed": 0, "detections": 0}
+
+    def start(self):
+        started = time.perf_counter()
+        pin_threads(self.threads)
+        self.backend = load_backend(self.backend_kind, self.weights, self.device, self.conf_thresh, IMG_SIZE)
+        if self.cache_path:
+            self.cache = DetectionCache(self.weights, self.conf_thresh, self.cache_path, self.backend_kind)
+        requeued = detection_queue.requeue_stale(self.queue_dir, STALE_AFTER)
+        if requeued:
+            logger.info(f"Requeued {requeued} orphaned jobs")
+        logger.info(f"Model {self.model_weights} ({self.backend_kind}) ready in {time.perf_counter() - started:.1f}s; "
+                    f"watching {self.queue_dir}")
+
+    def stop(self, *_):
+        self._stop = True
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.cache is not None:
+            self.cache.close()
+
+    def _current_writer(self):
+        # one run directory per UTC day keeps part files and manifests bounded
+        day = datetime.utcnow().strftime("%Y%m%d")
+        if day != self._writer_day:
+            if self.writer is not None:
+                self.writer.close()
+            run_dir = os.path.join(self.output_dir, f"service_{day}")
+            # rows are flushed per batch, never held back for a chunk to fill
+            self.writer = DetectionWriter(run_dir, self.fmt, chunk_rows=sys.maxsize, shard=self.worker_id)
+            self._writer_day = day
+        return self.writer
+
+    def collect(self):
+        """Claim jobs until a batch is full or max_wait has passed since the first one."""
+        jobs = []
+        deadline = None
+        while not self._stop:
+            jobs += detection_queue.claim(self.queue_dir, self.batch_size - len(jobs))
+            if jobs and deadline is None:
+                deadline = time.monotonic() + self.max_wait
+            if len(jobs) >= self.batch_size or (deadline is not None and time.monotonic() >= deadline):
+                break
+            wait = self.poll_interval if deadline is None else min(self.poll_interval, deadline - time.monotonic())
+            time.sleep(max(0.0, wait))
+        return jobs
+
+    def process(self, jobs):
+        """Detect the images of ``jobs``, flush their rows, then acknowledge the jobs."""
+        writer = self._current_writer()
+        by_path = {}
+        to_infer = []
+        for job in jobs:
+            image_path = detection_queue.read_job(job)
+            if not os.path.exists(image_path):
+                logger.warning(f"Image for job {os.path.basename(job)} is missing: {image_path}")
+                detection_queue.fail(job, self.queue_dir)
+                self.stats["failed"] += 1
+                continue
+            by_path.setdefault(image_path, []).append(job)
+        digests = {}
+        for image_path in by_path:
+            if self.cache is not None:
+                digests[image_path] = self.cache.digest(image_path)
+                cached = self.cache.get(digests[image_path])
+                if cached is not None:
+                    writer.add(image_path, detection_rows(image_path, cached, self.model_weights))
+                    self.stats["cache_hits"] += 1
+                    self.stats["detections"] += len(cached)
+                    continue
+            to_infer.append(image_path)
+
+        done = set(by_path) - set(to_infer)
+        inferred = infer_images(self.backend, to_infer, self.batch_size, self.workers) if to_infer else []
+        for image_path, detections in inferred:
+            image_path = str(image_path)
+            writer.add(image_path, detection_rows(image_path, detections, self.model_weights))
+            if self.cache is not None:
+                self.cache.put(digests[image_path], detections)
+            self.stats["detections"] += len(detections)
+            done.add(image_path)
+        writer.flush()
+        if self.cache is not None:
+            self.cache.commit()
+
+        now = time.time()
+        latencies = []
+        for image_path, path_jobs in by_path.items():
+            for job in path_jobs:
+                if image_path in done:
+                    latencies.append(now - detection_queue.enqueued_at(job))
+                    detection_queue.complete(job)
+                else:
+                    # undecodable or the batch failed in the model
+                    detection_queue.fail(job, self.queue_dir)
+                    self.stats["failed"] += 1
+        self.stats["batches"] += 1
+        self.stats["images"] += len(done)
+        if latencies:
+            logger.info(f"Batch of {len(done)} images ({len(to_infer)} inferred), "
+                        f"enqueue-to-written max {max(latencies):.1f}s")
+        return len(done)
+
+    def serve(self, drain=False):
+        """Process batches until stopped (SIGINT/SIGTERM), or until the queue is empty with ``drain``."""
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGTERM, self.stop)
+        self.start()
+        try:
+            while not self._stop:
+                if drain and not detection_queue.pending(self.queue_dir):
+                    break
+                jobs = self.collect()
+                if jobs:
+                    self.process(jobs)
+        finally:
+            self.close()
+        logger.info(f"Stopped: {self.stats}")
+        return self.stats
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description='Resident YOLO worker fed by the detection queue')
+    parser.add_argument('--weights', required=True)
+    parser.add_argument('--device', default='cpu')
+    parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--backend', choices=BACKENDS, default='torch')
+    parser.add_argument('--queue', default=detection_queue.QUEUE_DIR, help='Queue directory')
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Max images per micro-batch')
+    parser.add_argument('--max-wait', type=float, default=MAX_WAIT,
+                        help='Seconds to wait for a batch to fill after its first job')
+    parser.add_argument('--workers', type=int, default=DECODE_WORKERS, help='Image decoding threads')
+    parser.add_argument('--threads', type=int, default=None, help='Torch threads')
+    parser.add_argument('--format', choices=['parquet', 'arrow', 'csv'], default=None)
+    parser.add_argument('--cache', default=CACHE_PATH, help='SQLite detection cache path')
+    parser.add_argument('--no-cache', action='store_true')
+    parser.add_argument('--drain', action='store_true', help='Exit once the queue is empty')
+    parser.add_argument('--worker-id', default=None, help='Part/manifest name of this worker (default host-pid)')
+    args = parser.parse_args()
+    DetectionService(args.weights, args.device, args.conf, args.backend, args.queue,
+                     batch_size=args.batch_size, max_wait=args.max_wait, fmt=args.format,
+                     cache_path=None if args.no_cache else args.cache, workers=args.workers,
+                     threads=args.threads, worker_id=args.worker_id).serve(drain=args.drain)
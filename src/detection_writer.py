@@ -0,0 +1,205 @@
+import os
+import csv
+from datetime import datetime
+
+# Detections are written incrementally into a run directory:
+#   <run_dir>/part-00000.parquet, part-00001.parquet, ...   (or .arrow / .csv)
+#   <run_dir>/_manifest.txt   image paths whose rows are safely in a part file
+#   <run_dir>/_SUCCESS        written once the run finished
+# Sharded runs write part-sNNN-00000.* and _manifest-sNNN.txt per worker;
+# merge_manifests folds those into _manifest.txt at the end. A killed run is
+# resumed by skipping every image listed in the manifests. Writers that share
+# a run directory without a shard number (detection service workers) use a
+# name as their shard instead: part-<name>-00000.*, _manifest-<name>.txt.
+
+DETECTION_FIELDS = ['channel_id', 'message_id', 'image_path', 'model_weights', 'box_index',
+                    'product_label', 'original_label', 'score', 'detection_timestamp']
+FORMAT_SUFFIXES = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+# Rows (or images) buffered before a part file is written
+CHUNK_ROWS = 5000
+MANIFEST = '_manifest.txt'
+SUCCESS = '_SUCCESS'
+
+
+def _require_pyarrow(fmt):
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError(f"{fmt} output requires the 'pyarrow' package")
+    return pyarrow
+
+
+def default_format():
+    """Parquet when pyarrow is installed, CSV otherwise."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return 'csv'
+    return 'parquet'
+
+
+def arrow_schema():
+    pa = _require_pyarrow('parquet')
+    return pa.schema([
+        ('channel_id', pa.string()),
+        ('message_id', pa.int64()),
+        ('image_path', pa.string()),
+        ('model_weights', pa.string()),
+        ('box_index', pa.int32()),
+        ('product_label', pa.string()),
+        ('original_label', pa.string()),
+        ('score', pa.float64()),
+        ('detection_timestamp', pa.timestamp('us')),
+    ])
+
+
+def _arrow_table(rows):
+    pa = _require_pyarrow('parquet')
+    columns = {f: [r.get(f) for r in rows] for f in DETECTION_FIELDS}
+    columns['channel_id'] = [None if v is None else str(v) for v in columns['channel_id']]
+    columns['detection_timestamp'] = [datetime.fromisoformat(v) if isinstance(v, str) else v
+                                      for v in columns['detection_timestamp']]
+    return pa.Table.from_pydict(columns, schema=arrow_schema())
+
+
+def is_detection_file(filename):
+    return filename.endswith(tuple(FORMAT_SUFFIXES.values())) and not filename.startswith('_')
+
+
+def completed_images(run_dir):
+    """Image paths recorded in any manifest of ``run_dir``."""
+    done = set()
+    if not os.path.isdir(run_dir):
+        return done
+    for name in os.listdir(run_dir):
+        if name.startswith('_manifest') and name.endswith('.txt'):
+            with open(os.path.join(run_dir, name), encoding='utf-8') as f:
+                done.update(line.rstrip('\n') for line in f if line.strip())
+    return done
+
+
+def is_complete(run_dir):
+    return os.path.exists(os.path.join(run_dir, SUCCESS))
+
+
+def mark_complete(run_dir):
+    with open(os.path.join(run_dir, SUCCESS), 'w', encoding='utf-8') as f:
+        f.write(datetime.utcnow().isoformat() + '\n')
+
+
+def latest_incomplete_run(output_dir):
+    """Most recent detections_* run directory without a _SUCCESS marker, or None."""
+    if not os.path.isdir(output_dir):
+        return None
+    runs = sorted(name for name in os.listdir(output_dir)
+                  if name.startswith('detections_') and os.path.isdir(os.path.join(output_dir, name)))
+    for name in reversed(runs):
+        run_dir = os.path.join(output_dir, name)
+        if not is_complete(run_dir):
+            return run_dir
+    return None
+
+
+def merge_manifests(run_dir):
+    """Fold per-shard manifests into _manifest.txt."""
+    shard_manifests = sorted(name for name in os.listdir(run_dir)
+                             if name.startswith('_manifest-') and name.endswith('.txt'))
+    if not shard_manifests:
+        return
+    with open(os.path.join(run_dir, MANIFEST), 'a', encoding='utf-8') as out:
+        for name in shard_manifests:
+            path = os.path.join(run_dir, name)
+            with open(path, encoding='utf-8') as f:
+                out.writelines(f)
+            os.remove(path)
+
+
+class DetectionWriter:
+    """Buffers detection rows and writes them to the run directory in chunks.
+
+    A part file is written to a temp name and renamed into place before the
+    images it covers are appended to the manifest, so anything listed in the
+    manifest is guaranteed to be on disk. Images with no detections are
+    recorded in the manifest too.
+    """
+
+    def __init__(self, run_dir, fmt='parquet', chunk_rows=CHUNK_ROWS, shard=None):
+        if fmt not in FORMAT_SUFFIXES:
+            raise ValueError(f"Unknown detection format: {fmt}")
+        if fmt != 'csv':
+            _require_pyarrow(fmt)
+        self.run_dir = run_dir
+        self.fmt = fmt
+        self.chunk_rows = max(1, chunk_rows)
+        tag = f's{shard:03d}' if isinstance(shard, int) else shard
+        self.prefix = 'part' if tag is None else f'part-{tag}'
+        manifest = MANIFEST if tag is None else f'_manifest-{tag}.txt'
+        self.manifest_path = os.path.join(run_dir, manifest)
+        os.makedirs(run_dir, exist_ok=True)
+        self._next_part = self._existing_parts()
+        self._rows = []
+        self._images = []
+        self.rows_written = 0
+        self.images_written = 0
+        self.paths = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _existing_parts(self):
+        # continue numbering after the parts of a resumed run
+        numbers = []
+        for name in os.listdir(self.run_dir):
+            stem = name.split('.')[0]
+            if name.startswith(self.prefix + '-') and is_detection_file(name):
+                suffix = stem[len(self.prefix) + 1:]
+                if suffix.isdigit():
+                    numbers.append(int(suffix))
+        return max(numbers) + 1 if numbers else 0
+
+    def add(self, image_path, rows):
+        self._rows.extend(rows)
+        self._images.append(str(image_path))
+        if len(self._rows) >= self.chunk_rows or len(self._images) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if self._rows:
+            path = os.path.join(self.run_dir, f'{self.prefix}-{self._next_part:05d}{FORMAT_SUFFIXES[self.fmt]}')
+            tmp_path = f'{path}.tmp'
+            self._write_part(tmp_path, self._rows)
+            os.replace(tmp_path, path)
+            self._next_part += 1
+            self.paths.append(path)
+            self.rows_written += len(self._rows)
+        if self._images:
+            with open(self.manifest_path, 'a', encoding='utf-8') as f:
+                f.writelines(p + '\n' for p in self._images)
+                f.flush()
+                os.fsync(f.fileno())
+            self.images_written += len(self._images)
+        self._rows = []
+        self._images = []
+
+    def close(self):
+        self.flush()
+
+    def _write_part(self, path, rows):
+        if self.fmt == 'csv':
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=DETECTION_FIELDS)
+                writer.writeheader()
+                writer.writerows(rows)
+            return
+        table = _arrow_table(rows)
+        if self.fmt == 'parquet':
+            import pyarrow.parquet as pq
+            pq.write_table(table, path)
+        else:
+            import pyarrow as pa
+            with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
@@ -0,0 +1,206 @@
+import os
+import csv
+import sys
+import argparse
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add root to sys.path so sibling modules resolve when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.detection_cache import DetectionCache, CACHE_PATH
+
+# Near-duplicate detection for scraped images. Channels repost the same
+# product photos (re-encoded, resized, re-cropped slightly), so images are
+# grouped by a 64-bit difference hash (dHash): two images are duplicates when
+# their hashes differ in at most MAX_DISTANCE bits. Clusters let inference run
+# once per group and fan the detections out to every member.
+
+IMAGE_DIR = "data/raw/images"
+CLUSTERS_PATH = "data/derived/image_clusters.csv"
+HASH_BITS = 64
+MAX_DISTANCE = 4
+HASH_WORKERS = 4
+
+CLUSTER_FIELDS = ['cluster_id', 'cluster_size', 'image_path', 'channel_id', 'message_id',
+                  'dhash', 'distance', 'is_representative']
+
+
+def dhash(path, size: int = 8):
+    """Difference hash: compare horizontally adjacent pixels of a (size+1) x size grayscale thumbnail."""
+    import cv2
+    image = cv2.imread(str(path), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        return None
+    small = cv2.resize(image, (size + 1, size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class BandIndex:
+    """Finds hashes within ``max_distance`` bits without comparing every pair.
+
+    The hash is split into ``max_distance + 1`` bands; by the pigeonhole
+    principle two hashes within ``max_distance`` bits agree exactly on at
+    least one band, so only hashes sharing a band value are compared.
+    """
+
+    def __init__(self, max_distance: int = MAX_DISTANCE, bits: int = HASH_BITS):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        widths = [bits // bands + (1 if i < bits % bands else 0) for i in range(bands)]
+        self._bands = []
+        shift = bits
+        for width in widths:
+            shift -= width
+            self._bands.append((shift, (1 << width) - 1))
+        self._buckets = [defaultdict(list) for _ in self._bands]
+        self.hashes = []
+
+    def _keys(self, value):
+        return [(value >> shift) & mask for shift, mask in self._bands]
+
+    def add(self, value) -> int:
+        """Index ``value``; returns its id (insertion order)."""
+        item = len(self.hashes)
+        self.hashes.append(value)
+        for bucket, key in zip(self._buckets, self._keys(value)):
+            bucket[key].append(item)
+        return item
+
+    def query(self, value):
+        """Ids of indexed hashes within max_distance of ``value``."""
+        seen = set()
+        for bucket, key in zip(self._buckets, self._keys(value)):
+            for item in bucket.get(key, ()):
+                if item not in seen:
+                    seen.add(item)
+                    if hamming(value, self.hashes[item]) <= self.max_distance:
+                        yield item
+
+
+def compute_hashes(paths, cache: DetectionCache = None, workers: int = HASH_WORKERS):
+    """dHash every path, reusing hashes stored in the detection cache by content digest."""
+    hashes = {}
+    missing = []
+    for path in paths:
+        value = cache.get_dhash(cache.digest(path)) if cache is not None else None
+        if value is None:
+            missing.append(path)
+        else:
+            hashes[path] = value
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        for path, value in zip(missing, pool.map(dhash, missing)):
+            if value is None:
+                print(f"Failed to hash {path}")
+                continue
+            hashes[path] = value
+            if cache is not None:
+                cache.put_dhash(cache.digest(path), value)
+    if cache is not None:
+        cache.commit()
+    return hashes
+
+
+def cluster_images(paths, max_distance: int = MAX_DISTANCE, cache: DetectionCache = None,
+                   workers: int = HASH_WORKERS):
+    """Group near-duplicate images.
+
+    Returns a list of clusters, each a list of ``(path, dhash)`` whose first
+    entry is the representative. Images are taken in input order: each joins
+    the nearest existing representative within ``max_distance`` bits (the
+    earliest on a tie) or becomes a new representative, so every member is
+    within ``max_distance`` of the representative whose detections it
+    inherits - chains of small steps are not merged. Singletons are
+    included, so every hashable image appears exactly once.
+    """
+    paths = list(paths)
+    hashes = compute_hashes(paths, cache, workers)
+    # holds representatives only; ids are cluster indexes
+    index = BandIndex(max_distance)
+    clusters = []
+    for path in paths:
+        if path not in hashes:
+            continue
+        value = hashes[path]
+        matches = sorted(index.query(value), key=lambda i: (hamming(value, index.hashes[i]), i))
+        if matches:
+            clusters[matches[0]].append((path, value))
+        else:
+            index.add(value)
+            clusters.append([(path, value)])
+    return clusters
+
+
+def cluster_id(cluster) -> str:
+    """Stable id for a cluster: the representative's hash and path."""
+    path, value = cluster[0]
+    return f'{value:016x}-{Path(path).parent.name}-{Path(path).stem}'
+
+
+def cluster_rows(clusters):
+    from src.yolo_detect import extract_message_id_from_path
+    for cluster in clusters:
+        cid = cluster_id(cluster)
+        representative = cluster[0][1]
+        for i, (path, value) in enumerate(cluster):
+            yield {
+                'cluster_id': cid,
+                'cluster_size': len(cluster),
+                'image_path': str(path),
+                'channel_id': Path(path).parent.name,
+                'message_id': extract_message_id_from_path(str(path)),
+                'dhash': f'{value:016x}',
+                'distance': hamming(value, representative),
+                'is_representative': i == 0,
+            }
+
+
+def write_clusters(clusters, path: str = CLUSTERS_PATH):
+    """Write every image with its cluster to a CSV (loaded into stg_image_clusters)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CLUSTER_FIELDS)
+        writer.writeheader()
+        writer.writerows(cluster_rows(clusters))
+    os.replace(tmp_path, path)
+    return path
+
+
+def summarize(clusters):
+    sizes = Counter(len(c) for c in clusters)
+    images = sum(len(c) for c in clusters)
+    duplicates = images - len(clusters)
+    print(f"{images} images in {len(clusters)} clusters; {duplicates} near-duplicates "
+          f"({duplicates / images:.1%} of inference avoidable)" if images else "No images")
+    largest = sorted(clusters, key=len, reverse=True)[:5]
+    for cluster in largest:
+        if len(cluster) > 1:
+            print(f"  {len(cluster):>4} x {cluster[0][0]}")
+    return sizes
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cluster near-duplicate images by perceptual hash')
+    parser.add_argument('--images', default=IMAGE_DIR)
+    parser.add_argument('--out', default=CLUSTERS_PATH, help='Clusters CSV to write')
+    parser.add_argument('--max-distance', type=int, default=MAX_DISTANCE, help='Max differing dHash bits')
+    parser.add_argument('--workers', type=int, default=HASH_WORKERS, help='Hashing threads')
+    parser.add_argument('--cache', default=CACHE_PATH, help='SQLite cache of image hashes')
+    args = parser.parse_args()
+
+    from src.yolo_detect import iter_images
+    cache = DetectionCache(None, 0, args.cache)
+    clusters = cluster_images(iter_images(args.images), args.max_distance, cache, args.workers)
+    cache.close()
+    summarize(clusters)
+    print(f"Wrote clusters to {write_clusters(clusters, args.out)}")
@@ -0,0 +1,192 @@
+import os
+import ast
+
+import numpy as np
+
+# Pluggable inference backends for src/yolo_detect.py. Every backend takes a
+# list of letterboxed BGR images and returns, per image, a list of
+# (original_label, score) sorted by score - the same shape predict_batch
+# produces - so CLASS_MAP and the output rows are backend-agnostic.
+#
+#   torch      ultralytics YOLO / torch.hub yolov5, eager PyTorch
+#   onnx       weights exported once to <weights>.onnx, run with ONNX Runtime
+#   onnx-int8  the ONNX export with INT8 dynamic weight quantization
+#
+# The ONNX path expects a YOLOv8-style export: one output of shape
+# (batch, 4 + classes, anchors) with boxes as cx, cy, w, h.
+
+BACKENDS = ('torch', 'onnx', 'onnx-int8')
+IOU_THRESH = 0.45
+MAX_DET = 300
+# Boxes of different classes are offset by this much so one NMS pass keeps them apart
+_CLASS_OFFSET = 7680
+
+
+def _xywh_to_xyxy(boxes):
+    xy = boxes[:, :2]
+    half = boxes[:, 2:4] / 2
+    return np.concatenate([xy - half, xy + half], axis=1)
+
+
+def nms(boxes, scores, iou_thresh=IOU_THRESH):
+    """Greedy non-maximum suppression; returns kept indices by descending score."""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        h = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thresh]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(pred, names, conf_thresh=0.25, iou_thresh=IOU_THRESH, max_det=MAX_DET):
+    """Turn one image's raw (4 + classes, anchors) output into [(label, score), ...]."""
+    pred = pred.T
+    class_scores = pred[:, 4:]
+    cls = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(cls)), cls]
+    keep = scores >= conf_thresh
+    if not keep.any():
+        return []
+    boxes, scores, cls = _xywh_to_xyxy(pred[keep, :4]), scores[keep], cls[keep]
+    kept = nms(boxes + cls[:, None] * _CLASS_OFFSET, scores, iou_thresh)[:max_det]
+    return [(names.get(int(cls[i]), str(int(cls[i]))), float(scores[i])) for i in kept]
+
+
+def preprocess(images):
+    """Letterboxed BGR HWC uint8 images -> RGB NCHW float32 in [0, 1]."""
+    batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+
+
+def export_onnx(weights, size):
+    """Export ``weights`` to ONNX next to it, reusing an export newer than the weights."""
+    target = os.path.splitext(weights)[0] + '.onnx'
+    if os.path.exists(target) and (not os.path.exists(weights)
+                                   or os.path.getmtime(target) >= os.path.getmtime(weights)):
+        return target
+    from ultralytics import YOLO
+    exported = YOLO(weights).export(format='onnx', imgsz=size, dynamic=True)
+    if os.path.abspath(exported) != os.path.abspath(target):
+        os.replace(exported, target)
+    return target
+
+
+def quantize_onnx(onnx_path):
+    """INT8 dynamic quantization of an ONNX export, keeping its metadata (class names)."""
+    target = onnx_path[:-len('.onnx')] + '.int8.onnx'
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(onnx_path):
+        return target
+    try:
+        import onnx
+    except ImportError:
+        raise RuntimeError("The onnx-int8 backend requires the 'onnx' package")
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(onnx_path, target, weight_type=QuantType.QUInt8)
+    source, quantized = onnx.load(onnx_path), onnx.load(target)
+    del quantized.metadata_props[:]
+    quantized.metadata_props.extend(source.metadata_props)
+    onnx.save(quantized, target)
+    return target
+
+
+def load_model(weights: str, device: str = 'cpu', conf_thresh: float = 0.25):
+    try:
+        from ultralytics import YOLO
+        model = YOLO(weights)
+        model.to(device)
+    except Exception:
+        try:
+            import torch
+            # fallback to torch.hub yolov5
+            model = torch.hub.load('ultralytics/yolov5', 'custom', path=weights, force_reload=False)
+            model.to(device)
+            model.conf = conf_thresh
+        except Exception as e:
+            raise RuntimeError('No YOLO model available')
+    return model
+
+
+def predict_batch(model, images, device: str = 'cpu', conf_thresh: float = 0.25, size: int = 640):
+    """Run one forward pass over a list of letterboxed images.
+
+    Returns one list of (original_label, score) per image, in input order.
+    """
+    names = getattr(model, 'names', {})
+    if hasattr(model, 'predict'):
+        # ultralytics YOLO: list of Results, one per image
+        results = model.predict(images, device=device, conf=conf_thresh, imgsz=size, verbose=False)
+        per_image = []
+        for res in results:
+            detections = []
+            for b in res.boxes:
+                cls = int(b.cls)
+                detections.append((names[cls] if names else str(cls), float(b.conf)))
+            per_image.append(detections)
+        return per_image
+    # torch.hub yolov5: Detections with one (n, 6) xyxy tensor per image
+    results = model(images, size=size)
+    return [[(names[int(row[5])] if names else str(int(row[5])), float(row[4])) for row in xyxy]
+            for xyxy in results.xyxy]
+
+
+def model_weights_name(kind, weights):
+    """The ``model_weights`` recorded on detections from backend ``kind``."""
+    if kind == 'torch':
+        return os.path.basename(weights)
+    stem = os.path.splitext(os.path.basename(weights))[0]
+    return f'{stem}.int8.onnx' if kind == 'onnx-int8' else f'{stem}.onnx'
+
+
+class TorchBackend:
+    def __init__(self, weights, device='cpu', conf_thresh=0.25, size=640):
+        self.model = load_model(weights, device, conf_thresh)
+        self.device = device
+        self.conf_thresh = conf_thresh
+        self.size = size
+        self.model_weights = model_weights_name('torch', weights)
+
+    def predict(self, images):
+        return predict_batch(self.model, images, self.device, self.conf_thresh, self.size)
+
+
+class OnnxBackend:
+    def __init__(self, weights, device='cpu', conf_thresh=0.25, size=640, quantize=False):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("The onnx backends require the 'onnxruntime' package")
+        path = weights if weights.endswith('.onnx') else export_onnx(weights, size)
+        if quantize:
+            path = quantize_onnx(path)
+        options = ort.SessionOptions()
+        # honour pin_threads / --threads
+        options.intra_op_num_threads = int(os.environ.get('OMP_NUM_THREADS', '0'))
+        providers = ['CPUExecutionProvider']
+        if device.startswith('cuda'):
+            providers.insert(0, 'CUDAExecutionProvider')
+        self.session = ort.InferenceSession(path, options, providers=providers)
+        self.input_name = self.session.get_inputs()[0].name
+        names = self.session.get_modelmeta().custom_metadata_map.get('names')
+        self.names = ast.literal_eval(names) if names else {}
+        self.conf_thresh = conf_thresh
+        self.model_weights = model_weights_name('onnx-int8' if quantize else 'onnx', weights)
+
+    def predict(self, images):
+        output = self.session.run(None, {self.input_name: preprocess(images)})[0]
+        return [postprocess(pred, self.names, self.conf_thresh) for pred in output]
+
+
+def load_backend(kind, weights, device='cpu', conf_thresh=0.25, size=640):
+    if kind == 'torch':
+        return TorchBackend(weights, device, conf_thresh, size)
+    if kind in ('onnx', 'onnx-int8'):
+        return OnnxBackend(weights, device, conf_thresh, size, quantize=kind == 'onnx-int8')
+    raise ValueError(f"Unknown inference backend: {kind}")
@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+import logging
+from telethon.errors import FloodWaitError
+
+from src import detection_queue
+
+logger = logging.getLogger("scraper")
+
+DOWNLOAD_WORKERS = int(os.getenv("SCRAPER_DOWNLOAD_WORKERS", "4"))
+QUEUE_SIZE = 200
+DOWNLOAD_RETRIES = 3
+DOWNLOAD_TIMEOUT = 60
+
+
+class MediaDownloader:
+    """Bounded producer/consumer pool for Telegram media downloads.
+
+    Message iteration only pays for ``submit`` (which blocks when the queue is
+    full); ``workers`` tasks drain the queue, retry failures and time out
+    stuck transfers. Files are written to ``<path>.part`` and renamed into
+    place, so a crash never leaves a truncated ``.jpg`` behind. An optional
+    ScrapeMetrics receives download latency, bytes and failure counts. With
+    a ``detect_queue`` directory every finished download is enqueued for the
+    resident detection worker (src/detection_service.py).
+    """
+
+    def __init__(self, client, workers=DOWNLOAD_WORKERS, queue_size=QUEUE_SIZE,
+                 retries=DOWNLOAD_RETRIES, timeout=DOWNLOAD_TIMEOUT, metrics=None, detect_queue=None):
+        self.client = client
+        self.workers = max(1, workers)
+        self.retries = retries
+        self.timeout = timeout
+        self.metrics = metrics
+        self.detect_queue = detect_queue
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self._tasks = []
+        self._pending = set()
+        self.stats = {"downloaded": 0, "skipped": 0, "failed": 0, "retries": 0, "bytes": 0, "enqueued": 0}
+        self._started = None
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+        return False
+
+    def start(self):
+        self._started = time.monotonic()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(self, media, save_path):
+        """Queue a download unless the file already exists or is queued."""
+        if os.path.exists(save_path) or save_path in self._pending:
+            self.stats["skipped"] += 1
+            return
+        self._pending.add(save_path)
+        await self.queue.put((media, save_path))
+
+    async def close(self):
+        """Wait for queued downloads to finish, then stop the workers."""
+        await self.queue.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def summary(self):
+        elapsed = time.monotonic() - self._started if self._started else 0.0
+        summary = dict(self.stats)
+        summary["elapsed_s"] = round(elapsed, 3)
+        summary["mb_per_s"] = round(self.stats["bytes"] / 1e6 / elapsed, 3) if elapsed else 0.0
+        summary["files_per_s"] = round(self.stats["downloaded"] / elapsed, 3) if elapsed else 0.0
+        return summary
+
+    async def _worker(self):
+        while True:
+            media, save_path = await self.queue.get()
+            try:
+                await self._download(media, save_path)
+            finally:
+                self._pending.discard(save_path)
+                self.queue.task_done()
+
+    async def _download(self, media, save_path):
+        tmp_path = f"{save_path}.part"
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            try:
+                await asyncio.wait_for(self.client.download_media(media, tmp_path), self.timeout)
+                os.replace(tmp_path, save_path)
+                size = os.path.getsize(save_path)
+                self.stats["downloaded"] += 1
+                self.stats["bytes"] += size
+                if self.metrics:
+                    self.metrics.download_seconds.observe(time.perf_counter() - started)
+                    self.metrics.photos_downloaded.inc()
+                    self.metrics.download_bytes.inc(size)
+                logger.info(f"Downloaded image {os.path.basename(save_path)}")
+                if self.detect_queue:
+                    detection_queue.enqueue(save_path, self.detect_queue)
+                    self.stats["enqueued"] += 1
+                return
+            except Exception as err:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                if self.metrics:
+                    self.metrics.download_seconds.observe(time.perf_counter() - started)
+                if attempt == self.retries:
+                    self.stats["failed"] += 1
+                    if self.metrics:
+                        self.metrics.download_failures.inc()
+                    logger.warning(f"Failed to download image {os.path.basename(save_path)}: {err!r}")
+                    return
+                self.stats["retries"] += 1
+                delay = 2 ** attempt
+                if isinstance(err, FloodWaitError):
+                    delay = err.seconds
+                    if self.metrics:
+                        self.metrics.flood_wait_seconds.inc(err.seconds, channel="download")
+                await asyncio.sleep(delay)
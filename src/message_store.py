@@ -0,0 +1,192 @@
+import io
+import os
+import re
+import gzip
+import json
+
+try:
+    # Optional faster codec for reading partitions; json is the fallback
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
+
+# Raw message partitions live in DATA_DIR/<channel_id>/<date>/ as
+#   <channel_id>_<channel_name>_<date>.jsonl[.gz|.zst]            first part
+#   <channel_id>_<channel_name>_<date>.part0001.jsonl[.gz|.zst]   after rolling
+# with one compact JSON object per line. Legacy scrapes wrote a single
+# indented JSON array per file (.json); readers accept both.
+
+COMPRESSION_SUFFIXES = {None: "", "gzip": ".gz", "zstd": ".zst"}
+PARTITION_SUFFIXES = (".json", ".jsonl", ".jsonl.gz", ".jsonl.zst")
+# Start a new part once this many bytes of JSON (uncompressed) have gone into the current one
+MAX_PART_BYTES = 64 * 1024 * 1024
+# Read size when measuring an existing compressed part
+_READ_SIZE = 1 << 20
+
+_PART_RE = re.compile(r"\.part(\d{4})$")
+
+
+def _open_raw_writer(raw, compression):
+    if compression is None:
+        return raw
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=raw, mode="ab")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError("zstd compression requires the 'zstandard' package")
+        return zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def open_partition(path):
+    """Open a partition file for binary line-by-line reading."""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        try:
+            import zstandard
+        except ImportError:
+            raise RuntimeError(f"Reading {path} requires the 'zstandard' package")
+        # same-day runs append one frame each; stop only at the end of the file
+        reader = zstandard.ZstdDecompressor().stream_reader(open(path, "rb"), closefd=True, read_across_frames=True)
+        return io.BufferedReader(reader)
+    return open(path, "rb")
+
+
+def _uncompressed_size(path):
+    size = 0
+    with open_partition(path) as f:
+        for chunk in iter(lambda: f.read(_READ_SIZE), b""):
+            size += len(chunk)
+    return size
+
+
+def is_partition_file(filename):
+    return filename.endswith(PARTITION_SUFFIXES)
+
+
+def partition_base(filename):
+    """Strip extension and part number: '1_chan_2024-01-01.part0002.jsonl.gz' -> '1_chan_2024-01-01'."""
+    for suffix in sorted(PARTITION_SUFFIXES, key=len, reverse=True):
+        if filename.endswith(suffix):
+            filename = filename[: -len(suffix)]
+            break
+    return _PART_RE.sub("", filename)
+
+
+def _iter_json_array(path):
+    """Yield the items of a legacy JSON array file, incrementally when ijson is installed."""
+    try:
+        import ijson
+    except ImportError:
+        with open(path, "rb") as f:
+            yield from _loads(f.read())
+        return
+    with open(path, "rb") as f:
+        yield from ijson.items(f, "item", use_float=True)
+
+
+def iter_records(path):
+    """Yield message dicts from a partition file without loading it whole."""
+    if path.endswith(".json"):
+        yield from _iter_json_array(path)
+        return
+    with open_partition(path) as f:
+        for line in f:
+            if line.strip():
+                yield _loads(line)
+
+
+def iter_raw_records(path):
+    """Yield (message dict, JSON bytes) pairs, reusing each JSONL line as the JSON bytes.
+
+    Loaders can send the bytes straight to a JSONB column instead of
+    re-serializing the parsed dict.
+    """
+    if path.endswith(".json"):
+        for record in _iter_json_array(path):
+            yield record, json.dumps(record, ensure_ascii=False).encode("utf-8")
+        return
+    with open_partition(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield _loads(line), line
+
+
+class PartitionWriter:
+    """Append-only JSONL writer with optional compression and size-based rolling.
+
+    Re-opening the same prefix (a second run on the same day) appends to the
+    newest part; gzip members and zstd frames both concatenate cleanly.
+    """
+
+    def __init__(self, directory, prefix, compression=None, max_bytes=MAX_PART_BYTES):
+        if compression == "none":
+            compression = None
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.directory = directory
+        self.prefix = prefix
+        self.compression = compression
+        self.max_bytes = max_bytes
+        self.records = 0
+        self.paths = []
+        self._raw = None
+        self._out = None
+        self._part_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        self._part = self._last_part()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def _path(self, part):
+        name = self.prefix if part == 0 else f"{self.prefix}.part{part:04d}"
+        return os.path.join(self.directory, f"{name}.jsonl{COMPRESSION_SUFFIXES[self.compression]}")
+
+    def _last_part(self):
+        part = 0
+        while os.path.exists(self._path(part + 1)):
+            part += 1
+        return part
+
+    def _open(self):
+        path = self._path(self._part)
+        self._raw = open(path, "ab")
+        # Appending to an existing part counts the JSON already in it against the limit
+        self._part_bytes = self._raw.tell()
+        if self._part_bytes and self.compression is not None:
+            self._part_bytes = _uncompressed_size(path)
+        self._out = _open_raw_writer(self._raw, self.compression)
+        if path not in self.paths:
+            self.paths.append(path)
+
+    def _close_current(self):
+        if self._out is not None and self._out is not self._raw:
+            self._out.close()
+        if self._raw is not None:
+            self._raw.close()
+        self._raw = self._out = None
+
+    def write(self, record):
+        if self._out is None:
+            self._open()
+        if self._part_bytes >= self.max_bytes:
+            self._close_current()
+            self._part += 1
+            self._open()
+        line = json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+        self._out.write(line)
+        self._part_bytes += len(line)
+        self.records += 1
+
+    def close(self):
+        self._close_current()
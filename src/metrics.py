@@ -0,0 +1,148 @@
+import math
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Dependency-free Prometheus primitives shared by the scraper (src/scrape_metrics.py)
+# and the API (api/metrics.py). Counters, gauges and histograms are plain dicts
+# keyed by label values; labels are passed by name. Each metric renders itself
+# in the Prometheus text format; ``render`` joins a list of them.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _label_str(labelnames, key):
+    if not labelnames:
+        return ""
+    pairs = ",".join(f'{n}="{_escape(v)}"' for n, v in zip(labelnames, key))
+    return "{" + pairs + "}"
+
+
+def _format_value(value):
+    """Sample value without loss: integral values as ints, others as repr (never 1e+06-style rounding)."""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+        if value.is_integer() and abs(value) < 2 ** 53:
+            return str(int(value))
+        return repr(value)
+    return str(value)
+
+
+class Metric:
+    kind = "untyped"
+
+    def _key(self, labels):
+        return tuple(labels.get(n, "") for n in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{labels} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=(), registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        if registry is not None:
+            registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def total(self):
+        return sum(self.values.values())
+
+    def samples(self):
+        for key, value in sorted(self.values.items()):
+            yield self.name, _label_str(self.labelnames, key), value
+
+    def to_dict(self):
+        return {",".join(map(str, k)) or "total": v for k, v in self.values.items()}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=(), registry=None, collect=None):
+        super().__init__(name, help, labelnames, registry)
+        # read at render time instead of being set, e.g. pool occupancy
+        self.collect = collect
+        if not self.labelnames and collect is None:
+            self.values[()] = 0
+
+    def set(self, value, **labels):
+        self.values[self._key(labels)] = value
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self.collect is not None:
+            self.values = {tuple(key): value for key, value in self.collect()}
+        yield from super().samples()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS, registry=None):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # key -> [bucket counts..., +Inf count], sum, count
+        self.series = {}
+        if registry is not None:
+            registry.append(self)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        counts, total, n = self.series.get(key) or ([0] * (len(self.buckets) + 1), 0.0, 0)
+        counts[bisect_left(self.buckets, value)] += 1
+        self.series[key] = (counts, total + value, n + 1)
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        for key, (counts, total, n) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", _label_str(self.labelnames + ("le",), key + (bound,)), cumulative
+            yield f"{self.name}_sum", _label_str(self.labelnames, key), total
+            yield f"{self.name}_count", _label_str(self.labelnames, key), n
+
+    def to_dict(self):
+        return {
+            ",".join(map(str, k)) or "total": {"count": n, "sum_s": round(total, 6), "mean_s": round(total / n, 6)}
+            for k, (counts, total, n) in self.series.items()
+        }
+
+
+def render(metrics):
+    """Prometheus text exposition of ``metrics``."""
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
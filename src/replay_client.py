@@ -0,0 +1,170 @@
+import os
+import random
+import asyncio
+import zlib
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from telethon.errors import FloodWaitError
+
+from src.message_store import is_partition_file, iter_records
+
+# Offline stand-in for telethon's TelegramClient, covering the calls the
+# scraper makes: get_entity, iter_messages, download_media and ``async with``.
+# Channels are either synthetic (generated from a seed) or replayed from raw
+# partitions recorded by earlier scrapes. Configuration comes from keyword
+# arguments or, via ``from_env``, from REPLAY_* environment variables.
+
+PAGE_SIZE = 100
+
+
+class ReplayEntity:
+    def __init__(self, channel_id, username, title=None):
+        self.id = channel_id
+        self.username = username
+        self.title = title or username
+
+
+class ReplayReply:
+    def __init__(self, reply_to_msg_id):
+        self.reply_to_msg_id = reply_to_msg_id
+
+
+class ReplayMessage:
+    def __init__(self, record, photo=None):
+        self.id = record["id"]
+        self.date = datetime.fromisoformat(record["date"])
+        self.text = record.get("text")
+        self.views = record.get("views")
+        self.forwards = record.get("forwards")
+        self.sender_id = record.get("sender_id")
+        self.reply_to = ReplayReply(record["reply_to"]) if record.get("reply_to") else None
+        self.photo = photo
+        self.media = photo if photo is not None else (True if record.get("media") else None)
+
+
+class ReplayClient:
+    """Serves synthetic or recorded channels with configurable latency and FloodWaits.
+
+    ``latency`` is slept once per page of ``PAGE_SIZE`` messages (and per
+    get_entity call), ``download_latency`` per photo; each page fetch raises
+    FloodWaitError with probability ``flood_wait_rate``.
+    """
+
+    def __init__(self, messages_per_channel=1000, photo_ratio=0.3, latency=0.0, download_latency=0.0,
+                 flood_wait_rate=0.0, flood_wait_seconds=1, photo_bytes=50_000, seed=0, recorded=None):
+        self.messages_per_channel = messages_per_channel
+        self.photo_ratio = photo_ratio
+        self.latency = latency
+        self.download_latency = download_latency
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self.photo_bytes = photo_bytes
+        self.seed = seed
+        self._random = random.Random(seed)
+        # username -> (entity, records newest first)
+        self._channels = {}
+        self._recorded = recorded or {}
+        self.stats = {"pages": 0, "flood_waits": 0, "downloads": 0}
+
+    @classmethod
+    def from_recorded(cls, data_dir, **kwargs):
+        """Replay channels from raw partitions under DATA_DIR/<channel_id>/<date>/."""
+        recorded = defaultdict(dict)
+        for root, dirs, files in os.walk(data_dir):
+            for file in files:
+                if not is_partition_file(file):
+                    continue
+                for record in iter_records(os.path.join(root, file)):
+                    recorded[record["channel_name"]][record["id"]] = record
+        return cls(recorded=dict(recorded), **kwargs)
+
+    @classmethod
+    def from_env(cls):
+        kwargs = {
+            "messages_per_channel": int(os.getenv("REPLAY_MESSAGES", "1000")),
+            "photo_ratio": float(os.getenv("REPLAY_PHOTO_RATIO", "0.3")),
+            "latency": float(os.getenv("REPLAY_LATENCY", "0")),
+            "download_latency": float(os.getenv("REPLAY_DOWNLOAD_LATENCY", "0")),
+            "flood_wait_rate": float(os.getenv("REPLAY_FLOOD_RATE", "0")),
+            "flood_wait_seconds": int(os.getenv("REPLAY_FLOOD_SECONDS", "1")),
+            "seed": int(os.getenv("REPLAY_SEED", "0")),
+        }
+        recorded_dir = os.getenv("REPLAY_DATA_DIR")
+        if recorded_dir:
+            return cls.from_recorded(recorded_dir, **kwargs)
+        return cls(**kwargs)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+    def _channel(self, username):
+        if username not in self._channels:
+            if username in self._recorded:
+                records = sorted(self._recorded[username].values(), key=lambda r: r["id"], reverse=True)
+                channel_id = records[0]["channel_id"] if records else zlib.crc32(username.encode())
+            else:
+                channel_id = zlib.crc32(username.encode())
+                records = self._synthetic_records(channel_id, username)
+            self._channels[username] = (ReplayEntity(channel_id, username), records)
+        return self._channels[username]
+
+    def _synthetic_records(self, channel_id, username):
+        rng = random.Random(f"{self.seed}:{username}")
+        now = datetime(2026, 1, 20, tzinfo=timezone.utc)
+        records = []
+        for message_id in range(self.messages_per_channel, 0, -1):
+            records.append({
+                "id": message_id,
+                "date": (now - timedelta(minutes=7 * (self.messages_per_channel - message_id))).isoformat(),
+                "text": f"Product {rng.randint(1, 500)} available now, call {rng.randint(1000, 9999)}",
+                "views": rng.randint(0, 20000),
+                "forwards": rng.randint(0, 200),
+                "media": rng.random() < self.photo_ratio,
+                "sender_id": None,
+                "reply_to": None,
+                "channel_id": channel_id,
+                "channel_name": username,
+            })
+        return records
+
+    async def get_entity(self, username):
+        await asyncio.sleep(self.latency)
+        return self._channel(username)[0]
+
+    async def iter_messages(self, entity, limit=None, offset_id=0, min_id=0, ids=None, **kwargs):
+        """Yield messages newest first, honouring limit, offset_id and min_id like telethon.
+
+        With ``ids`` yield those messages in the given order, None for ids that do not exist.
+        """
+        records = self._channel(entity.username)[1]
+        if ids is not None:
+            by_id = {r["id"]: r for r in records}
+            await asyncio.sleep(self.latency)
+            for message_id in ids:
+                record = by_id.get(message_id)
+                photo = ("photo", entity.id, message_id) if record and record.get("media") else None
+                yield ReplayMessage(record, photo) if record else None
+            return
+        served = 0
+        for i, record in enumerate(r for r in records if (not offset_id or r["id"] < offset_id)):
+            if record["id"] <= min_id or (limit is not None and served >= limit):
+                return
+            if i % PAGE_SIZE == 0:
+                self.stats["pages"] += 1
+                await asyncio.sleep(self.latency)
+                if self.flood_wait_rate and self._random.random() < self.flood_wait_rate:
+                    self.stats["flood_waits"] += 1
+                    raise FloodWaitError(request=None, capture=self.flood_wait_seconds)
+            photo = ("photo", entity.id, record["id"]) if record.get("media") else None
+            served += 1
+            yield ReplayMessage(record, photo)
+
+    async def download_media(self, media, file=None):
+        await asyncio.sleep(self.download_latency)
+        with open(file, "wb") as f:
+            f.write(b"\xff\xd8" + os.urandom(max(0, self.photo_bytes - 2)))
+        self.stats["downloads"] += 1
+        return file
@@ -0,0 +1,87 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from src.metrics import Counter, Histogram, render
+
+# In-process metrics for the scraper, built on the primitives in src/metrics.py.
+# Rendered at the end of a run as a Prometheus text file (for node_exporter's
+# textfile collector) and as a JSON run report alongside a list of coarse
+# per-channel trace spans.
+
+
+class ScrapeMetrics:
+    """Counters, latency histograms and trace spans for one scraper run."""
+
+    def __init__(self):
+        self.started_at = datetime.utcnow()
+        self.messages_fetched = Counter(
+            "scraper_messages_fetched_total", "Messages fetched from Telegram", ["channel"])
+        self.photos_downloaded = Counter(
+            "scraper_photos_downloaded_total", "Photos downloaded")
+        self.download_bytes = Counter(
+            "scraper_download_bytes_total", "Bytes of media downloaded")
+        self.download_failures = Counter(
+            "scraper_download_failures_total", "Photo downloads that failed after all retries")
+        self.flood_wait_seconds = Counter(
+            "scraper_flood_wait_seconds_total", "Seconds spent backing off on FloodWait", ["channel"])
+        self.get_entity_seconds = Histogram(
+            "scraper_get_entity_seconds", "Latency of client.get_entity", ["channel"])
+        self.iter_page_seconds = Histogram(
+            "scraper_iter_messages_page_seconds", "Time waiting on iter_messages per page of messages", ["channel"])
+        self.download_seconds = Histogram(
+            "scraper_download_media_seconds", "Latency of a single download_media call")
+        self.spans = []
+        self._origin = time.perf_counter()
+
+    def metrics(self):
+        return [
+            self.messages_fetched, self.photos_downloaded, self.download_bytes, self.download_failures,
+            self.flood_wait_seconds, self.get_entity_seconds, self.iter_page_seconds, self.download_seconds,
+        ]
+
+    def record_span(self, name, started, **attrs):
+        """Record a coarse trace span that began at perf_counter() value ``started``."""
+        self.spans.append({
+            "name": name,
+            "start_s": round(started - self._origin, 4),
+            "duration_s": round(time.perf_counter() - started, 4),
+            **attrs,
+        })
+
+    @contextmanager
+    def span(self, name, **attrs):
+        started = time.perf_counter()
+        try:
+            yield attrs
+        finally:
+            self.record_span(name, started, **attrs)
+
+    def to_prometheus(self):
+        return render(self.metrics())
+
+    def to_dict(self):
+        return {metric.name: metric.to_dict() for metric in self.metrics()}
+
+    def write_prometheus(self, path):
+        _atomic_write(path, self.to_prometheus())
+
+    def write_json(self, path, **extra):
+        report = {
+            "started_at": self.started_at.isoformat(),
+            "finished_at": datetime.utcnow().isoformat(),
+            "metrics": self.to_dict(),
+            "spans": self.spans,
+            **extra,
+        }
+        _atomic_write(path, json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def _atomic_write(path, content):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(content)
+    os.replace(tmp_path, path)
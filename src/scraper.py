@@ -1,99 +1,343 @@
 import os
-import json
+import sys
+import time
 import logging
 import asyncio
+import argparse
 from datetime import datetime
 from telethon import TelegramClient
+from telethon.errors import FloodWaitError
 from dotenv import load_dotenv
 
+# Add root to sys.path so sibling modules resolve when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.checkpoints import CheckpointStore, CHECKPOINT_PATH
+from src.media_downloader import MediaDownloader, DOWNLOAD_WORKERS
+from src.message_store import PartitionWriter, MAX_PART_BYTES
+from src.replay_client import ReplayClient
+from src.scrape_metrics import ScrapeMetrics
+
 # Load environment variables
 load_dotenv()
 
 API_ID = os.getenv("APP_ID")
 API_HASH = os.getenv("APP_HASH")
 CHANNELS = os.getenv("CHANNELS", "CheMed123,lobelia4cosmetics,tikvahpharma").split(",")
+# "telegram" for the real API, "replay" for the offline ReplayClient (see src/replay_client.py)
+CLIENT = os.getenv("SCRAPER_CLIENT", "telegram")
 DATA_DIR = "data/raw/telegram_messages"
 IMAGE_DIR = "data/raw/images"
 LOG_DIR = "logs"
+# Number of channels scraped at the same time over the shared client
+CONCURRENCY = int(os.getenv("SCRAPER_CONCURRENCY", "3"))
+# Messages fetched for a channel without a checkpoint (or on --full-refresh); None = all history
+MESSAGE_LIMIT = 500
+# How many FloodWait back-offs a single channel may take before giving up
+MAX_FLOOD_RETRIES = 3
+# Raw partition compression: none, gzip or zstd
+COMPRESSION = os.getenv("SCRAPER_COMPRESSION", "gzip")
+# Telethon fetches history in pages of 100 messages; iteration latency is recorded per page
+ITER_PAGE_SIZE = 100
+# Queue directory of the resident detection worker; downloaded images are enqueued there when set
+DETECT_QUEUE = os.getenv("SCRAPER_DETECT_QUEUE") or None
+METRICS_PROM_PATH = os.path.join(LOG_DIR, "scraper_metrics.prom")
+RUN_REPORT_PATH = os.path.join(LOG_DIR, "scraper_run.json")
 
 # Ensure directories exist
 os.makedirs(IMAGE_DIR, exist_ok=True)
 os.makedirs(DATA_DIR, exist_ok=True)
 os.makedirs(LOG_DIR, exist_ok=True)
 
-logging.basicConfig(
-    filename=f"{LOG_DIR}/scraper.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s"
-)
+# File and console handlers live on the "scraper" logger only; configuring the
+# root logger as well would write every line to scraper.log twice
 logger = logging.getLogger("scraper")
 logger.setLevel(logging.INFO)
-fh = logging.FileHandler(f"{LOG_DIR}/scraper.log")
-formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
-fh.setFormatter(formatter)
-logger.addHandler(fh)
-ch = logging.StreamHandler()
-ch.setFormatter(formatter)
-logger.addHandler(ch)
-
-async def scrape_channel(client, channel_username):
-    """Scrapes messages and images from a given channel."""
+if not logger.handlers:
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    fh = logging.FileHandler(f"{LOG_DIR}/scraper.log")
+    fh.setFormatter(formatter)
+    logger.addHandler(fh)
+    ch = logging.StreamHandler()
+    ch.setFormatter(formatter)
+    logger.addHandler(ch)
+
+async def scrape_channel(client, channel_username, checkpoints=None, full_refresh=False, downloader=None,
+                         metrics=None, message_limit=MESSAGE_LIMIT, compression=COMPRESSION):
+    """Scrapes messages and images from a given channel.
+
+    With a CheckpointStore only messages newer than the channel's last seen id
+    are fetched (via ``min_id``); ``full_refresh`` ignores the checkpoint and
+    channels without one fetch at most ``message_limit`` messages (None = all).
+    Partitions are written with ``compression`` (none, gzip or zstd).
+    Photos are handed to ``downloader`` (a shared MediaDownloader); without
+    one, a private pool is used and drained before returning. Latencies and
+    counters go to ``metrics`` (a ScrapeMetrics) when given.
+    Photos still pending in the checkpoint from earlier runs (failed or
+    interrupted downloads) are re-fetched by id and queued again; callers
+    drop them from the checkpoint with ``resolve_downloads`` once the pool
+    is drained.
+    Returns a small stats dict (messages written, also when the channel
+    fails part way; wall time, FloodWait seconds) so callers can report
+    per-channel timings.
+    """
     logger.info(f"Starting scrape for channel: {channel_username}")
+    started = time.monotonic()
+    span_started = time.perf_counter()
+    stats = {"channel": channel_username, "channel_id": None, "messages": 0, "photos": 0, "flood_wait_s": 0,
+             "ok": False}
+    if metrics is None:
+        metrics = ScrapeMetrics()
+    own_downloader = downloader is None
+    if own_downloader:
+        downloader = MediaDownloader(client, metrics=metrics)
+        downloader.start()
     try:
-        entity = await client.get_entity(channel_username)
+        with metrics.get_entity_seconds.time(channel=channel_username):
+            entity = await client.get_entity(channel_username)
         channel_name = entity.username or entity.title
-        
-        # Partitioned directory for JSON: DATA_DIR/<channel_id>/<date>/
+        stats["channel_id"] = entity.id
+
+        # Partitioned directory for JSONL: DATA_DIR/<channel_id>/<date>/
         date_str = datetime.now().strftime("%Y-%m-%d")
         channel_data_dir = os.path.join(DATA_DIR, str(entity.id), date_str)
-        os.makedirs(channel_data_dir, exist_ok=True)
-        
-        messages = []
-        async for message in client.iter_messages(entity, limit=500):
-            msg_data = {
-                "id": message.id,
-                "date": message.date.isoformat(),
-                "text": message.text,
-                "views": message.views,
-                "forwards": message.forwards,
-                "media": bool(message.media),
-                "sender_id": message.sender_id,
-                "reply_to": message.reply_to.reply_to_msg_id if message.reply_to else None,
-                "channel_id": entity.id,
-                "channel_name": channel_name
-            }
-            messages.append(msg_data)
-            
-            # Download images
-            if message.photo:
-                img_channel_dir = os.path.join(IMAGE_DIR, str(entity.id))
-                os.makedirs(img_channel_dir, exist_ok=True)
-                filename = f"{entity.id}_{message.id}.jpg"
-                save_path = os.path.join(img_channel_dir, filename)
-                if not os.path.exists(save_path):
-                    try:
-                        await client.download_media(message.photo, save_path)
-                        logger.info(f"Downloaded image for message {message.id} in {channel_name}")
-                    except Exception as img_err:
-                        logger.warning(f"Failed to download image for message {message.id}: {img_err}")
-
-        # Save to JSON
-        json_filename = f"{entity.id}_{channel_name}_{date_str}.json"
-        with open(os.path.join(channel_data_dir, json_filename), "w", encoding="utf-8") as f:
-            json.dump(messages, f, ensure_ascii=False, indent=2)
-        
-        logger.info(f"Successfully scraped {len(messages)} messages from {channel_username}")
+        # Each message is appended as it arrives; a later run today appends to the same partition
+        writer = PartitionWriter(channel_data_dir, f"{entity.id}_{channel_name}_{date_str}",
+                                 compression=compression, max_bytes=MAX_PART_BYTES)
+
+        min_id = 0
+        if checkpoints is not None and not full_refresh:
+            min_id = checkpoints.last_message_id(entity.id) or 0
+        # Incremental runs take everything above the checkpoint; bootstrap runs are capped
+        limit = None if min_id else message_limit
+        if min_id:
+            logger.info(f"Fetching messages newer than {min_id} for {channel_username}")
+        if checkpoints is not None:
+            await retry_media(client, entity, checkpoints, downloader)
+
+        newest = None
+        photo_ids = []
+        # Telegram returns newest first; on FloodWait resume below the oldest id seen
+        offset_id = 0
+        retries = 0
+        try:
+            while True:
+                # Time spent waiting on the iterator, summed over each page of messages
+                page_wait, page_count = 0.0, 0
+                waiting_since = time.perf_counter()
+                try:
+                    async for message in client.iter_messages(
+                        entity,
+                        limit=None if limit is None else limit - writer.records,
+                        offset_id=offset_id,
+                        min_id=min_id,
+                    ):
+                        page_wait += time.perf_counter() - waiting_since
+                        page_count += 1
+                        if page_count == ITER_PAGE_SIZE:
+                            metrics.iter_page_seconds.observe(page_wait, channel=channel_username)
+                            page_wait, page_count = 0.0, 0
+                        msg_data = {
+                            "id": message.id,
+                            "date": message.date.isoformat(),
+                            "text": message.text,
+                            "views": message.views,
+                            "forwards": message.forwards,
+                            "media": bool(message.media),
+                            "sender_id": message.sender_id,
+                            "reply_to": message.reply_to.reply_to_msg_id if message.reply_to else None,
+                            "channel_id": entity.id,
+                            "channel_name": channel_name
+                        }
+                        writer.write(msg_data)
+                        newest = message.id if newest is None else max(newest, message.id)
+                        offset_id = message.id
+                        metrics.messages_fetched.inc(channel=channel_username)
+                    
+                        # Queue images; the download workers fetch them off the iteration path
+                        if message.photo:
+                            stats["photos"] += 1
+                            photo_ids.append(message.id)
+                            await downloader.submit(message.photo, image_path(entity.id, message.id))
+                        waiting_since = time.perf_counter()
+                    page_wait += time.perf_counter() - waiting_since
+                    if page_count or page_wait:
+                        metrics.iter_page_seconds.observe(page_wait, channel=channel_username)
+                    break
+                except FloodWaitError as fw:
+                    # Only this channel backs off; other channel tasks keep running
+                    retries += 1
+                    if retries > MAX_FLOOD_RETRIES:
+                        raise
+                    stats["flood_wait_s"] += fw.seconds
+                    metrics.flood_wait_seconds.inc(fw.seconds, channel=channel_username)
+                    logger.warning(
+                        f"FloodWait of {fw.seconds}s on {channel_username} "
+                        f"(retry {retries}/{MAX_FLOOD_RETRIES}), resuming below message {offset_id}"
+                    )
+                    await asyncio.sleep(fw.seconds)
+        finally:
+            # Flush buffered/compressed lines even when the scrape fails part way
+            writer.close()
+            stats["messages"] = writer.records
+
+        if checkpoints is not None:
+            checkpoints.record_run(entity.id, channel_name, newest, writer.records, full_refresh, photo_ids)
+
+        stats["ok"] = True
+        logger.info(f"Successfully scraped {writer.records} messages from {channel_username}")
     
     except Exception as e:
         logger.error(f"Error scraping {channel_username}: {e}")
         # Add a small delay to prevent rapid-fire errors if it's a connection issue
         await asyncio.sleep(5)
 
-async def main():
-    async with TelegramClient('src/session_name', API_ID, API_HASH) as client:
-        for channel in CHANNELS:
-            await scrape_channel(client, channel)
+    if own_downloader:
+        await downloader.close()
+        logger.info(f"Media downloads for {channel_username}: {downloader.summary()}")
+        if checkpoints is not None and stats["channel_id"] is not None:
+            resolve_downloads(checkpoints, [stats["channel_id"]])
+    stats["wall_s"] = round(time.monotonic() - started, 3)
+    metrics.record_span("scrape_channel", span_started, channel=channel_username,
+                        messages=stats["messages"], ok=stats["ok"])
+    return stats
+
+
+def image_path(channel_id, message_id):
+    """IMAGE_DIR/<channel_id>/<channel_id>_<message_id>.jpg, creating the channel directory."""
+    channel_dir = os.path.join(IMAGE_DIR, str(channel_id))
+    os.makedirs(channel_dir, exist_ok=True)
+    return os.path.join(channel_dir, f"{channel_id}_{message_id}.jpg")
+
+
+async def retry_media(client, entity, checkpoints, downloader):
+    """Queue the photos a previous run failed to download, fetching their messages by id."""
+    pending = checkpoints.pending_media(entity.id)
+    if not pending:
+        return
+    queued = set()
+    try:
+        async for message in client.iter_messages(entity, ids=pending):
+            if message is not None and message.photo:
+                queued.add(message.id)
+                await downloader.submit(message.photo, image_path(entity.id, message.id))
+    except FloodWaitError as fw:
+        # they stay pending for the next run; new messages are fetched as usual
+        logger.warning(f"FloodWait of {fw.seconds}s re-fetching {len(pending)} photos of {entity.id}, skipped")
+        return
+    # deleted messages (or ones without a photo) can never be downloaded
+    checkpoints.resolve_media(entity.id, [m for m in pending if m not in queued])
+    if queued:
+        logger.info(f"Retrying {len(queued)} photo downloads from earlier runs for {entity.id}")
+
+
+def resolve_downloads(checkpoints, channel_ids):
+    """Drop the pending photos that are now on disk; the rest are retried on the next run."""
+    for channel_id in channel_ids:
+        pending = checkpoints.pending_media(channel_id)
+        checkpoints.resolve_media(channel_id, [m for m in pending if os.path.exists(image_path(channel_id, m))])
+        remaining = len(checkpoints.pending_media(channel_id))
+        if remaining:
+            logger.warning(f"{remaining} photos of channel {channel_id} are not downloaded yet, retrying next run")
+
+
+async def scrape_all(client, channels, concurrency=CONCURRENCY, checkpoints=None, full_refresh=False,
+                     downloader=None, metrics=None, message_limit=MESSAGE_LIMIT, compression=COMPRESSION):
+    """Scrape channels as separate tasks, at most `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def bounded(channel):
+        async with semaphore:
+            return await scrape_channel(client, channel, checkpoints, full_refresh, downloader, metrics,
+                                        message_limit, compression)
+
+    started = time.monotonic()
+    results = await asyncio.gather(*(bounded(c.strip()) for c in channels if c.strip()))
+    total = time.monotonic() - started
+
+    for r in results:
+        status = "ok" if r["ok"] else "failed"
+        logger.info(
+            f"Channel {r['channel']}: {status}, {r['messages']} messages in {r['wall_s']:.1f}s "
+            f"(FloodWait {r['flood_wait_s']}s)"
+        )
+    slowest = max((r["wall_s"] for r in results), default=0.0)
+    logger.info(
+        f"Scraped {len(results)} channels in {total:.1f}s "
+        f"(slowest channel {slowest:.1f}s, sum of channels {sum(r['wall_s'] for r in results):.1f}s, "
+        f"concurrency {concurrency})"
+    )
+    return results
+
+
+def make_client(kind=CLIENT):
+    """Build the Telegram client, or the offline replay client for tests and benchmarks."""
+    if kind == "replay":
+        return ReplayClient.from_env()
+    # flood_sleep_threshold=0 surfaces every FloodWait to scrape_channel, so the
+    # affected channel backs off on its own instead of inside the shared client
+    return TelegramClient('src/session_name', API_ID, API_HASH, flood_sleep_threshold=0)
+
+
+async def main(concurrency=CONCURRENCY, full_refresh=False, checkpoint_path=CHECKPOINT_PATH,
+               download_workers=DOWNLOAD_WORKERS, client=None, channels=None,
+               metrics_prom_path=METRICS_PROM_PATH, run_report_path=RUN_REPORT_PATH, detect_queue=None,
+               message_limit=MESSAGE_LIMIT, compression=COMPRESSION):
+    metrics = ScrapeMetrics()
+    async with (client or make_client()) as client:
+        checkpoints = CheckpointStore(checkpoint_path)
+        # One download pool for the whole run, shared by every channel task
+        downloader = MediaDownloader(client, workers=download_workers, metrics=metrics,
+                                     detect_queue=detect_queue or DETECT_QUEUE)
+        downloader.start()
+        results = await scrape_all(client, channels or CHANNELS, concurrency, checkpoints, full_refresh,
+                                   downloader, metrics, message_limit, compression)
+        with metrics.span("drain_downloads"):
+            await downloader.close()
+        resolve_downloads(checkpoints, [r["channel_id"] for r in results if r["channel_id"] is not None])
+        s = downloader.summary()
+        logger.info(
+            f"Media downloads: {s['downloaded']} files, {s['bytes'] / 1e6:.1f} MB in {s['elapsed_s']:.1f}s "
+            f"({s['mb_per_s']:.2f} MB/s), {s['skipped']} skipped, {s['retries']} retries, {s['failed']} failed"
+        )
+        if s['enqueued']:
+            logger.info(f"Enqueued {s['enqueued']} images for detection")
+    if metrics_prom_path:
+        metrics.write_prometheus(metrics_prom_path)
+        logger.info(f"Wrote scrape metrics to {metrics_prom_path}")
+    if run_report_path:
+        metrics.write_json(run_report_path, channels=results, downloads=s)
+        logger.info(f"Wrote run report to {run_report_path}")
+    return results
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY,
+                        help='Maximum number of channels scraped at the same time (1 = sequential)')
+    parser.add_argument('--full-refresh', action='store_true',
+                        help='Ignore checkpoints and re-fetch up to --limit messages per channel')
+    parser.add_argument('--limit', type=int, default=MESSAGE_LIMIT,
+                        help='Message cap for channels without a checkpoint or on --full-refresh (0 = all history)')
+    parser.add_argument('--checkpoints', default=CHECKPOINT_PATH, help='Path to the checkpoint store')
+    parser.add_argument('--compression', choices=['none', 'gzip', 'zstd'], default=COMPRESSION,
+                        help='Compression for raw JSONL partitions')
+    parser.add_argument('--client', choices=['telegram', 'replay'], default=CLIENT,
+                        help='Scrape Telegram, or the offline replay client configured by REPLAY_* variables')
+    parser.add_argument('--download-workers', type=int, default=DOWNLOAD_WORKERS,
+                        help='Number of concurrent media download workers')
+    parser.add_argument('--metrics-prom', default=METRICS_PROM_PATH,
+                        help='Prometheus text file written at the end of the run')
+    parser.add_argument('--run-report', default=RUN_REPORT_PATH,
+                        help='JSON run report (metrics, per-channel stats, spans) written at the end of the run')
+    parser.add_argument('--detect-queue', default=DETECT_QUEUE,
+                        help='Enqueue downloaded images for the detection worker (src/detection_service.py)')
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    import asyncio
-    asyncio.run(main())
+    args = parse_args()
+    asyncio.run(main(args.concurrency, args.full_refresh, args.checkpoints, args.download_workers,
+                     client=make_client(args.client), metrics_prom_path=args.metrics_prom,
+                     run_report_path=args.run_report, detect_queue=args.detect_queue,
+                     message_limit=args.limit or None, compression=args.compression))
@@ -1,16 +1,32 @@
 import os
-import csv
-import json
+import sys
+import time
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-import torch
 from pathlib import Path
 
+# Add root to sys.path so sibling modules resolve when run as a script
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src.detection_cache import DetectionCache, CACHE_PATH
+from src.image_dedup import MAX_DISTANCE, cluster_images, write_clusters
+from src.inference_backends import BACKENDS, load_backend, load_model, model_weights_name, predict_batch
+from src.detection_writer import (DetectionWriter, CHUNK_ROWS, default_format,
+                                  completed_images, latest_incomplete_run, mark_complete)
+
 # Minimal YOLO runner using ultralytics/yolov5 or yolov8 if installed
-# This script supports CPU fallback and produces a CSV sidecar of detections.
+# This script supports CPU fallback and writes detections incrementally to a
+# run directory of Parquet/Arrow/CSV part files (see src/detection_writer.py).
 
 IMAGE_DIR = "data/raw/images"
 OUTPUT_DIR = "data/derived/image_detections"
+IMAGE_SUFFIXES = ('.jpg', '.jpeg', '.png')
+# Square input size images are letterboxed to before batching
+IMG_SIZE = 640
+BATCH_SIZE = 16
+# Threads decoding and letterboxing images ahead of the model
+DECODE_WORKERS = 4
 
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
@@ -33,81 +49,266 @@ CLASS_MAP = {
 }
 
 
-def run_inference(weights: str, device: str = 'cpu', conf_thresh: float = 0.25):
+def extract_message_id_from_path(image_path: str):
+    base = os.path.basename(image_path)
+    parts = base.split("_")
+    if len(parts) < 2:
+        return None
+    msg_part = parts[1]
+    msg_id = os.path.splitext(msg_part)[0]
     try:
-        from ultralytics import YOLO
-        model = YOLO(weights)
+        return int(msg_id)
     except Exception:
+        return None
+
+
+def iter_images(image_dir: str = IMAGE_DIR):
+    """Yield image paths under IMAGE_DIR/<channel_id>/ in a stable order."""
+    for channel_dir in sorted(Path(image_dir).iterdir()):
+        if not channel_dir.is_dir():
+            continue
+        for img in sorted(channel_dir.iterdir()):
+            if img.suffix.lower() in IMAGE_SUFFIXES:
+                yield img
+
+
+def letterbox(image, size: int = IMG_SIZE, color=(114, 114, 114)):
+    """Resize keeping aspect ratio and pad to a size x size square (YOLO's letterbox)."""
+    import cv2
+    h, w = image.shape[:2]
+    scale = min(size / h, size / w)
+    nh, nw = int(round(h * scale)), int(round(w * scale))
+    if (nh, nw) != (h, w):
+        image = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    top, left = (size - nh) // 2, (size - nw) // 2
+    return cv2.copyMakeBorder(image, top, size - nh - top, left, size - nw - left,
+                              cv2.BORDER_CONSTANT, value=color)
+
+
+def load_image(path, size: int = IMG_SIZE):
+    """Decode and letterbox one image (BGR, as ultralytics expects); None if unreadable."""
+    import cv2
+    image = cv2.imread(str(path))
+    if image is None:
+        return None
+    return letterbox(image, size)
+
+
+def iter_decoded_batches(paths, batch_size: int = BATCH_SIZE, workers: int = DECODE_WORKERS,
+                         size: int = IMG_SIZE):
+    """Yield (paths, arrays) batches, decoding in a thread pool one batch ahead of the caller."""
+    paths = list(paths)
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = None
+        for batch in batches + [None]:
+            # submit the next batch before handing out the current one
+            submitted = (batch, [pool.submit(load_image, p, size) for p in batch]) if batch else None
+            if pending:
+                batch_paths, futures = pending
+                decoded = [(p, f.result()) for p, f in zip(batch_paths, futures)]
+                for p, arr in decoded:
+                    if arr is None:
+                        print(f"Failed to decode {p}")
+                yield [p for p, arr in decoded if arr is not None], [arr for p, arr in decoded if arr is not None]
+            pending = submitted
+
+
+def detection_rows(img, detections, model_weights: str):
+    """Build CSV rows for one image's detections."""
+    rows = []
+    message_id = extract_message_id_from_path(str(img))
+    for box_index, (label, score) in enumerate(detections):
+        rows.append({
+            'channel_id': Path(img).parent.name,
+            'message_id': message_id,
+            'image_path': str(img),
+            'model_weights': model_weights,
+            'box_index': box_index,
+            'product_label': CLASS_MAP.get(label, 'other'),
+            'original_label': label,
+            'score': score,
+            'detection_timestamp': datetime.utcnow().isoformat()
+        })
+    return rows
+
+
+def infer_images(backend, paths, batch_size: int = BATCH_SIZE, workers: int = DECODE_WORKERS):
+    """Yield (image_path, detections) for each image the backend processed."""
+    for batch_paths, arrays in iter_decoded_batches(paths, batch_size, workers):
+        if not arrays:
+            continue
         try:
-            # fallback to torch.hub yolov5
-            model = torch.hub.load('ultralytics/yolov5', 'custom', path=weights, force_reload=False)
+            batch_detections = backend.predict(arrays)
         except Exception as e:
-            raise RuntimeError('No YOLO model available')
-
-    results_rows = []
-    def extract_message_id_from_path(image_path: str):
-        base = os.path.basename(image_path)
-        parts = base.split("_")
-        if len(parts) < 2:
-            return None
-        msg_part = parts[1]
-        msg_id = os.path.splitext(msg_part)[0]
-        try:
-            return int(msg_id)
-        except Exception:
-            return None
+            print(f"Failed inference on batch starting at {batch_paths[0]}: {e}")
+            continue
+        yield from zip(batch_paths, batch_detections)
 
-    for channel_dir in Path(IMAGE_DIR).iterdir():
-        if not channel_dir.is_dir():
+
+def pin_threads(threads):
+    """Limit torch's intra-op pool (and OpenMP/MKL) to ``threads`` threads."""
+    if not threads:
+        return
+    for var in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+
+
+def run_inference(weights: str, device: str = 'cpu', conf_thresh: float = 0.25,
+                  batch_size: int = BATCH_SIZE, workers: int = DECODE_WORKERS,
+                  cache_path: str = CACHE_PATH, processes: int = 1, threads: int = None,
+                  image_dir: str = IMAGE_DIR, output_dir: str = OUTPUT_DIR,
+                  fmt: str = None, run_dir: str = None, chunk_rows: int = CHUNK_ROWS,
+                  backend: str = 'torch', dedup_distance: int = MAX_DISTANCE):
+    """Detect objects in every image and write the detections to a run directory.
+
+    Rows are flushed in chunks of ``chunk_rows``; passing the ``run_dir`` of a
+    killed run resumes it, skipping images already in its manifest.
+    With a ``cache_path``, images whose content, weights and threshold were
+    seen before are served from the detection cache; only misses are decoded
+    and sent to the model. Pass ``cache_path=None`` to always run the model.
+    With ``processes`` > 1 the misses are split across worker processes (see
+    src/yolo_shards.py), each pinned to ``threads`` torch threads.
+    ``backend`` selects eager PyTorch or ONNX Runtime (see src/inference_backends.py).
+    Unless ``dedup_distance`` is None, near-duplicate images are clustered
+    first (src/image_dedup.py): the model runs on one image per cluster and
+    its detections are written for every member. The clusters are saved to
+    ``<run_dir>/_clusters.csv``.
+    """
+    fmt = fmt or default_format()
+    # (image_path, model_weights, box_index) identifies a detection across re-runs
+    model_weights = model_weights_name(backend, weights)
+    run_dir = run_dir or os.path.join(output_dir, f'detections_{datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")}')
+    done = completed_images(run_dir)
+    if done:
+        print(f"Resuming {run_dir}: {len(done)} images already written")
+    writer = DetectionWriter(run_dir, fmt, chunk_rows)
+    cache = DetectionCache(weights, conf_thresh, cache_path, backend) if cache_path else None
+
+    def fan_out(img, detections):
+        """Record a near-duplicate's detections without running the model on it.
+
+        They are not cached: the exact-image cache only holds what the model
+        produced for that image, so --no-dedup or a smaller distance never
+        serves inherited boxes.
+        """
+        nonlocal fanned_out
+        writer.add(img, detection_rows(img, detections, model_weights))
+        fanned_out += 1
+
+    started = time.perf_counter()
+    images_done = 0
+    fanned_out = 0
+    images = [img for img in iter_images(image_dir)]
+    # image -> cluster id; members only ever inherit the representative's own detections
+    cluster_of = {}
+    representative_of = {}
+    known = {}
+    if dedup_distance is not None:
+        clusters = cluster_images(images, dedup_distance, cache, workers)
+        write_clusters(clusters, os.path.join(run_dir, '_clusters.csv'))
+        for i, cluster in enumerate(clusters):
+            representative_of[i] = cluster[0][0]
+            for path, _ in cluster:
+                cluster_of[path] = i
+
+    to_infer = []
+    digests = {}
+    for img in images:
+        if str(img) in done:
             continue
-        for img in channel_dir.iterdir():
-            if img.suffix.lower() not in ['.jpg', '.jpeg', '.png']:
+        if cache is not None:
+            digest = cache.digest(img)
+            cached = cache.get(digest)
+            if cached is not None:
+                writer.add(img, detection_rows(img, cached, model_weights))
+                if img in cluster_of and representative_of[cluster_of[img]] == img:
+                    known[cluster_of[img]] = cached
                 continue
-            try:
-                res = model(str(img))
-                # ultralytics returns a special results object; normalize
-                boxes = []
-                if hasattr(res, 'boxes'):
-                    boxes = res.boxes
-                elif isinstance(res, list) and len(res) > 0 and hasattr(res[0], 'boxes'):
-                    boxes = res[0].boxes
-
-                message_id = extract_message_id_from_path(str(img))
-                for b in boxes:
-                    # attempt to extract label and confidence
-                    try:
-                        if hasattr(b, 'cls'):
-                            cls = int(b.cls)
-                            label = model.names[cls] if hasattr(model, 'names') else str(cls)
-                        else:
-                            label = str(b.label) if hasattr(b, 'label') else 'unknown'
-                    except Exception:
-                        label = 'unknown'
-                    score = float(b.conf) if hasattr(b, 'conf') else float(b[4])
-
-                    product_label = CLASS_MAP.get(label, 'other')
-                    detection_ts = datetime.utcnow().isoformat()
-                    results_rows.append({
-                        'channel_id': channel_dir.name,
-                        'message_id': message_id,
-                        'image_path': str(img),
-                        'product_label': product_label,
-                        'original_label': label,
-                        'score': score,
-                        'detection_timestamp': detection_ts
-                    })
-            except Exception as e:
-                print(f"Failed inference on {img}: {e}")
-
-    csv_path = os.path.join(OUTPUT_DIR, f'detections_{datetime.utcnow().strftime("%Y%m%dT%H%M%SZ")}.csv')
-    with open(csv_path, 'w', newline='', encoding='utf-8') as cf:
-        writer = csv.DictWriter(cf, fieldnames=['channel_id','message_id','image_path','product_label','original_label','score','detection_timestamp'])
-        writer.writeheader()
-        for r in results_rows:
-            writer.writerow(r)
-
-    print(f"Wrote {len(results_rows)} detections to {csv_path}")
-    return csv_path
+            digests[img] = digest
+        to_infer.append(img)
+
+    # representatives go to the model and the other members wait for their detections; a member
+    # whose representative is neither cached nor inferred in this run (done before a resume) runs itself
+    pending = {cluster_of[img] for img in to_infer
+               if img in cluster_of and representative_of[cluster_of[img]] == img}
+    followers = {cid: [] for cid in pending}
+    representatives = []
+    for img in to_infer:
+        cid = cluster_of.get(img)
+        if cid is None or representative_of[cid] == img:
+            representatives.append(img)
+        elif cid in known:
+            fan_out(img, known[cid])
+        elif cid in pending:
+            followers[cid].append(img)
+        else:
+            representatives.append(img)
+    writer.flush()
+
+    model = None
+    sharded = representatives and processes > 1
+    if sharded:
+        from src.yolo_shards import run_shards, merge_shards
+        inferred = run_shards(representatives, weights, device, conf_thresh, processes, threads,
+                              batch_size, workers, run_dir, fmt, chunk_rows, backend)
+    elif representatives:
+        pin_threads(threads)
+        model = load_backend(backend, weights, device, conf_thresh, IMG_SIZE)
+        inferred = infer_images(model, representatives, batch_size, workers)
+    else:
+        inferred = []
+
+    for img, detections in inferred:
+        if not sharded:
+            writer.add(img, detection_rows(img, detections, model_weights))
+        if cache is not None:
+            cache.put(digests[img], detections)
+        for member in followers.pop(cluster_of.get(img), ()):
+            fan_out(member, detections)
+        images_done += 1
+        if cache is not None and images_done % batch_size == 0:
+            cache.commit()
+
+    # followers whose representative failed to decode or whose batch failed go to the model themselves
+    orphans = [img for members in followers.values() for img in members]
+    if orphans:
+        print(f"Running {len(orphans)} near-duplicates whose representative failed")
+        if model is None:
+            pin_threads(threads)
+            model = load_backend(backend, weights, device, conf_thresh, IMG_SIZE)
+        for img, detections in infer_images(model, orphans, batch_size, workers):
+            writer.add(img, detection_rows(img, detections, model_weights))
+            if cache is not None:
+                cache.put(digests[img], detections)
+            images_done += 1
+    writer.close()
+    if sharded:
+        merge_shards(run_dir)
+    # a run is complete only once every image is in a manifest; --resume retries the rest
+    written = completed_images(run_dir)
+    missing = [img for img in images if str(img) not in written]
+    if missing:
+        print(f"{len(missing)} images failed (e.g. {missing[0]}); leaving {run_dir} incomplete")
+    else:
+        mark_complete(run_dir)
+    elapsed = time.perf_counter() - started
+
+    rate = images_done / elapsed if elapsed else 0.0
+    print(f"Processed {images_done} images in {elapsed:.1f}s ({rate:.1f} images/s, batch size {batch_size})")
+    if fanned_out:
+        print(f"Reused detections for {fanned_out} near-duplicate images")
+    if cache is not None:
+        stats = cache.summary()
+        cache.close()
+        print(f"Detection cache: {stats['hits']} hits, {stats['misses']} misses (hit rate {stats['hit_rate']:.1%})")
+    print(f"Wrote detections to {run_dir} ({fmt})")
+    return run_dir
 
 
 if __name__ == '__main__':
@@ -115,5 +316,26 @@ if __name__ == '__main__':
     parser.add_argument('--weights', required=True)
     parser.add_argument('--device', default='cpu')
     parser.add_argument('--conf', type=float, default=0.25)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Images per forward pass')
+    parser.add_argument('--workers', type=int, default=DECODE_WORKERS, help='Image decoding threads')
+    parser.add_argument('--cache', default=CACHE_PATH, help='SQLite detection cache path')
+    parser.add_argument('--no-cache', action='store_true', help='Run the model on every image')
+    parser.add_argument('--backend', choices=BACKENDS, default='torch', help='Inference runtime')
+    parser.add_argument('--dedup-distance', type=int, default=MAX_DISTANCE,
+                        help='Max dHash bits apart for two images to share detections')
+    parser.add_argument('--no-dedup', action='store_true', help='Run the model on every near-duplicate')
+    parser.add_argument('--processes', type=int, default=1, help='Worker processes, each with its own model')
+    parser.add_argument('--threads', type=int, default=None, help='Torch threads per process')
+    parser.add_argument('--format', choices=['parquet', 'arrow', 'csv'], default=None,
+                        help='Part file format (default: parquet if pyarrow is installed, else csv)')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='Rows per part file')
+    parser.add_argument('--run-dir', default=None, help='Run directory to write to (resumes it if it exists)')
+    parser.add_argument('--resume', action='store_true', help='Resume the latest unfinished run in the output dir')
     args = parser.parse_args()
-    run_inference(args.weights, args.device, args.conf)
+    run_dir = args.run_dir
+    if args.resume and not run_dir:
+        run_dir = latest_incomplete_run(OUTPUT_DIR)
+    run_inference(args.weights, args.device, args.conf, args.batch_size, args.workers,
+                  None if args.no_cache else args.cache, args.processes, args.threads,
+                  fmt=args.format, run_dir=run_dir, chunk_rows=args.chunk_rows, backend=args.backend,
+                  dedup_distance=None if args.no_dedup else args.dedup_distance)
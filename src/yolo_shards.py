@@ -0,0 +1,67 @@
+import os
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Sharded inference: the image list is split across worker processes, each
+# with its own model and a fixed torch thread count, so a many-core box is not
+# limited to one intra-op pool and one Python loop. Workers write their own
+# part files and manifest into the run directory; merge_shards folds the shard
+# manifests together once every worker has finished.
+
+
+def shard_paths(paths, shards):
+    """Split ``paths`` round-robin into ``shards`` lists (keeps per-channel load even)."""
+    return [paths[i::shards] for i in range(shards)]
+
+
+def _init_worker(threads):
+    from src.yolo_detect import pin_threads
+    pin_threads(threads)
+
+
+def _run_shard(index, paths, weights, device, conf_thresh, batch_size, workers, run_dir, fmt, chunk_rows,
+               backend):
+    from src.yolo_detect import IMG_SIZE, infer_images, detection_rows
+    from src.detection_writer import DetectionWriter
+    from src.inference_backends import load_backend
+
+    started = time.perf_counter()
+    model = load_backend(backend, weights, device, conf_thresh, IMG_SIZE)
+    inferred = []
+    with DetectionWriter(run_dir, fmt, chunk_rows, shard=index) as writer:
+        for img, detections in infer_images(model, paths, batch_size, workers):
+            writer.add(img, detection_rows(img, detections, model.model_weights))
+            inferred.append((str(img), detections))
+    elapsed = time.perf_counter() - started
+    print(f"Shard {index}: {len(inferred)} images in {elapsed:.1f}s")
+    return inferred
+
+
+def run_shards(paths, weights, device='cpu', conf_thresh=0.25, processes=2, threads=None,
+               batch_size=16, workers=2, run_dir='detections', fmt='csv', chunk_rows=5000, backend='torch'):
+    """Run inference over ``paths`` in ``processes`` workers writing into ``run_dir``.
+
+    Returns ``(image_path, detections)`` for every image processed.
+    """
+    from pathlib import Path
+
+    shards = [s for s in shard_paths(list(paths), processes) if s]
+    # spawn, not fork: a forked torch/OpenMP runtime can deadlock in the child
+    ctx = multiprocessing.get_context('spawn')
+    inferred = []
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=ctx,
+                             initializer=_init_worker, initargs=(threads,)) as pool:
+        futures = [pool.submit(_run_shard, i, shard, weights, device, conf_thresh, batch_size, workers,
+                               run_dir, fmt, chunk_rows, backend)
+                   for i, shard in enumerate(shards)]
+        for future in futures:
+            inferred.extend((Path(p), d) for p, d in future.result())
+    return inferred
+
+
+def merge_shards(run_dir):
+    """Combine the shard outputs of ``run_dir`` once all workers are done."""
+    from src.detection_writer import merge_manifests
+    merge_manifests(run_dir)
+    return run_dir
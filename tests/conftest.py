@@ -0,0 +1,63 @@
+import pytest
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def fetchall(self):
+        return self._rows
+
+    async def partitions(self, size):
+        for i in range(0, len(self._rows), size):
+            yield self._rows[i:i + size]
+
+
+class FakeConn:
+    def __init__(self, engine):
+        self.engine = engine
+
+    async def execute(self, q, params=None):
+        return self.engine.run(q, params)
+
+    async def stream(self, q, params=None):
+        return self.engine.run(q, params)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeEngine:
+    """Stands in for the API's async engine: every query returns ``rows``.
+
+    ``rows`` may also be a function of the SQL text, and ``error`` is raised
+    instead of answering. Executed queries are kept in ``calls`` as
+    ``(sql, params)`` pairs.
+    """
+
+    def __init__(self, rows=(), error=None):
+        self.rows = rows
+        self.error = error
+        self.calls = []
+
+    @property
+    def params(self):
+        return [params for _, params in self.calls]
+
+    def run(self, q, params):
+        if self.error:
+            raise self.error
+        self.calls.append((str(q), params))
+        rows = self.rows(str(q)) if callable(self.rows) else self.rows
+        return FakeResult(list(rows))
+
+    def connect(self):
+        return FakeConn(self)
+
+
+@pytest.fixture
+def fake_engine():
+    return FakeEngine
@@ -0,0 +1,104 @@
+import asyncio
+
+from api.cache import QueryCache, make_key
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def counting_fetch(calls, value):
+    async def fetch():
+        calls.append(value)
+        return value
+    return fetch
+
+
+def test_lru_eviction_and_ttl():
+    clock = Clock()
+    cache = QueryCache(max_entries=2, ttl=10, clock=clock)
+    calls = []
+    run(cache.get_or_fetch(make_key("a"), counting_fetch(calls, 1)))
+    run(cache.get_or_fetch(make_key("b"), counting_fetch(calls, 2)))
+    # touch a so b is least recently used
+    assert run(cache.get_or_fetch(make_key("a"), counting_fetch(calls, 99))) == 1
+    run(cache.get_or_fetch(make_key("c"), counting_fetch(calls, 3)))
+    assert run(cache.get_or_fetch(make_key("b"), counting_fetch(calls, 2))) == 2
+    assert calls == [1, 2, 3, 2]
+    assert cache.stats["evictions"] == 2
+
+    clock.now = 11
+    run(cache.get_or_fetch(make_key("b"), counting_fetch(calls, 4)))
+    assert calls[-1] == 4
+    assert cache.stats["expirations"] == 1
+
+
+def test_invalidated_when_warehouse_version_moves():
+    clock = Clock()
+    version = {"v": 1}
+
+    async def loader():
+        return version["v"]
+
+    cache = QueryCache(loader, ttl=3600, version_check_interval=5, clock=clock)
+    calls = []
+    key = make_key("top-products", limit=10)
+    run(cache.get_or_fetch(key, counting_fetch(calls, "old")))
+    version["v"] = 2
+    # within the check interval the old result is still served
+    assert run(cache.get_or_fetch(key, counting_fetch(calls, "new"))) == "old"
+    clock.now = 6
+    assert run(cache.get_or_fetch(key, counting_fetch(calls, "new"))) == "new"
+    summary = cache.summary()
+    assert summary["invalidations"] == 1
+    assert summary["warehouse_version"] == 2
+    assert (summary["hits"], summary["misses"]) == (1, 2)
+
+
+def test_concurrent_misses_share_one_query():
+    cache = QueryCache()
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "rows"
+
+    async def burst():
+        return await asyncio.gather(*[cache.get_or_fetch(make_key("x"), fetch) for _ in range(5)])
+
+    assert run(burst()) == ["rows"] * 5
+    assert len(calls) == 1
+
+
+def product_queries(engine):
+    return sum("warehouse_version" not in sql for sql, _ in engine.calls)
+
+
+def test_top_products_served_from_cache(monkeypatch, fake_engine):
+    import api.main as main
+    from fastapi.testclient import TestClient
+
+    versions = [1]
+    engine = fake_engine(lambda sql: [(versions[-1],)] if "warehouse_version" in sql else [("medicine", 3)])
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(main, "result_cache", QueryCache(main.warehouse_version, version_check_interval=0))
+    client = TestClient(main.app)
+    for _ in range(3):
+        r = client.get("/top-products")
+        assert r.json() == [{"label": "medicine", "count": 3}]
+    assert product_queries(engine) == 1
+
+    versions.append(2)
+    client.get("/top-products")
+    assert product_queries(engine) == 2
+    stats = client.get("/cache/stats").json()
+    assert stats["hits"] == 2 and stats["misses"] == 2 and stats["invalidations"] == 1
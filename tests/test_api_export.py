@@ -0,0 +1,63 @@
+import io
+import csv
+import json
+import datetime
+
+import pytest
+
+
+DAY = datetime.date(2026, 1, 19)
+MESSAGES = [(i, 100, DAY, f"ፓራሲታሞል {i}", i * 10, 0, i % 2 == 0) for i in range(7)]
+
+
+@pytest.fixture
+def client(monkeypatch, fake_engine):
+    import api.main as main
+    from fastapi.testclient import TestClient
+
+    engine = fake_engine(MESSAGES)
+    monkeypatch.setattr(main, "engine", engine)
+    # several batches per export
+    monkeypatch.setattr(main.export, "EXPORT_BATCH_ROWS", 3)
+    c = TestClient(main.app)
+    c.engine = engine
+    return c
+
+
+def test_export_messages_ndjson_with_filters(client):
+    r = client.get("/export/messages", params={"channel_id": 100, "date_from": "2026-01-01"})
+    assert r.status_code == 200
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in r.text.splitlines()]
+    assert len(lines) == 7
+    assert lines[0] == {"message_id": 0, "channel_id": 100, "date_key": "2026-01-19", "message_text": "ፓራሲታሞል 0",
+                        "views": 0, "forwards": 0, "has_media": True}
+    assert client.engine.params[-1] == {"cid": 100, "date_from": datetime.date(2026, 1, 1), "date_to": None}
+
+
+def test_export_messages_csv_has_one_header(client):
+    r = client.get("/export/messages", params={"format": "csv"})
+    rows = list(csv.reader(io.StringIO(r.text)))
+    assert rows[0][:3] == ["message_id", "channel_id", "date_key"]
+    assert len(rows) == 8
+
+    client.engine.rows = []
+    r = client.get("/export/messages", params={"format": "csv"})
+    assert r.text.splitlines() == ["message_id,channel_id,date_key,message_text,views,forwards,has_media"]
+
+
+def test_export_detections_arrow_stream(client):
+    pa = pytest.importorskip("pyarrow")
+    ts = datetime.datetime(2026, 1, 20, 17, 29, 13)
+    client.engine.rows = [(i, 100, i, f"data/raw/images/100/{i}.jpg", "medicine", 0.5, ts) for i in range(5)]
+    r = client.get("/export/detections", params={"format": "arrow", "label": "medicine"})
+    assert r.status_code == 200
+    table = pa.ipc.open_stream(r.content).read_all()
+    assert table.num_rows == 5
+    assert table.schema.field("detection_timestamp").type == pa.timestamp("us")
+    assert table.column("image_path")[4].as_py() == "data/raw/images/100/4.jpg"
+    assert client.engine.params[-1]["lbl"] == "medicine"
+
+
+def test_export_rejects_unknown_format(client):
+    assert client.get("/export/messages", params={"format": "xml"}).status_code == 422
@@ -0,0 +1,111 @@
+import datetime
+
+
+def sample(text, line_prefix):
+    values = [line.rsplit(" ", 1)[1] for line in text.splitlines() if line.startswith(line_prefix)]
+    return float(values[0]) if values else 0.0
+
+
+def test_histogram_and_counter_exposition():
+    from src.metrics import Counter, Histogram
+
+    hist = Histogram("test_latency_seconds", "doc", ("route",), buckets=(0.1, 1.0))
+    hist.observe(0.05, route="/a")
+    hist.observe(0.1, route="/a")
+    hist.observe(3.0, route="/a")
+    assert list(hist.samples()) == [
+        ("test_latency_seconds_bucket", '{route="/a",le="0.1"}', 2),
+        ("test_latency_seconds_bucket", '{route="/a",le="1.0"}', 2),
+        ("test_latency_seconds_bucket", '{route="/a",le="+Inf"}', 3),
+        ("test_latency_seconds_sum", '{route="/a"}', 3.15),
+        ("test_latency_seconds_count", '{route="/a"}', 3),
+    ]
+    counter = Counter("test_total", "doc", ("q",))
+    counter.inc(q='say "hi"')
+    assert list(counter.samples()) == [("test_total", '{q="say \\"hi\\""}', 1)]
+
+
+def test_sample_values_render_without_rounding():
+    from src.metrics import Counter, Gauge, render
+
+    big, small, gauge = Counter("big_total", "doc"), Counter("small_total", "doc"), Gauge("g", "doc")
+    big.inc(1e6)
+    big.inc(1.0)
+    small.inc(0.1)
+    small.inc(0.2)
+    gauge.set(float("inf"))
+    text = render([big, small, gauge])
+    assert "big_total 1000001\n" in text
+    assert "small_total 0.30000000000000004\n" in text
+    assert "g +Inf\n" in text
+
+
+def test_metrics_endpoint_reports_routes_and_status(monkeypatch, fake_engine):
+    import api.main as main
+    from api.cache import QueryCache
+    from fastapi.testclient import TestClient
+
+    monkeypatch.setattr(main, "engine", fake_engine([(datetime.date(2026, 1, 19), 4, 120, 3)]))
+    monkeypatch.setattr(main, "result_cache", QueryCache(max_entries=0))
+    client = TestClient(main.app)
+
+    before = client.get("/metrics").text
+    client.get("/channel-activity", params={"days": 3})
+    client.get("/channel-activity", params={"granularity": "month"})
+    client.get("/no-such-route")
+    r = client.get("/metrics")
+    assert r.headers["content-type"].startswith("text/plain; version=0.0.4")
+    after = r.text
+
+    ok = 'http_requests_total{method="GET",route="/channel-activity",status="200"}'
+    invalid = 'http_requests_total{method="GET",route="/channel-activity",status="422"}'
+    unmatched = 'http_requests_total{method="GET",route="<unmatched>",status="404"}'
+    for prefix in (ok, invalid, unmatched):
+        assert sample(after, prefix) == sample(before, prefix) + 1
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/channel-activity",le="+Inf"}' in after
+    # the scrape itself is still in flight
+    assert sample(after, "http_requests_in_flight ") == 1
+    assert "# TYPE db_pool_checkout_wait_seconds histogram" in after
+
+
+def test_ready_probes_the_pool(monkeypatch, fake_engine):
+    import api.main as main
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)
+    monkeypatch.setattr(main, "engine", fake_engine([(1,)]))
+    assert client.get("/ready").json() == {"status": "ready"}
+
+    monkeypatch.setattr(main, "engine", fake_engine(error=ConnectionRefusedError()))
+    r = client.get("/ready")
+    assert r.status_code == 503
+    assert r.json() == {"status": "unavailable", "reason": "ConnectionRefusedError"}
+    # liveness does not touch the database
+    assert client.get("/health").status_code == 200
+
+
+def test_query_names_and_sql_timing():
+    import asyncio
+    from sqlalchemy import text
+    from api import database, metrics
+
+    assert database.query_name(text("SELECT max(version) FROM marts.warehouse_version")) == "warehouse_version"
+    assert database.query_name(text("SELECT 42")) == "other"
+
+    engine = database.instrument(database.create_engine_from_url("sqlite:///:memory:"))
+    probe = text("SELECT 1 AS probe_for_metrics")
+    broken = text("SELECT * FROM missing_table_for_metrics")
+    database.register_queries({"probe": probe, "broken": {"x": broken}})
+
+    async def run():
+        async with database.checkout(engine) as conn:
+            await conn.execute(probe)
+            try:
+                await conn.execute(broken)
+            except Exception:
+                pass
+        await engine.dispose()
+
+    asyncio.run(run())
+    assert sum(metrics.QUERY_LATENCY.series[("probe",)][0]) == 1
+    assert metrics.QUERY_ERRORS.values[("broken[x]",)] == 1
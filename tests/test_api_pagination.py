@@ -0,0 +1,135 @@
+import os
+import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from api.pagination import encode_cursor, decode_cursor
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    token = encode_cursor(0.5, 123, 7)
+    assert decode_cursor(token, (float, int, int)) == [0.5, 123, 7]
+    for bad in ("not-a-cursor", encode_cursor(1, 2), encode_cursor("x", 1, 2)):
+        with pytest.raises(HTTPException) as exc:
+            decode_cursor(bad, (float, int, int))
+        assert exc.value.status_code == 400
+
+
+def test_message_search_pages_with_cursor(monkeypatch, fake_engine):
+    import api.main as main
+    from fastapi.testclient import TestClient
+
+    day = datetime.date(2026, 1, 19)
+    rows = [(11, 100, day, "paracetamol 500mg", 1.5, False), (10, 100, day, "ፓራሲታሞል paracetamol", 1.25, False)]
+    engine = fake_engine(rows)
+    monkeypatch.setattr(main, "engine", engine)
+    client = TestClient(main.app)
+
+    r = client.get("/message-search", params={"q": "paracetamol", "limit": 2, "channel_id": 100,
+                                              "date_from": "2026-01-01"})
+    assert r.status_code == 200
+    assert [m["message_id"] for m in r.json()] == [11, 10]
+    assert r.json()[0]["rank"] == 1.5
+    first = engine.params[-1]
+    assert first["pat"] == "%paracetamol%" and first["cid"] == 100
+    assert first["date_from"] == datetime.date(2026, 1, 1) and first["after_rank"] is None
+
+    cursor = r.headers["X-Next-Cursor"]
+    r = client.get("/message-search", params={"q": "paracetamol", "limit": 2, "cursor": cursor})
+    assert r.status_code == 200
+    after = engine.params[-1]
+    assert (after["after_rank"], after["after_cid"], after["after_mid"]) == (1.25, 100, 10)
+
+    assert "X-Search-Truncated" not in r.headers
+
+    # a short page is the last one
+    engine.rows = rows[:1]
+    r = client.get("/message-search", params={"q": "paracetamol", "limit": 2})
+    assert "X-Next-Cursor" not in r.headers
+
+    # more matches than SEARCH_MAX_CANDIDATES: flagged instead of cut off silently
+    engine.rows = [row[:5] + (True,) for row in rows]
+    r = client.get("/message-search", params={"q": "paracetamol", "limit": 2})
+    assert r.headers["X-Search-Truncated"] == "true"
+    assert engine.params[-1]["max_candidates"] == main.SEARCH_MAX_CANDIDATES
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="needs TEST_POSTGRES_URL (Postgres with pg_trgm)")
+def test_message_search_sql_ranks_a_stable_candidate_set():
+    """More matches than the cap: every page walk returns the same best-ranked candidates once each."""
+    psycopg2 = pytest.importorskip("psycopg2")
+    from sqlalchemy.dialects import postgresql
+    from api.main import MESSAGE_SEARCH_SQL
+
+    sql = str(MESSAGE_SEARCH_SQL.compile(dialect=postgresql.psycopg2.dialect()))
+    sql = sql.replace("marts.fct_messages", "pg_temp.fct_messages")
+    conn = psycopg2.connect(os.environ["TEST_POSTGRES_URL"])
+    try:
+        cur = conn.cursor()
+        cur.execute("CREATE TEMP TABLE fct_messages (message_id bigint, channel_id bigint, date_key date,"
+                    " message_text text, search_vector tsvector)")
+        # message i mentions the term (i % 7) + 1 times, so ts_rank_cd orders them by that count
+        cur.execute("INSERT INTO pg_temp.fct_messages SELECT i, 100 + i % 3, DATE '2026-01-01',"
+                    " t, to_tsvector('english', t) FROM (SELECT i, concat_ws(' ', repeat('syrup box ', i % 7 + 1),"
+                    " 'birr', i) AS t FROM generate_series(1, 60) i) s")
+
+        def walk():
+            seen, after, truncated = [], (None, None, None), set()
+            while True:
+                cur.execute(sql, {"q": "syrup", "pat": "%syrup%", "cid": None, "date_from": None, "date_to": None,
+                                  "after_rank": after[0], "after_cid": after[1], "after_mid": after[2],
+                                  "max_candidates": 20, "limit": 6})
+                page = cur.fetchall()
+                seen += [row[0] for row in page]
+                truncated |= {row[5] for row in page}
+                if len(page) < 6:
+                    return seen, truncated
+                after = (float(page[-1][4]), page[-1][1], page[-1][0])
+
+        first, truncated = walk()
+        assert len(first) == len(set(first)) == 20
+        assert truncated == {True}
+        # the candidates are the messages repeating the term most (6 and 7 times: 16 rows), then ties by id
+        assert {i for i in range(1, 61) if i % 7 >= 5} <= set(first)
+        assert walk()[0] == first
+    finally:
+        conn.close()
+
+
+def test_message_search_escapes_like_wildcards(monkeypatch, fake_engine):
+    import api.main as main
+    from fastapi.testclient import TestClient
+
+    engine = fake_engine([])
+    monkeypatch.setattr(main, "engine", engine)
+    client = TestClient(main.app)
+    client.get("/message-search", params={"q": "50%_off"})
+    assert engine.params[-1]["pat"] == "%50\\%\\_off%"
+    # too short for the trigram index: whole-word matching only
+    client.get("/message-search", params={"q": "ab"})
+    assert engine.params[-1]["pat"] is None
+    assert client.get("/message-search", params={"q": "x", "cursor": "garbage"}).status_code == 400
+
+
+def test_visual_content_keyset_pages(monkeypatch, fake_engine):
+    import api.main as main
+    from fastapi.testclient import TestClient
+
+    ts = datetime.datetime(2026, 1, 20, 17, 29, 13)
+    rows = [(-42, "data/raw/images/1/5.jpg", "medicine", 0.9, ts), (7, "data/raw/images/1/4.jpg", "medicine", 0.8, ts)]
+    engine = fake_engine(rows)
+    monkeypatch.setattr(main, "engine", engine)
+    client = TestClient(main.app)
+
+    r = client.get("/visual-content", params={"label": "medicine", "limit": 2})
+    assert r.status_code == 200
+    assert r.json()[1]["detection_id"] == 7
+    # the first page starts above every real key
+    assert engine.params[-1]["after_ts"] == datetime.datetime.max
+
+    r = client.get("/visual-content", params={"label": "medicine", "limit": 2, "cursor": r.headers["X-Next-Cursor"]})
+    assert r.status_code == 200
+    params = engine.params[-1]
+    assert (params["lbl"], params["after_ts"], params["after_id"]) == ("medicine", ts, 7)
+    assert client.get("/visual-content", params={"cursor": encode_cursor("yesterday", 1)}).status_code == 400
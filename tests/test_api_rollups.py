@@ -0,0 +1,27 @@
+import datetime
+
+
+def test_aggregates_read_rollups(monkeypatch, fake_engine):
+    import api.main as main
+    from api.cache import QueryCache
+    from fastapi.testclient import TestClient
+
+    engine = fake_engine([(datetime.datetime(2026, 1, 19, 13), 4, 120, 3)])
+    monkeypatch.setattr(main, "engine", engine)
+    monkeypatch.setattr(main, "result_cache", QueryCache(max_entries=0))
+    client = TestClient(main.app)
+
+    r = client.get("/channel-activity", params={"granularity": "hour", "channel_id": 7, "days": 2})
+    assert r.json() == [{"date": "2026-01-19T13:00:00", "count": 4, "views": 120, "forwards": 3}]
+    sql, params = engine.calls[-1]
+    assert "agg_channel_activity_hourly" in sql and params == {"cid": 7, "days": 2}
+
+    client.get("/channel-activity", params={"granularity": "week"})
+    sql, params = engine.calls[-1]
+    assert "agg_channel_activity_daily" in sql and "date_trunc('week'" in sql and params["cid"] is None
+    assert client.get("/channel-activity", params={"granularity": "month"}).status_code == 422
+
+    engine.rows = [("medicine", 9)]
+    assert client.get("/top-products", params={"days": 7}).json() == [{"label": "medicine", "count": 9}]
+    sql, params = engine.calls[-1]
+    assert "agg_label_counts_daily" in sql and params == {"limit": 10, "cid": None, "days": 7}
@@ -0,0 +1,35 @@
+from src.checkpoints import CheckpointStore
+
+
+def test_record_run_advances_high_water_mark(tmp_path):
+    path = tmp_path / "checkpoints.json"
+    store = CheckpointStore(str(path))
+    assert store.last_message_id(42) is None
+
+    store.record_run(42, "chan", 120, fetched=20)
+    store.record_run(42, "chan", None, fetched=0)
+
+    reloaded = CheckpointStore(str(path))
+    assert reloaded.last_message_id(42) == 120
+    runs = reloaded.channels["42"]["runs"]
+    assert [r["fetched"] for r in runs] == [20, 0]
+    assert runs[1]["min_id"] == 120
+
+
+def test_full_refresh_resets_high_water_mark(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.json"))
+    store.record_run(7, "chan", 500, fetched=10)
+    store.record_run(7, "chan", 300, fetched=300, full_refresh=True)
+    assert store.last_message_id(7) == 300
+
+
+def test_pending_media_survive_until_resolved(tmp_path):
+    path = tmp_path / "checkpoints.json"
+    store = CheckpointStore(str(path))
+    store.record_run(7, "chan", 30, fetched=30, media_ids=[12, 25])
+    store.record_run(7, "chan", 40, fetched=10, media_ids=[33])
+    assert CheckpointStore(str(path)).pending_media(7) == [12, 25, 33]
+
+    store.resolve_media(7, [25, 33])
+    assert CheckpointStore(str(path)).pending_media(7) == [12]
+    assert store.pending_media(8) == []
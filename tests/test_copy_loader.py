@@ -0,0 +1,30 @@
+from scripts.copy_loader import CopyStream, copy_text_line
+
+
+def test_copy_text_line_escapes_and_nulls():
+    line = copy_text_line((1, None, 'tab\there', '{"text": "a\\\\nb"}'))
+    assert line == '1\t\\N\ttab\\there\t{"text": "a\\\\\\\\nb"}\n'
+
+
+def test_copy_stream_reads_rows_lazily_in_chunks():
+    consumed = []
+
+    def rows():
+        for i in range(1000):
+            consumed.append(i)
+            yield (i, "ሰላም")
+
+    stream = CopyStream(rows())
+    first = stream.read(64)
+    assert len(first) == 64
+    assert len(consumed) < 1000
+
+    data = first
+    while True:
+        chunk = stream.read(100)
+        if not chunk:
+            break
+        data += chunk
+    lines = data.decode("utf-8").splitlines()
+    assert stream.rows == 1000
+    assert lines[0] == "0\tሰላም" and lines[-1] == "999\tሰላም"
@@ -0,0 +1,51 @@
+import os
+
+from src.detection_cache import DetectionCache
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_cache_hits_on_same_content_weights_and_conf(tmp_path):
+    weights = _write(tmp_path / "w.pt", b"weights-v1")
+    img = _write(tmp_path / "123_45.jpg", b"image-bytes")
+    db = str(tmp_path / "cache.sqlite")
+
+    with DetectionCache(weights, 0.25, db) as cache:
+        digest = cache.digest(img)
+        assert cache.get(digest) is None
+        cache.put(digest, [("bottle", 0.9), ("person", 0.5)])
+
+    with DetectionCache(weights, 0.25, db) as cache:
+        assert cache.get(cache.digest(img)) == [("bottle", 0.9), ("person", 0.5)]
+        assert cache.summary()["hits"] == 1
+
+    # a copy of the same image under another name is still a hit
+    copy = _write(tmp_path / "123_46.jpg", b"image-bytes")
+    with DetectionCache(weights, 0.25, db) as cache:
+        assert cache.get(cache.digest(copy)) is not None
+
+
+def test_cache_misses_on_new_weights_conf_or_content(tmp_path):
+    weights = _write(tmp_path / "w.pt", b"weights-v1")
+    img = _write(tmp_path / "123_45.jpg", b"image-bytes")
+    db = str(tmp_path / "cache.sqlite")
+
+    with DetectionCache(weights, 0.25, db) as cache:
+        cache.put(cache.digest(img), [("bottle", 0.9)])
+
+    with DetectionCache(weights, 0.5, db) as cache:
+        assert cache.get(cache.digest(img)) is None
+
+    _write(tmp_path / "w.pt", b"weights-v2")
+    with DetectionCache(weights, 0.25, db) as cache:
+        assert cache.get(cache.digest(img)) is None
+
+    _write(tmp_path / "w.pt", b"weights-v1")
+    _write(tmp_path / "123_45.jpg", b"edited-image")
+    os.utime(img, (1, 1))
+    with DetectionCache(weights, 0.25, db) as cache:
+        assert cache.get(cache.digest(img)) is None
+        assert cache.summary() == {"hits": 0, "misses": 1, "hit_rate": 0.0}
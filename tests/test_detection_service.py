@@ -0,0 +1,107 @@
+import os
+
+from src import detection_queue, detection_service
+from src.detection_service import DetectionService
+from src.detection_writer import completed_images
+from scripts.load_detections import iter_rows
+
+
+def test_queue_claims_each_job_once_and_requeues_stale(tmp_path):
+    queue = str(tmp_path / "queue")
+    jobs = [detection_queue.enqueue(f"images/1/1_{i}.jpg", queue) for i in range(3)]
+    assert detection_queue.pending(queue) == 3
+
+    first = detection_queue.claim(queue, limit=2)
+    second = detection_queue.claim(queue, limit=2)
+    assert [detection_queue.read_job(j) for j in first + second] == [f"images/1/1_{i}.jpg" for i in range(3)]
+    assert detection_queue.claim(queue) == []
+    assert detection_queue.enqueued_at(jobs[0]) <= detection_queue.enqueued_at(jobs[2])
+
+    detection_queue.complete(first[0])
+    detection_queue.fail(first[1], queue)
+    os.utime(second[0], (0, 0))
+    assert detection_queue.requeue_stale(queue, older_than=60) == 1
+    assert detection_queue.pending(queue) == 1
+    assert os.listdir(os.path.join(queue, "failed")) == [os.path.basename(first[1])]
+
+
+class FakeBackend:
+    def __init__(self):
+        self.calls = []
+
+
+def test_service_micro_batches_jobs_and_writes_rows(tmp_path, monkeypatch):
+    images = tmp_path / "images" / "7"
+    images.mkdir(parents=True)
+    for i in range(3):
+        (images / f"7_{i}.jpg").write_bytes(f"img{i}".encode())
+    queue = str(tmp_path / "queue")
+    for i in range(3):
+        detection_queue.enqueue(str(images / f"7_{i}.jpg"), queue)
+    detection_queue.enqueue(str(images / "7_99.jpg"), queue)  # never downloaded
+
+    inferred = []
+
+    def fake_infer(backend, paths, batch_size, workers):
+        inferred.append(list(paths))
+        for p in paths:
+            yield p, [("person", 0.9)]
+
+    monkeypatch.setattr(detection_service, "infer_images", fake_infer)
+    service = DetectionService("w.pt", queue_dir=queue, output_dir=str(tmp_path / "out"), batch_size=8,
+                               max_wait=0, poll_interval=0, fmt="csv", cache_path=str(tmp_path / "c.sqlite"))
+    service.backend = FakeBackend()
+    service.cache = detection_service.DetectionCache("w.pt", 0.25, str(tmp_path / "c.sqlite"))
+
+    assert service.process(service.collect()) == 3
+    # the same image again is served from the cache
+    detection_queue.enqueue(str(images / "7_0.jpg"), queue)
+    assert service.process(service.collect()) == 1
+    service.close()
+
+    assert len(inferred) == 1 and len(inferred[0]) == 3
+    assert service.stats["cache_hits"] == 1 and service.stats["failed"] == 1
+    assert detection_queue.pending(queue) == 0
+    assert os.listdir(os.path.join(queue, "processing")) == []
+    rows = list(iter_rows(str(tmp_path / "out")))
+    assert [(r["message_id"], r["product_label"]) for r in rows] == [(0, "lifestyle"), (1, "lifestyle"),
+                                                                     (2, "lifestyle"), (0, "lifestyle")]
+
+
+def test_two_workers_share_queue_and_output_dir(tmp_path, monkeypatch):
+    images = tmp_path / "images" / "7"
+    images.mkdir(parents=True)
+    queue = str(tmp_path / "queue")
+    for i in range(6):
+        (images / f"7_{i}.jpg").write_bytes(f"img{i}".encode())
+        detection_queue.enqueue(str(images / f"7_{i}.jpg"), queue)
+
+    def fake_infer(backend, paths, batch_size, workers):
+        for p in paths:
+            yield p, [("person", 0.9)]
+
+    monkeypatch.setattr(detection_service, "infer_images", fake_infer)
+    cache_path = str(tmp_path / "c.sqlite")
+    workers = []
+    for worker_id in ("host-1", "host-2"):
+        service = DetectionService("w.pt", queue_dir=queue, output_dir=str(tmp_path / "out"), batch_size=2,
+                                   max_wait=0, poll_interval=0, fmt="csv", cache_path=cache_path,
+                                   worker_id=worker_id)
+        service.backend = FakeBackend()
+        service.cache = detection_service.DetectionCache("w.pt", 0.25, cache_path)
+        workers.append(service)
+
+    # both start numbering parts at 00000 in the same run directory, interleaved
+    for service in workers + workers[:1]:
+        assert service.process(service.collect()) == 2
+    for service in workers:
+        service.close()
+
+    run_dir = workers[0].writer.run_dir
+    names = sorted(os.listdir(run_dir))
+    assert "part-host-1-00000.csv" in names and "part-host-2-00000.csv" in names
+    assert {"_manifest-host-1.txt", "_manifest-host-2.txt"} <= set(names)
+    rows = list(iter_rows(str(tmp_path / "out")))
+    assert sorted(r["message_id"] for r in rows) == list(range(6))
+    assert completed_images(run_dir) == {str(images / f"7_{i}.jpg") for i in range(6)}
+    assert detection_service.default_worker_id().count(".") == 0
@@ -0,0 +1,55 @@
+import pytest
+
+from scripts.load_detections import iter_rows
+from src.detection_writer import DetectionWriter, completed_images
+
+
+def _rows(image_path, n):
+    return [{
+        "channel_id": "1",
+        "message_id": 10,
+        "image_path": image_path,
+        "model_weights": "yolov8n.pt",
+        "box_index": i,
+        "product_label": "lifestyle",
+        "original_label": "person",
+        "score": 0.5,
+        "detection_timestamp": "2026-01-20T10:00:00",
+    } for i in range(n)]
+
+
+def test_writer_flushes_chunks_and_records_manifest(tmp_path):
+    run_dir = tmp_path / "detections_run"
+    writer = DetectionWriter(str(run_dir), "csv", chunk_rows=3)
+    writer.add("images/1/1_10.jpg", _rows("images/1/1_10.jpg", 2))
+    writer.add("images/1/1_11.jpg", [])
+    assert completed_images(str(run_dir)) == set()
+    writer.add("images/1/1_12.jpg", _rows("images/1/1_12.jpg", 1))
+    # third row triggered a flush: both images and the empty one are now durable
+    assert completed_images(str(run_dir)) == {"images/1/1_10.jpg", "images/1/1_11.jpg", "images/1/1_12.jpg"}
+    writer.add("images/1/1_13.jpg", _rows("images/1/1_13.jpg", 1))
+    writer.close()
+
+    # a resumed run continues the part numbering instead of overwriting
+    resumed = DetectionWriter(str(run_dir), "csv", chunk_rows=3)
+    resumed.add("images/1/1_14.jpg", _rows("images/1/1_14.jpg", 1))
+    resumed.close()
+
+    assert sorted(p.name for p in run_dir.glob("part-*")) == ["part-00000.csv", "part-00001.csv", "part-00002.csv"]
+    rows = list(iter_rows(str(tmp_path)))
+    assert [r["image_path"] for r in rows] == [
+        "images/1/1_10.jpg", "images/1/1_10.jpg", "images/1/1_12.jpg", "images/1/1_13.jpg", "images/1/1_14.jpg",
+    ]
+
+
+@pytest.mark.parametrize("fmt", ["parquet", "arrow"])
+def test_columnar_parts_load_directly(tmp_path, fmt):
+    pytest.importorskip("pyarrow")
+    run_dir = tmp_path / "detections_run"
+    with DetectionWriter(str(run_dir), fmt, chunk_rows=2) as writer:
+        writer.add("images/1/1_10.jpg", _rows("images/1/1_10.jpg", 3))
+
+    rows = list(iter_rows(str(run_dir)))
+    assert [(r["channel_id"], r["message_id"], r["box_index"]) for r in rows] == [(1, 10, 0), (1, 10, 1), (1, 10, 2)]
+    assert rows[0]["detection_timestamp"].isoformat() == "2026-01-20T10:00:00"
+    assert rows[0]["score"] == 0.5
@@ -0,0 +1,127 @@
+import random
+
+from src import image_dedup
+from src.image_dedup import BandIndex, cluster_images, hamming
+
+
+def _flip(value, bits):
+    for bit in bits:
+        value ^= 1 << bit
+    return value
+
+
+def test_band_index_finds_every_hash_within_distance():
+    rng = random.Random(3)
+    index = BandIndex(max_distance=4)
+    base = rng.getrandbits(64)
+    near = [_flip(base, rng.sample(range(64), k)) for k in range(5)]
+    far = [_flip(base, rng.sample(range(64), 12)) for _ in range(20)]
+    ids = [index.add(v) for v in near + far]
+
+    found = set(index.query(base))
+    assert found == set(ids[:5])
+    assert all(hamming(base, index.hashes[i]) <= 4 for i in found)
+
+
+def test_band_index_matches_brute_force():
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(50)]
+    values += [_flip(v, rng.sample(range(64), rng.randint(0, 5))) for v in values[:50]]
+    index = BandIndex(max_distance=3)
+    for v in values:
+        index.add(v)
+    for v in values[:20]:
+        expected = {i for i, other in enumerate(values) if hamming(v, other) <= 3}
+        assert set(index.query(v)) == expected
+
+
+def test_clusters_never_chain_past_max_distance(monkeypatch):
+    rng = random.Random(11)
+    a = rng.getrandbits(64)
+    b = _flip(a, range(0, 3))
+    c = _flip(b, range(10, 13))  # 3 bits from b, 6 from a
+    d = _flip(a, range(20, 24))  # 4 bits from a
+    e = _flip(c, [30])  # 1 bit from c, 7 from a
+    hashes = {"a.jpg": a, "b.jpg": b, "c.jpg": c, "d.jpg": d, "e.jpg": e}
+    monkeypatch.setattr(image_dedup, "dhash", hashes.get)
+
+    clusters = cluster_images(list(hashes), max_distance=4, workers=1)
+    assert [[p for p, _ in cluster] for cluster in clusters] == [["a.jpg", "b.jpg", "d.jpg"], ["c.jpg", "e.jpg"]]
+    for cluster in clusters:
+        assert all(hamming(cluster[0][1], value) <= 4 for _, value in cluster)
+
+
+def test_followers_of_a_failed_representative_are_inferred(tmp_path, monkeypatch):
+    from pathlib import Path
+    from src import yolo_detect
+    from src.detection_writer import completed_images, is_complete
+
+    images = [Path(f"images/7/7_{i}.jpg") for i in range(4)]
+    broken = {images[0]}
+    calls = []
+
+    def fake_infer(backend, paths, batch_size, workers):
+        calls.append(list(paths))
+        for p in paths:
+            if p not in broken:
+                yield p, [("person", 0.9)]
+
+    monkeypatch.setattr(yolo_detect, "iter_images", lambda image_dir: list(images))
+    # 0 represents 1 and 2; 3 is a singleton
+    monkeypatch.setattr(yolo_detect, "cluster_images",
+                        lambda paths, *a: [[(images[0], 0), (images[1], 1), (images[2], 1)], [(images[3], 0)]])
+    monkeypatch.setattr(yolo_detect, "load_backend", lambda *a: object())
+    monkeypatch.setattr(yolo_detect, "infer_images", fake_infer)
+
+    run_dir = yolo_detect.run_inference("w.pt", cache_path=None, fmt="csv", run_dir=str(tmp_path / "run"))
+    assert calls == [[images[0], images[3]], [images[1], images[2]]]
+    assert completed_images(run_dir) == {str(p) for p in images[1:]}
+    # the undecodable image keeps the run open for --resume
+    assert not is_complete(run_dir)
+
+    broken.clear()
+    yolo_detect.run_inference("w.pt", cache_path=None, fmt="csv", run_dir=run_dir)
+    assert calls[-1] == [images[0]]
+    assert is_complete(run_dir)
+
+
+def test_cache_only_holds_what_the_model_saw(tmp_path, monkeypatch):
+    import csv
+    from src import yolo_detect
+
+    images = []
+    for i in range(4):
+        path = tmp_path / "images" / "7" / f"7_{i}.jpg"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(f"image {i}".encode())
+        images.append(path)
+    labels = {images[0]: "person", images[1]: "bottle", images[2]: "cup", images[3]: "pill"}
+    calls = []
+
+    def fake_infer(backend, paths, batch_size, workers):
+        calls.append(list(paths))
+        for p in paths:
+            yield p, [(labels[p], 0.9)]
+
+    def run(paths, name, dedup_distance=4):
+        monkeypatch.setattr(yolo_detect, "iter_images", lambda image_dir: list(paths))
+        run_dir = yolo_detect.run_inference("w.pt", cache_path=str(tmp_path / "cache.sqlite"), fmt="csv",
+                                            run_dir=str(tmp_path / name), dedup_distance=dedup_distance)
+        rows = [r for part in sorted((tmp_path / name).glob("part-*.csv")) for r in csv.DictReader(open(part))]
+        return {r["image_path"]: r["original_label"] for r in rows}
+
+    monkeypatch.setattr(yolo_detect, "cluster_images", lambda paths, *a: [[(p, 0) for p in paths]])
+    monkeypatch.setattr(yolo_detect, "load_backend", lambda *a: object())
+    monkeypatch.setattr(yolo_detect, "infer_images", fake_infer)
+
+    # 7_1 inherits 7_0's boxes, but only 7_0's are cached
+    assert run(images[:2], "dedup") == {str(images[0]): "person", str(images[1]): "person"}
+    assert calls == [[images[0]]]
+    assert run(images[:2], "exact", dedup_distance=None) == {str(images[0]): "person", str(images[1]): "bottle"}
+    assert calls[-1] == [images[1]]
+
+    # 7_1 is a cache hit but not the representative: 7_3 inherits from 7_2, never from 7_1
+    monkeypatch.setattr(yolo_detect, "cluster_images",
+                        lambda paths, *a: [[(images[2], 0), (images[1], 0), (images[3], 0)]])
+    assert run(images[1:], "seeded") == {str(images[1]): "bottle", str(images[2]): "cup", str(images[3]): "cup"}
+    assert calls[-1] == [images[2]]
@@ -0,0 +1,40 @@
+import numpy as np
+
+from src.inference_backends import model_weights_name, postprocess, preprocess
+
+
+def _anchor(cx, cy, w, h, class_scores):
+    return [cx, cy, w, h, *class_scores]
+
+
+def test_postprocess_filters_conf_and_suppresses_overlaps_per_class():
+    names = {0: "person", 1: "bottle"}
+    anchors = [
+        _anchor(100, 100, 50, 50, [0.9, 0.0]),
+        _anchor(102, 101, 50, 50, [0.8, 0.0]),   # overlaps the first person box
+        _anchor(101, 100, 50, 50, [0.0, 0.7]),   # same place, other class: kept
+        _anchor(400, 400, 30, 30, [0.1, 0.2]),   # below conf
+        _anchor(300, 300, 40, 40, [0.6, 0.0]),
+    ]
+    pred = np.array(anchors, dtype=np.float32).T  # (4 + classes, anchors)
+
+    detections = postprocess(pred, names, conf_thresh=0.25)
+
+    assert [label for label, _ in detections] == ["person", "bottle", "person"]
+    assert [round(score, 2) for _, score in detections] == [0.9, 0.7, 0.6]
+    assert postprocess(pred, names, conf_thresh=0.95) == []
+
+
+def test_preprocess_is_rgb_nchw_unit_range():
+    image = np.zeros((4, 4, 3), dtype=np.uint8)
+    image[..., 0] = 255  # blue channel in BGR
+    batch = preprocess([image, image])
+    assert batch.shape == (2, 3, 4, 4)
+    assert batch.dtype == np.float32
+    assert batch[0, 2].max() == 1.0 and batch[0, 0].max() == 0.0
+
+
+def test_model_weights_name_distinguishes_backends():
+    assert model_weights_name("torch", "weights/yolov8n.pt") == "yolov8n.pt"
+    assert model_weights_name("onnx", "weights/yolov8n.pt") == "yolov8n.onnx"
+    assert model_weights_name("onnx-int8", "yolov8n.pt") == "yolov8n.int8.onnx"
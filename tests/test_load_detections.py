@@ -0,0 +1,72 @@
+import os
+import uuid
+
+import pytest
+
+from scripts.load_detections import iter_rows, run_db_load
+
+
+def test_rows_get_stable_identity_from_directory_of_csvs(tmp_path):
+    (tmp_path / "detections_a.csv").write_text(
+        "channel_id,message_id,image_path,product_label,original_label,score,detection_timestamp\n"
+        "1,,images/1/1_10.jpg,lifestyle,person,0.9,2026-01-20T10:00:00\n"
+        "1,,images/1/1_10.jpg,product_display,bottle,0.8,2026-01-20T10:00:01\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "detections_b.csv").write_text(
+        "channel_id,message_id,image_path,model_weights,box_index,product_label,original_label,score,detection_timestamp\n"
+        "2,,images/2/2_11.jpg,best.pt,3,other,dog,0.5,\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "notes.txt").write_text("ignored", encoding="utf-8")
+
+    rows = list(iter_rows(str(tmp_path)))
+    identities = [(r["image_path"], r["model_weights"], r["box_index"]) for r in rows]
+    assert identities == [
+        ("images/1/1_10.jpg", "yolov8n.pt", 0),
+        ("images/1/1_10.jpg", "yolov8n.pt", 1),
+        ("images/2/2_11.jpg", "best.pt", 3),
+    ]
+    assert rows[0]["message_id"] == 10
+    assert rows[2]["detection_timestamp"] is None
+
+
+def detection(image_path, box_index, label, weights="yolov8n.pt"):
+    return {"channel_id": 1, "message_id": 10, "image_path": image_path, "model_weights": weights,
+            "box_index": box_index, "product_label": label, "original_label": label, "score": 0.5,
+            "detection_timestamp": None}
+
+
+@pytest.mark.skipif(not os.getenv("TEST_POSTGRES_URL"), reason="needs TEST_POSTGRES_URL")
+def test_reloading_an_image_replaces_its_boxes():
+    psycopg2 = pytest.importorskip("psycopg2")
+    url = os.environ["TEST_POSTGRES_URL"]
+    base = f"test/{uuid.uuid4().hex}"
+    image, other = f"{base}/1_10.jpg", f"{base}/1_11.jpg"
+    run_db_load([detection(image, i, "old") for i in range(3)] + [detection(other, 0, "kept")], url)
+    conn = psycopg2.connect(url)
+    try:
+        cur = conn.cursor()
+        # rows loaded before detections carried an identity, the same image from two runs
+        cur.executemany("INSERT INTO public.stg_image_detections (image_path, product_label) VALUES (%s, 'legacy')",
+                        [(image,), (other,), (other,)])
+        conn.commit()
+
+        # the new run finds one box; its boxes span two chunks of the load
+        run_db_load([detection(image, 0, "new"), detection(image, 1, "new"), detection(image, 0, "other", "best.pt")],
+                    url, chunk_size=1)
+        cur.execute("SELECT image_path, model_weights, box_index, product_label FROM public.stg_image_detections"
+                    " WHERE image_path IN (%s, %s) ORDER BY 1, 2, 3", (image, other))
+        assert cur.fetchall() == [
+            (image, "best.pt", 0, "other"),
+            (image, "yolov8n.pt", 0, "new"),
+            (image, "yolov8n.pt", 1, "new"),
+            (other, "legacy", 0, "legacy"),
+            (other, "legacy", 1, "legacy"),
+            (other, "yolov8n.pt", 0, "kept"),
+        ]
+    finally:
+        conn.rollback()
+        conn.cursor().execute("DELETE FROM public.stg_image_detections WHERE image_path IN (%s, %s)", (image, other))
+        conn.commit()
+        conn.close()
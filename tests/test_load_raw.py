@@ -0,0 +1,68 @@
+from concurrent.futures import Future
+
+import pytest
+
+import scripts.db_setup
+from scripts import load_raw
+
+
+def test_channels_load_their_files_in_order():
+    files = [(f"d/{name}", name, name, None) for name in (
+        "1_chan_a_2026-01-01.jsonl.gz", "2_chan_b_2026-01-01.jsonl.gz",
+        "1_chan_a_2026-01-02.jsonl.gz", "1_chan_a_2026-01-02.part0001.jsonl.gz",
+    )]
+    assert [[f[1] for f in channel] for channel in load_raw.plan_channels(files)] == [
+        ["1_chan_a_2026-01-01.jsonl.gz", "1_chan_a_2026-01-02.jsonl.gz", "1_chan_a_2026-01-02.part0001.jsonl.gz"],
+        ["2_chan_b_2026-01-01.jsonl.gz"],
+    ]
+
+
+class FakeConnection:
+    closed = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FailingPool:
+    """Fails the first submitted channel; the rest stay queued."""
+
+    def __init__(self, max_workers):
+        self.submitted, self.cancelled = [], None
+
+    def submit(self, fn, files, batch_size):
+        future = Future()
+        if not self.submitted:
+            future.set_exception(RuntimeError("worker died"))
+        self.submitted.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.cancelled = cancel_futures
+        FailingPool.last = self
+
+
+def test_failed_channel_closes_connection_and_cancels_the_rest(tmp_path, monkeypatch):
+    conn = FakeConnection()
+    files = [(f"d/{cid}_chan{cid}_2026-01-01.jsonl", f"{cid}_chan{cid}_2026-01-01.jsonl", str(cid), None)
+             for cid in range(3)]
+    monkeypatch.setattr(load_raw, "DATA_DIR", str(tmp_path))
+    monkeypatch.setattr(scripts.db_setup, "get_connection", lambda: conn)
+    monkeypatch.setattr(load_raw, "LoadManifest", lambda cur: None)
+    monkeypatch.setattr(load_raw, "plan_files", lambda manifest, since, force: (files, 0))
+    monkeypatch.setattr(load_raw, "ProcessPoolExecutor", FailingPool)
+
+    with pytest.raises(RuntimeError, match="worker died"):
+        load_raw.bulk_load(workers=2)
+    assert FailingPool.last.cancelled is True
+    assert len(FailingPool.last.submitted) == 3
+    assert conn.closed
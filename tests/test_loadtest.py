@@ -0,0 +1,66 @@
+import json
+import argparse
+from collections import Counter
+from datetime import date
+
+from scripts.generate_synthetic_warehouse import channel_sizes, generate
+from scripts.loadtest_api import SCENARIOS, compare, summarize
+from src.yolo_detect import extract_message_id_from_path
+
+
+def generator_args(**overrides):
+    args = dict(messages=2000, channels=7, days=30, end_date=date(2026, 1, 31), media_ratio=0.35,
+                needle_every=100, seed=42, chunk_size=500)
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+def test_synthetic_warehouse_is_reproducible():
+    assert sum(channel_sizes(2000, 7)) == 2000
+    assert channel_sizes(2000, 7)[0] > channel_sizes(2000, 7)[-1]
+
+    def rows(args):
+        # scraped_at is the generation time
+        return [([r[:4] for r in m], ds) for m, ds in generate(args)]
+
+    first = rows(generator_args())
+    assert [len(m) for m, _ in first] == [500, 500, 500, 500]
+    assert rows(generator_args()) == first
+    assert rows(generator_args(seed=7)) != first
+    messages = [row for m, _ in first for row in m]
+
+    data = json.loads(messages[0][3])
+    assert data["channel_id"] == messages[0][0] and data["id"] == messages[0][2]
+    assert "2025-12-31" <= data["date"][:10] <= "2026-01-31"
+    assert sum("ibuprofen" in json.loads(m[3])["text"] or "ኢቡፕሮፌን" in json.loads(m[3])["text"]
+               for m in messages) == 20
+
+    detections = [d for _, ds in first for d in ds]
+    assert detections
+    with_media = {(m[0], m[2]) for m in messages if json.loads(m[3])["media"]}
+    assert {(d[0], d[1]) for d in detections} == with_media
+    # loaders recover the message id from the image file name
+    assert all(extract_message_id_from_path(d[2]) == d[1] for d in detections)
+
+
+def test_scenarios_build_requests():
+    import random
+    rng = random.Random(1)
+    for name, factory in SCENARIOS.items():
+        path, params = factory(rng, 5)
+        assert path == "/" + name
+
+
+def test_summarize_and_compare(capsys):
+    latencies = [i / 1000 for i in range(1, 101)]
+    summary = summarize(latencies, Counter({200: 98, 500: 1, "ReadTimeout": 1}), elapsed=2.0)
+    assert summary["requests"] == 100 and summary["errors"] == 2 and summary["rps"] == 50.0
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"], summary["max_ms"]) == (51.0, 95.0, 99.0, 100.0)
+
+    baseline = {"commit": "aaa", "results": {"message-search": {"rps": 50.0, "p95_ms": 100.0},
+                                             "top-products": {"rps": 900.0, "p95_ms": 5.0}}}
+    candidate = {"commit": "bbb", "results": {"message-search": {"rps": 45.0, "p95_ms": 125.0},
+                                              "top-products": {"rps": 950.0, "p95_ms": 5.2}}}
+    assert compare(baseline, candidate, max_regression=10) == ["message-search"]
+    assert compare(baseline, candidate, max_regression=30) == []
+    assert "+25.0%" in capsys.readouterr().out
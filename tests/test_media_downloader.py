@@ -0,0 +1,57 @@
+import asyncio
+
+from src.media_downloader import MediaDownloader
+
+
+class FlakyClient:
+    """Fails the first download of every file, writing a partial file first."""
+
+    def __init__(self):
+        self.calls = {}
+
+    async def download_media(self, media, path):
+        self.calls[media] = self.calls.get(media, 0) + 1
+        with open(path, "wb") as f:
+            f.write(b"partial")
+            if self.calls[media] == 1:
+                raise ConnectionError("dropped")
+            f.write(b"-complete")
+        return path
+
+
+def test_downloads_retry_and_are_atomic(tmp_path, monkeypatch):
+    monkeypatch.setattr(asyncio, "sleep", _no_sleep)
+    client = FlakyClient()
+
+    async def run():
+        async with MediaDownloader(client, workers=2, queue_size=1) as downloader:
+            for i in range(3):
+                await downloader.submit(f"photo{i}", str(tmp_path / f"1_{i}.jpg"))
+        return downloader.summary()
+
+    summary = asyncio.run(run())
+    assert summary["downloaded"] == 3
+    assert summary["retries"] == 3
+    assert summary["failed"] == 0
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["1_0.jpg", "1_1.jpg", "1_2.jpg"]
+    assert (tmp_path / "1_0.jpg").read_bytes() == b"partial-complete"
+
+
+def test_existing_files_are_skipped(tmp_path):
+    (tmp_path / "1_1.jpg").write_bytes(b"done")
+
+    async def run():
+        async with MediaDownloader(FlakyClient()) as downloader:
+            await downloader.submit("photo", str(tmp_path / "1_1.jpg"))
+        return downloader.summary()
+
+    summary = asyncio.run(run())
+    assert summary["skipped"] == 1
+    assert summary["downloaded"] == 0
+
+
+_real_sleep = asyncio.sleep
+
+
+async def _no_sleep(delay, *args, **kwargs):
+    await _real_sleep(0)
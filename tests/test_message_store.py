@@ -0,0 +1,75 @@
+import os
+import json
+
+import pytest
+
+from src.message_store import PartitionWriter, iter_raw_records, iter_records, partition_base
+from scripts.load_raw import parse_partition_name
+
+
+def test_gzip_partitions_roll_and_append(tmp_path):
+    prefix = "1569871437_CheMed123_2026-01-20"
+    with PartitionWriter(str(tmp_path), prefix, compression="gzip", max_bytes=200) as writer:
+        for i in range(50):
+            writer.write({"id": i, "text": "ሰላም"})
+    parts = writer.paths
+    assert len(parts) > 1
+
+    # a second run on the same day appends to the newest part
+    with PartitionWriter(str(tmp_path), prefix, compression="gzip", max_bytes=10**6) as writer:
+        writer.write({"id": 50, "text": "again"})
+    assert writer.paths == parts[-1:]
+
+    ids = []
+    for name in sorted(os.listdir(tmp_path)):
+        assert partition_base(name) == prefix
+        ids.extend(r["id"] for r in iter_records(str(tmp_path / name)))
+    assert sorted(ids) == list(range(51))
+
+
+def test_zstd_appends_read_back_across_frames(tmp_path):
+    pytest.importorskip("zstandard")
+    prefix = "1569871437_CheMed123_2026-01-20"
+    for run in range(2):
+        with PartitionWriter(str(tmp_path), prefix, compression="zstd") as writer:
+            for i in range(3):
+                writer.write({"id": run * 3 + i, "text": "ሰላም"})
+    # both runs went to one file, one frame each
+    assert os.listdir(tmp_path) == [prefix + ".jsonl.zst"]
+    path = str(tmp_path / (prefix + ".jsonl.zst"))
+    assert [r["id"] for r in iter_records(path)] == list(range(6))
+    assert [r[0]["id"] for r in iter_raw_records(path)] == list(range(6))
+
+
+def test_appended_part_counts_uncompressed_bytes(tmp_path):
+    prefix = "1_chan_2026-01-20"
+    line = len(json.dumps({"id": 0, "text": "ሰላም " * 20}, ensure_ascii=False, separators=(",", ":")).encode()) + 1
+    with PartitionWriter(str(tmp_path), prefix, compression="gzip") as writer:
+        for i in range(5):
+            writer.write({"id": i, "text": "ሰላም " * 20})
+    # compressed, the five repetitive lines take far less than 5 * line bytes
+    assert os.path.getsize(writer.paths[0]) < 2 * line
+
+    # limit reached by the JSON already in the part: the next run starts a new one
+    with PartitionWriter(str(tmp_path), prefix, compression="gzip", max_bytes=5 * line) as writer:
+        writer.write({"id": 5, "text": "ሰላም " * 20})
+    assert [r["id"] for r in iter_records(writer.paths[0])] == list(range(5))
+    assert [r["id"] for r in iter_records(str(tmp_path / (prefix + ".part0001.jsonl.gz")))] == [5]
+
+
+def test_parse_partition_name():
+    assert parse_partition_name("42_lobelia4cosmetics_2026-01-20.part0003.jsonl.gz") == (42, "lobelia4cosmetics")
+    assert parse_partition_name("42_tikvah_pharma_2026-01-20.json") == (42, "tikvah_pharma")
+    assert parse_partition_name("CheMed123.json") == (None, "CheMed123")
+
+
+def test_iter_raw_records_passes_jsonl_bytes_through(tmp_path):
+    path = tmp_path / "1_chan_2026-01-20.jsonl"
+    path.write_bytes(b'{"id":1,"text":"a\\\\b"}\n\n{"id":2,"text":null}\n')
+    rows = list(iter_raw_records(str(path)))
+    assert [r[0]["id"] for r in rows] == [1, 2]
+    assert rows[0][1] == b'{"id":1,"text":"a\\\\b"}'
+
+    legacy = tmp_path / "1_chan_2026-01-19.json"
+    legacy.write_text('[{"id": 3, "text": "x"}]', encoding="utf-8")
+    assert [(r["id"], raw) for r, raw in iter_raw_records(str(legacy))] == [(3, b'{"id": 3, "text": "x"}')]
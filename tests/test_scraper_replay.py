@@ -0,0 +1,115 @@
+import asyncio
+import importlib
+
+from src.checkpoints import CheckpointStore
+from src.message_store import iter_records
+from src.replay_client import ReplayClient
+from src.scrape_metrics import ScrapeMetrics
+
+
+def _load_scraper(tmp_path, monkeypatch):
+    # the scraper creates its data/log directories relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    scraper = importlib.import_module("src.scraper")
+    monkeypatch.setattr(scraper, "DATA_DIR", str(tmp_path / "messages"))
+    monkeypatch.setattr(scraper, "IMAGE_DIR", str(tmp_path / "images"))
+    return scraper
+
+
+def test_scrape_all_against_replay_client(tmp_path, monkeypatch):
+    scraper = _load_scraper(tmp_path, monkeypatch)
+    monkeypatch.setattr(scraper.asyncio, "sleep", _no_sleep)
+    client = ReplayClient(messages_per_channel=250, photo_ratio=0.5, flood_wait_rate=0.3, seed=1, photo_bytes=10)
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.json"))
+    metrics = ScrapeMetrics()
+
+    results = asyncio.run(scraper.scrape_all(client, ["chan_a", "chan_b"], 2, checkpoints, metrics=metrics,
+                                                message_limit=None))
+    assert [r["messages"] for r in results] == [250, 250]
+    assert client.stats["flood_waits"] > 0
+    assert metrics.messages_fetched.total() == 500
+    assert metrics.flood_wait_seconds.total() == sum(r["flood_wait_s"] for r in results)
+    assert 'scraper_messages_fetched_total{channel="chan_a"} 250' in metrics.to_prometheus()
+
+    ids = set()
+    for path in (tmp_path / "messages").rglob("*.jsonl.gz"):
+        ids.update((r["channel_name"], r["id"]) for r in iter_records(str(path)))
+    assert len(ids) == 500
+    photos = sum(r["photos"] for r in results)
+    assert photos > 0
+    assert len(list((tmp_path / "images").rglob("*.jpg"))) == photos
+
+    # a second run only picks up messages above the checkpoint
+    client.messages_per_channel = 260
+    client._channels.clear()
+    results = asyncio.run(scraper.scrape_all(client, ["chan_a"], 1, checkpoints))
+    assert results[0]["messages"] == 10
+
+
+class DroppedConnection(ReplayClient):
+    """Drops the connection after ``fail_after`` messages of a channel."""
+
+    fail_after = 120
+
+    async def iter_messages(self, entity, **kwargs):
+        served = 0
+        async for message in super().iter_messages(entity, **kwargs):
+            if served == self.fail_after:
+                raise ConnectionError("dropped")
+            served += 1
+            yield message
+
+
+def test_failed_channel_reports_the_messages_it_wrote(tmp_path, monkeypatch):
+    scraper = _load_scraper(tmp_path, monkeypatch)
+    monkeypatch.setattr(scraper.asyncio, "sleep", _no_sleep)
+    client = DroppedConnection(messages_per_channel=250, photo_ratio=0, seed=1)
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.json"))
+
+    results = asyncio.run(scraper.scrape_all(client, ["chan_a"], 1, checkpoints, message_limit=200,
+                                             compression="none"))
+    assert results[0]["ok"] is False
+    assert results[0]["messages"] == 120
+    written = [r for path in (tmp_path / "messages").rglob("*.jsonl") for r in iter_records(str(path))]
+    assert len(written) == 120
+    # nothing was recorded, so the next run starts over
+    assert checkpoints.last_message_id(results[0]["channel_id"]) is None
+
+
+class FailingDownloads(ReplayClient):
+    """Fails every photo download while ``failing`` is set."""
+
+    failing = True
+
+    async def download_media(self, media, file=None):
+        if self.failing:
+            raise ConnectionError("dropped")
+        return await super().download_media(media, file)
+
+
+def test_failed_downloads_are_retried_on_the_next_run(tmp_path, monkeypatch):
+    scraper = _load_scraper(tmp_path, monkeypatch)
+    monkeypatch.setattr(scraper.asyncio, "sleep", _no_sleep)
+    monkeypatch.setattr("src.media_downloader.asyncio.sleep", _no_sleep)
+    client = FailingDownloads(messages_per_channel=50, photo_ratio=0.5, seed=3, photo_bytes=10)
+    checkpoints = CheckpointStore(str(tmp_path / "checkpoints.json"))
+
+    results = asyncio.run(scraper.scrape_all(client, ["chan_a"], 1, checkpoints))
+    channel_id, photos = results[0]["channel_id"], results[0]["photos"]
+    assert photos > 0 and not list((tmp_path / "images").rglob("*.jpg"))
+    # the checkpoint moved past every message, the photos are still owed
+    assert checkpoints.last_message_id(channel_id) == 50
+    assert len(checkpoints.pending_media(channel_id)) == photos
+
+    client.failing = False
+    results = asyncio.run(scraper.scrape_all(client, ["chan_a"], 1, checkpoints))
+    assert results[0]["messages"] == 0
+    assert len(list((tmp_path / "images").rglob("*.jpg"))) == photos
+    assert CheckpointStore(str(tmp_path / "checkpoints.json")).pending_media(channel_id) == []
+
+
+_real_sleep = asyncio.sleep
+
+
+async def _no_sleep(delay, *args, **kwargs):
+    await _real_sleep(0)
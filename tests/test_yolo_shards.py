@@ -0,0 +1,21 @@
+from src.yolo_shards import shard_paths, merge_shards
+from src.detection_writer import completed_images
+
+
+def test_shard_paths_round_robin_covers_every_path():
+    paths = [f"img_{i}.jpg" for i in range(10)]
+    shards = shard_paths(paths, 3)
+    assert [len(s) for s in shards] == [4, 3, 3]
+    assert sorted(p for s in shards for p in s) == sorted(paths)
+
+
+def test_merge_shards_folds_shard_manifests(tmp_path):
+    (tmp_path / "_manifest.txt").write_text("cached.jpg\n")
+    (tmp_path / "_manifest-s000.txt").write_text("a.jpg\n")
+    (tmp_path / "_manifest-s001.txt").write_text("b.jpg\nc.jpg\n")
+
+    merge_shards(str(tmp_path))
+
+    assert (tmp_path / "_manifest.txt").read_text().splitlines() == ["cached.jpg", "a.jpg", "b.jpg", "c.jpg"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["_manifest.txt"]
+    assert completed_images(str(tmp_path)) == {"cached.jpg", "a.jpg", "b.jpg", "c.jpg"}